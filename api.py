@@ -0,0 +1,531 @@
+"""
+Headless HTTP API for ExplainMate: the analysis, runner and LLM features
+without Streamlit, for IDE plugins and grading services.
+
+    python api.py --port 8080
+    curl -s localhost:8080/v1/outline -d '{"code": "def f(n):\\n    return n", "lang": "python"}'
+    curl -sN localhost:8080/v1/prompt/explanation -d '{"code": "...", "stream": true}'
+
+Standard library only (asyncio). CPU-bound analysis runs in a process pool;
+code execution, recursion tracing and LLM calls run in thread pools. Every pool
+admits at most workers × (1 + API_QUEUE_PER_WORKER) requests, and one caller at
+most `workers` of them; past that it answers 429 with Retry-After. Requests past
+their deadline get 504. LLM endpoints stream the answer with chunked transfer
+encoding when "stream" is true.
+
+Callers are identified by their X-API-Key header, or else by client IP, and
+share the per-user LLM quotas and CPU budgets of core.scheduler with the app:
+a caller over its quota gets 429 with Retry-After.
+
+Endpoints (POST bodies are JSON):
+    GET  /health                    pool occupancy
+    GET  /metrics                   Prometheus text (core.telemetry)
+    POST /v1/outline                {code, lang}
+    POST /v1/heuristics             {code, lang}
+    POST /v1/cyclomatic             {code, lang}
+    POST /v1/call-graph             {code, lang, image?}
+    POST /v1/recursion-trace        {code, input}
+    POST /v1/run                    {code, language, stdin?}
+    POST /v1/prompt/<prompt_type>   {code, lang, question?, hotspots?, summary?, history?, structured?, stream?}
+"""
+import argparse
+import asyncio
+import base64
+import contextvars
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+from core import prompts, telemetry
+from core.code_runner import run_code
+from core.hf_llm import query_llm, stream_llm
+from core.scheduler import scheduler, QuotaExceeded
+from core.structured_output import parse_structured
+from utils.utils_ast import generate_outline, execute_instrumented_code
+from utils.utils_complexity import guess_time_complexity
+from utils.utils_complexity_advanced import cyclomatic_complexity_report, function_call_edges, generate_function_call_graph
+from utils.utils_complexity_generic import heuristic_time_complexity, heuristic_space_complexity
+
+load_dotenv()
+
+HOST              = os.getenv("API_HOST", "127.0.0.1")
+PORT              = int(os.getenv("API_PORT", "8080"))
+CPU_WORKERS       = int(os.getenv("API_CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXEC_WORKERS      = int(os.getenv("API_EXEC_WORKERS", "4"))
+LLM_WORKERS       = int(os.getenv("API_LLM_WORKERS", "8"))
+QUEUE_PER_WORKER  = int(os.getenv("API_QUEUE_PER_WORKER", "4"))
+REQUEST_TIMEOUT_S = float(os.getenv("API_REQUEST_TIMEOUT_S", "30"))
+MAX_BODY_BYTES    = int(os.getenv("API_MAX_BODY_BYTES", str(1024 * 1024)))
+KEEPALIVE_S       = 15
+TRACE_TIMEOUT_S   = 5
+TRACE_MAX_CALLS   = 2000
+
+# The (session id, client IP) the current request acts for in core.scheduler.
+_caller = contextvars.ContextVar("caller", default=None)
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 429: "Too Many Requests",
+    500: "Internal Server Error", 504: "Gateway Timeout",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: dict | None = None):
+        super().__init__(status, message, headers)   # all args, so it pickles across processes
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+# ── Analysis jobs (run in worker processes/threads) ───────────────────────────
+def _outline(code: str, lang: str) -> dict:
+    if lang != "python":
+        return {"outline": generate_outline(code, lang=lang), "complexity_hint": "Heuristic applied."}
+    return {"outline": generate_outline(code, lang="python"), "complexity_hint": guess_time_complexity(code)}
+
+
+def _heuristics(code: str, lang: str) -> dict:
+    return {
+        "time":  heuristic_time_complexity(code),
+        "space": heuristic_space_complexity(code),
+        "guess": guess_time_complexity(code) if lang == "python" else None,
+    }
+
+
+def _cyclomatic(code: str, lang: str) -> dict:
+    return {"report": cyclomatic_complexity_report(code, lang)}
+
+
+def _call_graph(code: str, lang: str, image: bool) -> dict:
+    try:
+        functions, edges = function_call_edges(code, lang)
+    except SyntaxError as e:
+        raise HTTPError(400, f"SyntaxError: {e}")
+    result = {"functions": functions, "edges": [list(e) for e in edges]}
+    if image:
+        buf = generate_function_call_graph(code, lang)
+        result["png_base64"] = base64.b64encode(buf.getvalue()).decode("ascii") if buf else None
+    return result
+
+
+def _jsonable(value):
+    if isinstance(value, (int, float, str, bool, type(None))):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return repr(value)
+
+
+def _trace_child(conn, code, input_value):
+    calls, error = execute_instrumented_code(code, input_value)
+    if calls is not None:
+        calls = [
+            {"args": _jsonable(args), "depth": depth, "index": idx, "parent": parent,
+             "result": _jsonable(result), "memoized": memoized}
+            for args, depth, idx, parent, result, memoized in calls[:TRACE_MAX_CALLS]
+        ]
+    conn.send((calls, error))
+    conn.close()
+
+
+def _recursion_trace(code: str, input_value) -> dict:
+    """execute_instrumented_code runs user code in-process, so isolate it in a killable child."""
+    ctx = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_trace_child, args=(child_conn, code, input_value), daemon=True)
+    proc.start()
+    child_conn.close()
+    try:
+        if not parent_conn.poll(TRACE_TIMEOUT_S):
+            return {"calls": None, "error": f"⏰ Trace timed out ({TRACE_TIMEOUT_S}s limit)."}
+        calls, error = parent_conn.recv()
+    except EOFError:
+        return {"calls": None, "error": "❌ Tracer process crashed."}
+    finally:
+        if proc.is_alive():
+            proc.kill()
+        proc.join(1)
+    return {"calls": calls, "error": error, "truncated": bool(calls) and len(calls) >= TRACE_MAX_CALLS}
+
+
+# ── Prompt builders ───────────────────────────────────────────────────────────
+# prompt_type → builder(code, body, outline, complexity_hint)
+PROMPT_BUILDERS = {
+    "explanation":                lambda c, b, o, h: prompts.explanation_prompt(c, o, h),
+    "complexity":                 lambda c, b, o, h: prompts.complexity_prompt(c, o, h),
+    "followup":                   lambda c, b, o, h: prompts.followup_prompt(c, b["question"], o),
+    "interview":                  lambda c, b, o, h: prompts.interview_prompt(c, o),
+    "edge_case":                  lambda c, b, o, h: prompts.edge_case_prompt(c, o),
+    "bug_finder":                 lambda c, b, o, h: prompts.bug_finder_prompt(c, o),
+    "optimization":               lambda c, b, o, h: prompts.optimization_prompt(c, o, b.get("hotspots") or ""),
+    "whiteboard_questions":       lambda c, b, o, h: prompts.whiteboard_questions_prompt(c, o),
+    "difficulty_based_questions": lambda c, b, o, h: prompts.difficulty_based_questions_prompt(c, o),
+    "tradeoff_explanation":       lambda c, b, o, h: prompts.tradeoff_explanation_prompt(c, o),
+    "conversation":               lambda c, b, o, h: prompts.conversation_prompt(
+        c, b["question"], o, b.get("summary") or "", b.get("history") or ()
+    ),
+}
+_NEEDS_QUESTION = {"followup", "conversation"}
+
+
+def _check_prompt_request(prompt_type: str, body: dict):
+    if prompt_type not in PROMPT_BUILDERS:
+        raise HTTPError(404, f"Unknown prompt type '{prompt_type}'. Available: {', '.join(PROMPT_BUILDERS)}")
+    if prompt_type in _NEEDS_QUESTION and not body.get("question"):
+        raise HTTPError(400, "'question' is required for this prompt type")
+    _code(body)
+
+
+def _build_prompt(prompt_type: str, body: dict) -> str:
+    """Outline + prompt for one request; runs in the LLM worker thread (it is cheap)."""
+    code = body["code"]
+    outline = _outline(code, _lang(body))
+    prompt = PROMPT_BUILDERS[prompt_type](code, body, outline["outline"], outline["complexity_hint"])
+    if body.get("structured"):
+        prompt = prompts.structured_prompt(prompt_type, prompt)
+    return prompt
+
+
+def _query_prompt(prompt_type: str, body: dict) -> str:
+    return query_llm(_build_prompt(prompt_type, body), prompt_type)
+
+
+# ── Worker pools with backpressure ────────────────────────────────────────────
+def _as_caller(caller, fn):
+    def call(*args):
+        with scheduler.bound(*caller):
+            return fn(*args)
+    return call
+
+
+def _caller_for(headers: dict, peer) -> tuple:
+    """(session id, client IP) for core.scheduler: per API key when given, else per IP."""
+    ip = peer[0] if isinstance(peer, tuple) and peer else "unknown"
+    key = headers.get("x-api-key")
+    if key:
+        return "api-key:" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:16], ip
+    return f"api-ip:{ip}", ip
+
+
+class WorkerPool:
+    """
+    An executor plus an admission limit. Slots are released when the job
+    really finishes (not when the request times out), so a pool full of
+    stuck jobs keeps answering 429 instead of piling up more work. One
+    caller may hold at most `workers` slots, so it cannot fill the queue.
+
+    Thread pools (`bind_caller`) run each job as the request's caller in
+    core.scheduler, so its LLM calls and child processes count against
+    that caller's quotas.
+    """
+
+    def __init__(self, name: str, executor, workers: int, queue_per_worker: int = QUEUE_PER_WORKER,
+                 bind_caller: bool = False):
+        self.name = name
+        self.executor = executor
+        self.workers = workers
+        self.capacity = workers * (1 + queue_per_worker)
+        self.bind_caller = bind_caller
+        self.in_flight = 0
+        self._per_caller = {}
+
+    def _acquire(self):
+        caller = _caller.get()
+        if self.in_flight >= self.capacity or self._per_caller.get(caller, 0) >= self.workers:
+            telemetry.incr(f"api_rejected_{self.name}")
+            raise HTTPError(429, f"The {self.name} pool is saturated; retry shortly.", {"Retry-After": "1"})
+        self.in_flight += 1
+        self._per_caller[caller] = self._per_caller.get(caller, 0) + 1
+        return caller
+
+    def _release(self, caller):
+        self.in_flight -= 1
+        self._per_caller[caller] -= 1
+        if not self._per_caller[caller]:
+            del self._per_caller[caller]
+
+    def _submit(self, fn, args):
+        loop = asyncio.get_running_loop()
+        caller = self._acquire()
+        if self.bind_caller and caller is not None:
+            fn = _as_caller(caller, fn)
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._release, caller))
+        return future
+
+    async def run(self, fn, *args, timeout: float = REQUEST_TIMEOUT_S):
+        future = self._submit(fn, args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(504, f"Request exceeded its {timeout:.0f}s deadline.")
+
+    def start_stream(self, fn, *args):
+        """Submit a streaming job; its slot is held until the job itself returns."""
+        return self._submit(fn, args)
+
+    def status(self) -> dict:
+        return {"workers": self.workers, "in_flight": self.in_flight, "capacity": self.capacity}
+
+
+class ExplainMateAPI:
+    def __init__(self, cpu_workers=CPU_WORKERS, exec_workers=EXEC_WORKERS, llm_workers=LLM_WORKERS,
+                 request_timeout_s=REQUEST_TIMEOUT_S):
+        self.request_timeout_s = request_timeout_s
+        self.cpu = WorkerPool("cpu", ProcessPoolExecutor(max_workers=cpu_workers), cpu_workers)
+        self.exec = WorkerPool("exec", ThreadPoolExecutor(exec_workers, thread_name_prefix="api-exec"), exec_workers,
+                               bind_caller=True)
+        self.llm = WorkerPool("llm", ThreadPoolExecutor(llm_workers, thread_name_prefix="api-llm"), llm_workers,
+                              bind_caller=True)
+        self.routes = {
+            ("GET",  "/health"):            self.health,
+            ("GET",  "/metrics"):           self.metrics,
+            ("POST", "/v1/outline"):        self.outline,
+            ("POST", "/v1/heuristics"):     self.heuristics,
+            ("POST", "/v1/cyclomatic"):     self.cyclomatic,
+            ("POST", "/v1/call-graph"):     self.call_graph,
+            ("POST", "/v1/recursion-trace"): self.recursion_trace,
+            ("POST", "/v1/run"):            self.run,
+        }
+
+    def close(self):
+        for pool in (self.cpu, self.exec, self.llm):
+            pool.executor.shutdown(wait=False, cancel_futures=True)
+
+    # ── Handlers ──────────────────────────────────────────────────────────────
+    async def health(self, body):
+        return {"status": "ok", "pools": {p.name: p.status() for p in (self.cpu, self.exec, self.llm)}}
+
+    async def metrics(self, body):
+        return telemetry.render_prometheus()
+
+    async def outline(self, body):
+        return await self.cpu.run(_outline, _code(body), _lang(body))
+
+    async def heuristics(self, body):
+        return await self.cpu.run(_heuristics, _code(body), _lang(body))
+
+    async def cyclomatic(self, body):
+        return await self.cpu.run(_cyclomatic, _code(body), _lang(body))
+
+    async def call_graph(self, body):
+        return await self.cpu.run(_call_graph, _code(body), _lang(body), bool(body.get("image")))
+
+    async def recursion_trace(self, body):
+        if "input" not in body:
+            raise HTTPError(400, "'input' is required (a JSON value, or a list of arguments)")
+        return await self.exec.run(_recursion_trace, _code(body), body["input"], timeout=TRACE_TIMEOUT_S + 2)
+
+    async def run(self, body):
+        language = str(body.get("language") or body.get("lang") or "python")
+        caller = _caller.get()
+        wait = scheduler.cpu_wait(caller[0]) if caller else 0.0
+        if wait > 0:
+            raise HTTPError(429, f"CPU budget exhausted; it refills in ~{wait:.0f}s.",
+                            {"Retry-After": str(math.ceil(wait))})
+        output = await self.exec.run(run_code, language, _code(body), str(body.get("stdin") or ""))
+        return {"output": output}
+
+    async def prompt(self, prompt_type, body, writer, keep_alive):
+        _check_prompt_request(prompt_type, body)
+        if not body.get("stream"):
+            text = await self.llm.run(_query_prompt, prompt_type, body, timeout=self.request_timeout_s)
+            result = {"prompt_type": prompt_type, "text": text}
+            if body.get("structured"):
+                result["data"], result["error"] = parse_structured(prompt_type, text)
+            return result
+        await self._stream_llm(prompt_type, body, writer, keep_alive)
+        return None
+
+    async def _stream_llm(self, prompt_type, body, writer, keep_alive):
+        """Relay stream_llm chunks from a worker thread as a chunked text/plain response."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for chunk in stream_llm(_build_prompt(prompt_type, body), prompt_type):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, f"\n❌ LLM error: {e}")
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        self.llm.start_stream(produce)
+        await _write_head(writer, 200, "text/plain; charset=utf-8", keep_alive, {"Transfer-Encoding": "chunked"})
+        deadline = loop.time() + self.request_timeout_s
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    chunk = f"\n⏰ Stream exceeded its {self.request_timeout_s:.0f}s deadline."
+                    stop.set()
+                if chunk is done:
+                    break
+                data = chunk.encode("utf-8")
+                writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                await writer.drain()
+                if stop.is_set():
+                    break
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            stop.set()   # client went away or deadline hit: let the worker stop early
+
+    # ── HTTP plumbing ─────────────────────────────────────────────────────────
+    async def dispatch(self, method, path, body, writer, keep_alive):
+        if path.startswith("/v1/prompt/"):
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            return await self.prompt(path[len("/v1/prompt/"):], body, writer, keep_alive)
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(p == path for _, p in self.routes):
+                raise HTTPError(405, f"{method} not allowed on {path}")
+            raise HTTPError(404, f"No route for {path}")
+        return await handler(body)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(_read_request(reader), KEEPALIVE_S)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                method, path, headers, raw, error = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                _caller.set(_caller_for(headers, writer.get_extra_info("peername")))
+                route = "/v1/prompt" if path.startswith("/v1/prompt/") else path
+                with telemetry.span("api", route=route):
+                    await self._respond(method, path, raw, error, writer, keep_alive)
+                if not keep_alive or error:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, path, raw, error, writer, keep_alive):
+        try:
+            if error:
+                raise error
+            body = {}
+            if raw:
+                try:
+                    body = json.loads(raw)
+                except ValueError:
+                    raise HTTPError(400, "Body must be JSON")
+                if not isinstance(body, dict):
+                    raise HTTPError(400, "Body must be a JSON object")
+            result = await self.dispatch(method, path, body, writer, keep_alive)
+            if result is None:
+                return   # streamed
+            if isinstance(result, str):
+                await _write_response(writer, 200, result.encode("utf-8"), "text/plain; version=0.0.4", keep_alive)
+            else:
+                await _write_json(writer, 200, result, keep_alive)
+        except HTTPError as e:
+            await _write_json(writer, e.status, {"error": e.message}, keep_alive, e.headers)
+        except QuotaExceeded as e:
+            await _write_json(writer, 429, {"error": str(e)}, keep_alive, {"Retry-After": str(math.ceil(e.retry_after))})
+        except Exception as e:
+            telemetry.incr("api_errors")
+            await _write_json(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive)
+
+
+def _code(body: dict) -> str:
+    code = body.get("code")
+    if not isinstance(code, str) or not code.strip():
+        raise HTTPError(400, "'code' is required")
+    return code
+
+
+def _lang(body: dict) -> str:
+    return str(body.get("lang") or "python").lower()
+
+
+async def _read_request(reader):
+    """Parse one HTTP/1.1 request. Returns (method, path, headers, body, error) or None at EOF."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _version = line.decode("latin-1").split()
+    except ValueError:
+        return "GET", "/", {}, b"", HTTPError(400, "Malformed request line")
+    headers = {}
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    path = urlsplit(target).path
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        return method, path, headers, b"", HTTPError(411, "Chunked request bodies are not supported")
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_BYTES:
+        return method, path, headers, b"", HTTPError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body, None
+
+
+async def _write_head(writer, status, content_type, keep_alive, headers=None):
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+
+async def _write_response(writer, status, data: bytes, content_type, keep_alive, headers=None):
+    await _write_head(writer, status, content_type, keep_alive, {"Content-Length": len(data), **(headers or {})})
+    writer.write(data)
+    await writer.drain()
+
+
+async def _write_json(writer, status, obj, keep_alive, headers=None):
+    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    await _write_response(writer, status, data, "application/json; charset=utf-8", keep_alive, headers)
+
+
+async def serve(host: str = HOST, port: int = PORT, ready=None, **options):
+    """Run the API until cancelled. `ready(port)` is called once the socket is listening."""
+    api = ExplainMateAPI(**options)
+    server = await asyncio.start_server(api.handle_connection, host, port, limit=MAX_BODY_BYTES + 65536)
+    bound = server.sockets[0].getsockname()[1]
+    if ready:
+        ready(bound)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        api.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ExplainMate headless HTTP API.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port,
+                          ready=lambda port: print(f"ExplainMate API listening on http://{args.host}:{port}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
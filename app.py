@@ -1,22 +1,46 @@
 import streamlit as st
-from core.hf_llm import query_llm
+from core.hf_llm import query_llm, stream_llm, query_batch
+from core.model_router import router
+from core import telemetry
+from core.telemetry import span, traced
 from core import prompts
 import speech_recognition as sr
 from core.code_runner import run_code
+from core.profiler import profile_python, format_hotspots
+from core.memo_sim import simulate_memoization
+from core.chat_memory import ChatMemory
+from core.prefetch import prefetcher, code_key
+from core.jobs import jobs
+from core.scheduler import scheduler, QuotaExceeded
+from core.test_matrix import parse_cases, run_matrix
+from core.structured_output import parse_structured, parse_partial, to_markdown
+from core.unit_analysis import explain_incremental
+from core.map_reduce import explain_large, is_large
+from core.snippet_index import snippet_index
+from core.question_bank import bank_answer, bank_patterns, BANK_KINDS
+from core.repo_index import get_repo_index, ROOTS as REPO_INDEX_ROOTS
 from streamlit_ace import st_ace  # type: ignore
-from utils.utils_ast import generate_outline, execute_instrumented_code, get_first_function_name
+from utils.utils_ast import generate_outline, execute_instrumented_code, get_first_function_name, full_value, LazyArg
 from utils.utils_complexity import guess_time_complexity
+from utils.utils_patterns import detect_patterns, PATTERNS
+from utils.utils_tracefile import TraceFile, TraceFormatError, trace_bytes, FILE_SUFFIX
 from utils.utils_complexity_advanced import (
     cyclomatic_complexity_report,
     generate_function_call_graph,
+    function_call_edges,
 )
 from utils.utils_complexity_generic import heuristic_time_complexity, heuristic_space_complexity, generate_complexity_graph
 import re
 import time
 import uuid
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 from gtts import gTTS
 import io
+import html
+import os
+import ast
+import hashlib
 
 # CSS is injected inside run_app() after st.set_page_config() to avoid
 # duplicate rendering (set_page_config must be the very first Streamlit call).
@@ -116,6 +140,7 @@ def preprocess_text_for_tts(text):
         return text  # Fallback to original text
     
 
+@traced("typewriter")
 def type_writer_effect(text, speed=0.02, enable_tts=False):
     """
     Display text in Streamlit as if it's being typed out.
@@ -134,6 +159,7 @@ def type_writer_effect(text, speed=0.02, enable_tts=False):
         if audio_file:
             st.audio(audio_file, format='audio/mp3')
 
+@traced("tts")
 def speak_text(text):
     """
     Generate TTS audio from text and return BytesIO for st.audio.
@@ -166,6 +192,37 @@ def handle_tts_feedback():
             with open("tts_feedback.txt", "a") as f:
                 f.write(f"{mispronounced_word}:{suggested_pronunciation}\n")
             st.success(f"Thank you! Added '{mispronounced_word}' as '{suggested_pronunciation}' to feedback.")
+
+def render_performance_panel():
+    """
+    Sidebar view of core.telemetry: p50/p95 per stage, cache hit rates,
+    in-flight counts, background jobs, plus a Prometheus-format download.
+    """
+    stages = telemetry.stage_stats()
+    if stages:
+        st.dataframe(
+            [{"stage": name, **s} for name, s in stages.items()],
+            use_container_width=True, hide_index=True
+        )
+    else:
+        st.caption("No spans recorded yet.")
+    caches = telemetry.cache_stats()
+    if caches:
+        st.dataframe(
+            [{"cache": name, **c} for name, c in caches.items()],
+            use_container_width=True, hide_index=True
+        )
+    st.dataframe(
+        [{"job_type": name, **c} for name, c in jobs.stats().items()],
+        use_container_width=True, hide_index=True
+    )
+    quota = scheduler.user_stats(get_session_id(), get_client_ip())
+    st.caption(f"Your quota: {quota['llm_tokens']:g} LLM call(s) available now, "
+               f"{quota['cpu_budget_s']:g} CPU-second(s) of run budget, fair-share weight {quota['weight']:g}.")
+    st.download_button(
+        "⬇️ metrics.prom", telemetry.render_prometheus(),
+        file_name="metrics.prom", mime="text/plain", use_container_width=True
+    )
 # ------------------------------
 # Recursion Visualization Functions
 # ------------------------------
@@ -173,35 +230,750 @@ def handle_tts_feedback():
 def generate_uuid():
     return str(uuid.uuid4())
 
+def get_session_id():
+    """Stable id for this browser session, used to key server-side state."""
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = generate_uuid()
+    return st.session_state["session_id"]
+
+def get_client_ip():
+    """The browser's IP as seen by Streamlit, or None (e.g. in tests)."""
+    return getattr(st.context, "ip_address", None)
+
+# ── Background jobs ──────────────────────────────────────────────────────────
+# How often (seconds) the page checks whether this session's jobs finished.
+JOB_POLL_S = float(os.getenv("JOB_POLL_S", "1"))
+
+def render_job_status(job, label):
+    """Queued / running line for an unfinished job, with a Cancel button and any live output."""
+    col_status, col_cancel = st.columns([5, 1])
+    if job.status == "queued":
+        state = f"queued, position {jobs.position(job)}"
+        blocked = jobs.blocked_for(job)
+        if blocked > 0:
+            quota = "CPU budget" if job.job_type == "run" else "LLM quota"
+            state += f" — your {quota} refills in ~{blocked:.0f}s"
+    else:
+        state = "running"
+    col_status.info(f"⏳ {label} — {state} ({job.elapsed:.0f}s). Other tabs stay usable meanwhile.")
+    col_cancel.button("✖ Cancel", key=f"cancel_job_{job.id}", on_click=jobs.cancel, args=(job.id,))
+    if job.progress:
+        st.code(job.progress, language="text")
+
+def background_job(job_type, name, key, fn, submit, label):
+    """
+    Submit `fn(job)` to core.jobs when `submit` is true (replacing a finished
+    job for the same name and key), then return this session's job for
+    (name, key) — finished or not — or None. Unfinished jobs show a status line.
+    """
+    session_id = get_session_id()
+    if submit:
+        jobs.submit(session_id, job_type, name, key, fn, replace=True, ip=get_client_ip())
+    job = jobs.get(session_id, name, key)
+    if job is not None and not job.done:
+        render_job_status(job, label)
+    return job
+
+def first_view(job):
+    """True the first time a finished job is rendered, so animations and TTS play once."""
+    shown = st.session_state.setdefault("shown_jobs", set())
+    first = job.id not in shown
+    shown.add(job.id)
+    return first
+
+@st.fragment(run_every=JOB_POLL_S)
+def poll_jobs(session_id, pending_ids):
+    """Rerun the page as soon as any of the session's pending jobs finishes."""
+    if {job.id for job in jobs.pending(session_id)} != set(pending_ids):
+        st.rerun()
+
+_TEST_MATRIX_PLACEHOLDER = """5 3
+=>
+8
+---
+10 -2
+=>
+8"""
+
+def render_test_matrix(code, lang):
+    """
+    Paste or upload N (stdin, expected) cases and run them in parallel through
+    run_code; results come back as one pass/fail table with diffs and timing.
+    """
+    st.caption(
+        "One case per block: stdin, a line with `=>`, then the expected output. "
+        "Separate cases with `---`. JSON lists of {stdin, expected} also work."
+    )
+    col_text, col_opts = st.columns([3, 1])
+    with col_text:
+        cases_text = st.text_area(
+            "Cases", height=160, key="test_matrix_cases",
+            placeholder=_TEST_MATRIX_PLACEHOLDER, label_visibility="collapsed"
+        )
+    with col_opts:
+        uploaded = st.file_uploader("Load cases", type=["json", "txt"], key="test_matrix_file")
+        concurrency = st.slider("Parallel runs", 1, 8, 4, key="test_matrix_concurrency")
+        run_matrix_clicked = st.button("▶️ Run All Cases", use_container_width=True)
+
+    if not run_matrix_clicked:
+        return
+    if not code.strip():
+        st.warning("⚠️ Please paste code before running.")
+        return
+    try:
+        source = uploaded.getvalue().decode("utf-8") if uploaded else cases_text
+        cases = parse_cases(source)
+    except (ValueError, UnicodeDecodeError) as e:
+        st.error(f"❌ Could not parse cases: {e}")
+        return
+    if not cases:
+        st.warning("⚠️ No test cases found.")
+        return
+
+    with st.spinner(f"Running {len(cases)} case(s)…"):
+        results = run_matrix(lang, code, cases, concurrency=concurrency)
+    render_matrix_results(results)
+
+def render_matrix_results(results):
+    """Pass/fail table plus a diff expander per failing case."""
+    passed = sum(r["passed"] for r in results)
+    (st.success if passed == len(results) else st.error)(f"{passed}/{len(results)} cases passed")
+    st.dataframe(
+        [{
+            "case":   r["name"],
+            "result": "✅ pass" if r["passed"] else "❌ fail",
+            "ms":     r["ms"],
+            "cached": r["cached"],
+            "stdin":  r["stdin"][:60],
+        } for r in results],
+        use_container_width=True, hide_index=True
+    )
+    for r in results:
+        if not r["passed"]:
+            with st.expander(f"❌ {r['name']} — diff"):
+                st.code(r["diff"] or r["actual"], language="diff")
+
+# ── Project context ──────────────────────────────────────────────────────────
+def render_project_index(code, lang):
+    """
+    Index a project directory in the background (core.repo_index) and return
+    (prompt context, matched symbols, index) for the editor's functions, or
+    ("", [], index-or-None) when nothing applies.
+    """
+    if not REPO_INDEX_ROOTS:
+        st.info("ℹ️ Project indexing is off. Set `REPO_INDEX_ROOTS` to the directories it may read.")
+        return "", [], None
+    st.caption(
+        "Point at the project this code comes from; prompts and the call graph then include "
+        "its callers and callees. Refreshes re-parse only files that changed. "
+        f"Allowed under: {', '.join(f'`{root}`' for root in REPO_INDEX_ROOTS)}"
+    )
+    col_root, col_btn = st.columns([4, 1])
+    root = col_root.text_input("Project directory", key="project_root", placeholder=REPO_INDEX_ROOTS[0],
+                               label_visibility="collapsed").strip()
+    refresh = col_btn.button("🔄 Index", use_container_width=True)
+    if not root:
+        return "", [], None
+    try:
+        index = get_repo_index(root)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return "", [], None
+    job = background_job("index", "repo_index", index.root, lambda job, index=index: index.update(),
+                         refresh or index.is_stale(), "Indexing project")
+    if job is not None and job.status == "error":
+        st.error(f"❌ Indexing failed: {job.error}")
+    summary = index.summary()
+    last = f" · last refresh parsed {job.result['parsed']} file(s) in {job.result['seconds']}s" \
+        if job is not None and job.status == "done" else ""
+    st.caption(f"📁 {summary['files']:,} files · {summary['lines']:,} lines · {summary['symbols']:,} symbols · "
+               f"{summary['calls']:,} call sites{last}")
+    if not st.checkbox("Include callers and callees in prompts", value=True, key="project_context"):
+        return "", [], index
+    if lang != "python":
+        st.info("🐍 Project context is available only for Python.")
+        return "", [], index
+    try:
+        names = list(dict.fromkeys(function_call_edges(code)[0]))
+    except SyntaxError:
+        return "", [], index
+    with span("repo_context"):
+        context, matched = index.context(names)
+    if matched:
+        st.caption("🔗 Found in the project: " + ", ".join(f"`{m['fq']}` ({m['path']})" for m in matched))
+    elif names:
+        st.caption("No function from the editor was found in the project.")
+    return context, matched, index
+
+def _heat_color(ms, max_ms):
+    """Transparent → red background, scaled by a line's share of the slowest line."""
+    if not ms or not max_ms:
+        return "transparent"
+    return f"rgba(255,75,75,{0.12 + 0.68 * ms / max_ms:.2f})"
+
+def render_profile_heatmap(code, lines):
+    """Source listing with each line shaded by its measured time."""
+    max_ms = max((v["ms"] for v in lines.values()), default=0)
+    rows = []
+    for n, text in enumerate(code.splitlines(), 1):
+        stat = lines.get(n)
+        label = f"{stat['ms']:>9.2f} ms {stat['hits']:>8}×" if stat else " " * 22
+        rows.append(
+            f"<div style='background:{_heat_color(stat and stat['ms'], max_ms)};white-space:pre'>"
+            f"<span style='color:rgba(255,255,255,0.45)'>{n:>4} {label}  </span>{html.escape(text)}</div>"
+        )
+    st.markdown(
+        "<div style='font-family:monospace;font-size:0.8rem;overflow-x:auto'>" + "".join(rows) + "</div>",
+        unsafe_allow_html=True
+    )
+
+def render_profiler(code, stdin_data, version):
+    """
+    Profile Code: run the Python code once under cProfile (optionally with
+    per-line timing) and keep the result for this code version, so the
+    Optimize button can send the measured hotspots to the LLM.
+    """
+    col_btn, col_opt = st.columns([1, 2])
+    line_timing = col_opt.checkbox(
+        "Line-level timing (slower run)", key="profile_line_timing",
+        help="Traces every line with sys.settrace. Absolute times grow several-fold; compare lines with each other."
+    )
+    if col_btn.button("⏱️ Profile Code", type="secondary"):
+        live = st.empty()
+        with st.spinner("Profiling…"):
+            profile = profile_python(code, stdin_data, line_timing=line_timing,
+                                     on_output=lambda text: live.code(text or "…", language="text"))
+        live.empty()
+        st.session_state["profile"] = (version, profile)
+
+    stored = st.session_state.get("profile")
+    if not stored or stored[0] != version:
+        return None
+    profile = stored[1]
+    if profile["status"] == "failed":
+        st.error(profile["error"])
+        return None
+    if profile["status"] == "timeout":
+        st.warning(f"⏰ Stopped at the time limit — the profile covers the first {profile['total_ms'] / 1000:.1f}s.")
+    elif profile["status"] == "error":
+        st.warning("⚠️ The program raised an exception; the profile covers the part that ran.")
+        st.code(profile["error"], language="text")
+    st.caption(f"Total run time: {profile['total_ms']:.1f} ms")
+    st.dataframe(profile["functions"][:15], use_container_width=True, hide_index=True)
+    if profile["lines"]:
+        with st.expander("🔥 Per-line heat map", expanded=True):
+            render_profile_heatmap(code, profile["lines"])
+    with st.expander("Program output"):
+        st.code(profile["output"], language="text")
+    return profile
+
+def render_unit_notes(results):
+    """One line per analyzed definition, with its extra notes underneath."""
+    lines = []
+    for r in results:
+        unit, notes = r["unit"], dict(r["notes"])
+        badge = " ♻️" if r["cached"] else ""
+        lines.append(f"**`{unit['name']}`** _(lines {unit['start']}–{unit['end']})_{badge}: "
+                     f"{notes.pop('explanation', '')}")
+        lines += [f"   - _{aspect.capitalize()}:_ {text}" for aspect, text in notes.items()]
+    st.markdown("\n".join(lines))
+
+def large_explanation_job(code, lang, outline):
+    """
+    Job body for the map-reduce explanation of a big file: chunk notes and
+    class summaries are shown in job.progress as they arrive, then the full
+    report is returned.
+    """
+    def run(job):
+        state = {"total": 1, "done": 0}
+        partial = []
+
+        def on_event(kind, payload):
+            if kind == "plan":
+                state["total"] = max(1, payload["chunks"])
+                return
+            if kind == "chunk":
+                state["done"] += 1
+                first_line = (payload["notes"].strip().splitlines() or [""])[0]
+                partial.append(f"- {payload['chunk']['label']} — {first_line}")
+            elif kind in ("class", "section"):
+                partial.append(f"- Summarized {payload['name']}")
+            else:
+                return
+            job.progress = f"Explained {state['done']} of {state['total']} chunks…\n" + "\n".join(partial[-12:])
+
+        try:
+            with scheduler.admitted():
+                return explain_large(code, lang, outline, query=scheduler.carry(query_llm), on_event=on_event)
+        except QuotaExceeded as e:
+            return str(e)
+    return run
+
+def incremental_explanation_job(code, lang, outline, complexity_hint, aspects):
+    """Job body for the per-definition explanation; progress names the latest definition."""
+    def run(job):
+        done = []
+
+        def on_unit(result):
+            done.append(result)
+            job.progress = f"Analyzed {len(done)} definition(s)… latest: {result['unit']['name']}"
+
+        try:
+            with scheduler.admitted():
+                return explain_incremental(code, lang, outline, complexity_hint, aspects,
+                                           query=scheduler.carry(query_llm), on_unit=on_unit)
+        except QuotaExceeded as e:
+            return str(e)
+    return run
+
+def render_large_breakdown(report):
+    """Module → class → chunk notes, as returned by explain_large."""
+    shown = set()
+    for chunk in report["chunks"]:
+        parent = chunk["parent"]
+        if parent and parent not in shown:
+            shown.add(parent)
+            st.markdown(f"**🧱 class `{parent}`**\n\n{report['classes'].get(parent, '')}")
+        indent = "> " if parent else ""
+        st.markdown(f"{indent}**{chunk['label']}**\n\n" + "\n".join(f"{indent}{line}" for line in chunk["notes"].splitlines()))
+
+def finish_structured(prompt_type, raw, version=None):
+    """
+    Validate a structured-mode response, keep it as a record in session state
+    (tagged with the code `version` it answers) and return it as markdown —
+    or the raw text when it does not parse.
+    """
+    data, error = parse_structured(prompt_type, raw)
+    if data is None:
+        telemetry.incr("structured_parse_failures")
+        st.caption(f"⚠️ Structured output could not be parsed ({error}); showing the raw response.")
+        return raw
+    st.session_state.setdefault("structured_records", {})[prompt_type] = {"version": version, "data": data}
+    return to_markdown(prompt_type, data)
+
+def ask_llm(prompt_type, prompt, structured=False, version=None):
+    """
+    Query the LLM for one tab. In structured mode the JSON response is
+    streamed and its fields are rendered as they arrive.
+    """
+    try:
+        if not structured:
+            return query_llm(prompt, prompt_type)
+        live = st.empty()
+        raw, last_render = "", 0.0
+        for chunk in stream_llm(prompts.structured_prompt(prompt_type, prompt), prompt_type):
+            raw += chunk
+            if time.monotonic() - last_render > 0.1:
+                partial = parse_partial(prompt_type, raw)
+                if partial:
+                    live.markdown(to_markdown(prompt_type, partial))
+                last_render = time.monotonic()
+        live.empty()
+    except QuotaExceeded as e:
+        return str(e)
+    return finish_structured(prompt_type, raw, version)
+
+def llm_prompt(kind, prompt, structured=False):
+    """The prompt as sent for `kind`: wrapped with its JSON schema in structured mode."""
+    return prompts.structured_prompt(kind, prompt) if structured else prompt
+
+def finish_answer(kind, raw, version, structured=False):
+    """A finished LLM response as shown: validated and rendered in structured mode."""
+    return finish_structured(kind, raw, version) if structured else raw
+
+def prefetch_job(kind, version, prompt, structured=False):
+    """
+    Job body for an analysis the prefetcher may already have (or be
+    computing) for this code version; otherwise it makes a fresh call.
+    Built in the Streamlit thread.
+    """
+    prefetcher.record_use(kind)
+    future = prefetcher.take(get_session_id(), kind, version)
+    prompt = llm_prompt(kind, prompt, structured)
+
+    def run(job):
+        if future is not None:
+            try:
+                return future.result()
+            except Exception:
+                pass  # fall through to a fresh call
+        return query_llm(prompt, kind)
+    return run
+
+def batch_store(version):
+    """Batched answers not shown yet, and the sections already served, for this code version."""
+    store = st.session_state.get("batch_results")
+    if store is None or store["version"] != version:
+        store = st.session_state["batch_results"] = {"version": version, "results": {}, "served": set()}
+    return store
+
+def waiting_batch_answer(section_id, prompt_type, version, structured=False):
+    """
+    Answer for `section_id` left by an earlier batched call on this code
+    version, or None. Either way the section now counts as served.
+    """
+    store = batch_store(version)
+    raw = store["results"].pop(section_id, None)
+    store["served"].add(section_id)
+    telemetry.record_cache("batch", raw is not None)
+    return finish_answer(prompt_type, raw, version, structured) if raw is not None else None
+
+def batch_job(section, siblings, version, code, outline, single_prompt, structured=False, enabled=True):
+    """
+    Job body for one analysis `section` = (section_id, prompt_type, params).
+    When batching is on, the sibling analyses of the same code that have not
+    been shown yet ride along in one call (core.hf_llm.query_batch). Falls
+    back to `single_prompt` when there is nothing to batch or the response
+    lacks the section. Returns (raw, {other section_id: raw}); see
+    finish_batch.
+    """
+    store = batch_store(version)
+    section_id, prompt_type, _ = section
+    pending = [section] + [s for s in siblings
+                           if s[0] != section_id and s[0] not in store["served"] and s[0] not in store["results"]]
+    pending = pending if enabled else [section]
+    prompt = llm_prompt(prompt_type, single_prompt, structured)
+
+    def run(job):
+        answers = {}
+        if len(pending) > 1:
+            try:
+                answers = query_batch(code, outline, pending, structured)
+            except Exception:
+                answers = {}
+        raw = answers.pop(section_id, None)
+        return (raw if raw is not None else query_llm(prompt, prompt_type)), answers
+    return run
+
+def finish_batch(result, prompt_type, version, structured=False):
+    """Keep a batch job's other answers until clicked and return its own, as shown."""
+    raw, answers = result
+    store = batch_store(version)
+    store["results"].update({k: v for k, v in answers.items() if k not in store["served"]})
+    return finish_answer(prompt_type, raw, version, structured)
+
+def _flag_regenerate(kind):
+    st.session_state[f"regenerate_{kind}"] = True
+
+def requested(kind, clicked):
+    """
+    A tab's button click, or a click on "Regenerate" under a reused answer
+    (which reruns the script with the button itself unclicked).
+    Returns (run, fresh) where `fresh` skips the snippet index.
+    """
+    fresh = st.session_state.pop(f"regenerate_{kind}", False)
+    return clicked or fresh, fresh
+
+def indexed_answer(kind, code, lang, mode, fresh=False):
+    """
+    Stored answer for `kind` from the near-duplicate snippet index when a
+    structurally similar snippet was analysed before (shown with a
+    Regenerate button), or None. `fresh` skips the lookup.
+    """
+    if fresh:
+        return None
+    match = snippet_index.lookup(code, lang, f"{kind}:{mode}")
+    if not match:
+        return None
+    col_note, col_btn = st.columns([4, 1])
+    col_note.caption(
+        "♻️ Same structure as a snippet analysed before — stored answer shown instantly."
+        if match["exact"] else
+        f"♻️ {match['similarity']:.0%} similar to a snippet analysed before — stored answer shown instantly. "
+        "Names in it may differ from yours."
+    )
+    col_btn.button("🔄 Regenerate", key=f"regenerate_btn_{kind}", on_click=_flag_regenerate, args=(kind,))
+    return match["text"]
+
+def index_answer(kind, code, lang, mode, response):
+    """Store a new answer in the snippet index (errors are not stored) and return it."""
+    if isinstance(response, str) and response.strip() and not response.startswith(("❌", "⏰")):
+        snippet_index.add(code, lang, f"{kind}:{mode}", response)
+    return response
+
+def question_bank_answer(kind, patterns, fresh=False):
+    """
+    Answer for an Interview button from the local question bank when the
+    code matches a known pattern, or None. "Fresh AI questions" skips it.
+    """
+    local = None if fresh else bank_answer(kind, patterns)
+    if local:
+        telemetry.incr("question_bank_hits")
+        col_note, col_btn = st.columns([4, 1])
+        col_note.caption(f"📚 Answered from the local question bank for "
+                         f"{' + '.join(PATTERNS[p] for p in bank_patterns(patterns))}.")
+        col_btn.button("✨ Fresh AI questions", key=f"regenerate_btn_{kind}",
+                       on_click=_flag_regenerate, args=(kind,))
+    return local
+
+def tab_answer(name, key, clicked, label, local, start, finish=lambda result: result):
+    """
+    The answer shown for one tab action on code version `key`. On a click,
+    `local()` may answer at once (question bank, snippet index, a waiting
+    batch answer); otherwise `start()` builds the job body, which runs as a
+    background "llm" job so the other tabs stay usable, and `finish(result)`
+    turns its result into the answer once, in the Streamlit thread. The
+    answer stays shown across reruns until the next click. Returns
+    (answer, first) where `first` is True the first time it is shown, or
+    (None, False).
+    """
+    answers = st.session_state.setdefault("tab_answers", {})
+    if clicked:
+        answers[name] = {"key": key, "answer": local(), "job": None}
+    entry = answers.get(name)
+    if entry is None or entry["key"] != key:
+        return None, False
+    if entry["answer"] is not None:
+        return entry["answer"], clicked
+    job = background_job("llm", name, key, start() if clicked else None, clicked, label)
+    if clicked:
+        entry["job"] = job.id
+    if job is None or job.id != entry["job"] or not job.done:
+        return None, False
+    if job.status == "error":
+        st.error(f"❌ {job.error}")
+        return None, False
+    if job.status != "done":
+        return None, False
+    entry["answer"] = finish(job.result)
+    return entry["answer"], True
+
+def reveal(text, first, enable_tts=False):
+    """Type an answer out the first time it is shown; later reruns show it at once."""
+    if first:
+        type_writer_effect(text, enable_tts=enable_tts)
+    else:
+        st.markdown(text)
+
+def summarize_chat(previous_summary, messages):
+    """Fold chat messages paged out of the window into the rolling summary."""
+    try:
+        return query_llm(prompts.chat_summary_prompt(previous_summary, messages), "chat_summary")
+    except QuotaExceeded:
+        return previous_summary  # the messages stay in the archive
+
+
+# Above this many visible nodes the tree shows markers only (labels stay in the hover text).
+MAX_LABELED_NODES = 300
+# The tree draws at most this many of the calls up to the current step (the most
+# recent ones) plus their ancestors, so each step reads a bounded slice of the trace.
+TREE_WINDOW = int(os.getenv("RECURSION_TREE_WINDOW", "400"))
+# Uploaded trace files are kept here so they can be memory-mapped.
+TRACE_DIR = os.getenv("TRACE_DIR", os.path.join(".explainmate", "traces"))
+# Total size kept in TRACE_DIR; least recently opened files are removed first.
+TRACE_DIR_MAX_MB = int(os.getenv("TRACE_DIR_MAX_MB", "512"))
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def _literal_or_text(text):
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+def _evict_traces(keep):
+    """Keep TRACE_DIR under TRACE_DIR_MAX_MB, dropping least recently opened files other than `keep`."""
+    try:
+        entries = [os.path.join(TRACE_DIR, name) for name in os.listdir(TRACE_DIR) if name.endswith(FILE_SUFFIX)]
+        entries = sorted(((os.path.getmtime(p), os.path.getsize(p), p) for p in entries), reverse=True)
+    except OSError:
+        return
+    total = 0
+    for _, size, path in entries:
+        total += size
+        if total > TRACE_DIR_MAX_MB * 1024 * 1024 and path != keep:
+            try:
+                os.remove(path)  # an open mmap of it stays valid
+            except OSError:
+                pass
+
+def open_uploaded_trace(uploaded):
+    """
+    Store an uploaded trace under TRACE_DIR (named by content hash) and mmap
+    it. Files that fail validation are removed again.
+    """
+    data = uploaded.getvalue()
+    if len(data) > TRACE_DIR_MAX_MB * 1024 * 1024:
+        raise OSError(f"Trace file is larger than the {TRACE_DIR_MAX_MB} MB limit (TRACE_DIR_MAX_MB).")
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    path = os.path.join(TRACE_DIR, hashlib.sha256(data).hexdigest()[:24] + FILE_SUFFIX)
+    if os.path.exists(path):
+        os.utime(path)  # mark as recently used
+    else:
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+    try:
+        trace = TraceFile(path)
+    except TraceFormatError:
+        os.remove(path)
+        raise
+    _evict_traces(path)
+    return trace
+
+def set_rec_calls(calls):
+    """Make `calls` the trace being stepped through, closing a previously opened trace file."""
+    previous = st.session_state.get("rec_calls")
+    if isinstance(previous, TraceFile) and previous is not calls:
+        previous.close()
+    st.session_state["rec_calls"] = calls
+
+def render_trace_files():
+    """Save the current trace as a binary trace file, or reopen one without re-running code."""
+    col_save, col_open = st.columns(2)
+    with col_open:
+        uploaded = st.file_uploader("📂 Open trace file", type=[FILE_SUFFIX.lstrip(".")], key="rec_trace_file")
+        if uploaded is not None and st.session_state.get("rec_trace_upload") != uploaded.file_id:
+            st.session_state["rec_trace_upload"] = uploaded.file_id
+            try:
+                trace = open_uploaded_trace(uploaded)
+            except (OSError, TraceFormatError) as e:
+                st.error(f"❌ Could not open trace: {e}")
+            else:
+                set_rec_calls(trace)
+                st.session_state["rec_func"] = trace.func_name
+                st.session_state["rec_input"] = _literal_or_text(trace.input_repr)
+                st.session_state["rec_traced_code"] = trace.code
+                st.session_state["rec_step"] = 1
+                st.success(f"✅ Loaded {len(trace):,} calls of {trace.func_name}({trace.input_repr}).")
+    calls = st.session_state.get("rec_calls")
+    if calls is None:
+        return
+    with col_save:
+        func_name, input_val = st.session_state["rec_func"], st.session_state["rec_input"]
+        if isinstance(calls, TraceFile):
+            data = lambda: _read_bytes(calls.path)
+        else:
+            code_text = st.session_state.get("rec_traced_code", "")
+            data = lambda: trace_bytes(calls, func_name, repr(input_val), code_text)
+        st.download_button(
+            "💾 Save trace", data, file_name=f"{func_name}{FILE_SUFFIX}",
+            mime="application/octet-stream", use_container_width=True,
+            help="Compact binary trace (argument previews, not full values) that can be reopened here."
+        )
+
+def render_full_values(call):
+    """Materialize the full argument/result values of the selected call only."""
+    args, result = call[0], call[4]
+    if not any(isinstance(v, LazyArg) for v in (*args, result)):
+        return
+    with st.expander("🔎 Full argument & result values"):
+        for i, a in enumerate(args):
+            note = " _(mutated after this call — showing current state)_" if isinstance(a, LazyArg) and a.changed else ""
+            st.markdown(f"**arg {i + 1}**{note}")
+            st.code(full_value(a), language="python")
+        st.markdown("**result**")
+        st.code(full_value(result), language="python")
+
+MEMO_METRICS = [("calls", "Calls"), ("unique_states", "Unique states"),
+                ("wall_ms", "Wall time (ms)"), ("peak_kb", "Extra peak memory (KB)")]
+
+def create_memo_chart(sim):
+    """Side-by-side bars: the function as written vs. with argument-keyed caching."""
+    fig = make_subplots(rows=1, cols=len(MEMO_METRICS), subplot_titles=[title for _, title in MEMO_METRICS])
+    for col, (metric, _) in enumerate(MEMO_METRICS, start=1):
+        for mode, label, color in (("plain", "As written", "#e4572e"), ("memo", "Memoized", "#29bf12")):
+            run = sim[mode]
+            value = run[metric]
+            text = f"{value:,.1f}" if isinstance(value, float) else f"{value:,}"
+            if run["status"] == "timeout":
+                text = "≥ " + text
+            fig.add_trace(go.Bar(x=[label], y=[value], name=label, marker_color=color, text=[text],
+                                 textposition="auto", showlegend=col == 1), row=1, col=col)
+    fig.update_layout(height=340, margin=dict(l=10, r=10, t=50, b=10),
+                      plot_bgcolor="#0d0d0d", paper_bgcolor="#0d0d0d", font=dict(color="white"))
+    return fig
+
+def render_memo_simulation(code, func_name, input_val):
+    """
+    Run the traced function as written and with transparent caching, each in
+    its own sandboxed process, and compare what memoization actually saves.
+    Both runs go through the "run" job pool, so the page stays usable.
+    """
+    clicked = st.button("🧪 Simulate memoization", help="Runs the function twice in isolated processes: "
+                                                        "as written and with every call cached on its arguments.")
+
+    def _memo_job(job, source=code, name=func_name, value=input_val):
+        return simulate_memoization(source, name, value)
+
+    job = background_job("run", "memo_sim", code_key(f"{func_name}\0{input_val!r}\0{code}", "memo_sim"),
+                         _memo_job, clicked, "Running both versions")
+    if job is not None and job.status == "error":
+        st.error(f"❌ {job.error}")
+    if job is None or job.status != "done":
+        return
+    sim = job.result
+    plain, memo = sim["plain"], sim["memo"]
+    for label, run in (("As written", plain), ("Memoized", memo)):
+        if run["status"] in ("failed", "error"):
+            st.error(f"❌ {label}: {run['error']}")
+    if plain["status"] == "timeout":
+        st.warning(f"⏰ The version as written was stopped after {plain['wall_ms'] / 1000:.1f}s — "
+                   "its numbers are lower bounds.")
+    if plain["status"] == "failed" or memo["status"] == "failed":
+        return
+    if sim["speedup"]:
+        saved = plain["calls"] - memo["calls"]
+        bound = "at least " if plain["status"] == "timeout" else ""
+        st.success(f"⚡ Memoization is {bound}**{sim['speedup']:,.1f}×** faster here and skips "
+                   f"{bound}{saved:,} of {plain['calls']:,} calls ({plain['unique_states']:,} unique states).")
+    if sim["same_result"] is False:
+        st.warning("⚠️ The cached version returned a different result — the function depends on more than "
+                   "its arguments (mutated inputs, globals), so plain memoization is not safe for it.")
+    if memo["uncacheable"]:
+        st.caption(f"ℹ️ {memo['uncacheable']:,} calls had arguments that could not be used as a cache key.")
+    st.plotly_chart(create_memo_chart(sim), use_container_width=True)
+
+def tree_window(calls, step, window=TREE_WINDOW):
+    """
+    The calls drawn at `step`: the last `window` calls up to and including
+    calls[step-1], plus every ancestor of those so the tree stays connected.
+    Calls are read one by one by index, so a TraceFile only decodes these.
+    Returned in call order.
+    """
+    shown = {i: calls[i] for i in range(max(0, step - window), step)}
+    for idx in list(shown):
+        parent = shown[idx][3]
+        while parent is not None and parent not in shown:
+            shown[parent] = calls[parent]
+            parent = shown[parent][3]
+    return [shown[i] for i in sorted(shown)]
+
 def create_recursion_tree(func_name, input_val, calls, step):
     """
     Build a static Plotly graph showing the recursion tree up to `step` calls.
-    The currently-added node (calls[step-1]) is highlighted in red.
+    The currently-added node (calls[step-1]) is highlighted in red. Past
+    TREE_WINDOW calls only the most recent ones and their ancestors are
+    drawn (see tree_window), so stepping through huge traces stays cheap.
     """
     if not calls or step < 1:
         return None
 
     step = min(step, len(calls))
-    visible = calls[:step]
+    visible = tree_window(calls, step)
+    windowed = len(visible) < step
 
-    # Build position/label arrays for visible nodes
+    # Build position/label arrays for visible nodes. x is the rank among the
+    # drawn calls (equal to the call index when the whole tree is drawn).
     node_x, node_y, labels, hover_texts, colors, sizes = [], [], [], [], [], []
     idx_to_pos = {}   # call index → position in visible list
 
     for pos, (args, depth, idx, parent_idx, result, memoized) in enumerate(visible):
         idx_to_pos[idx] = pos
-        node_x.append(idx)
+        node_x.append(pos)
         node_y.append(-depth)
 
         args_str = ", ".join(str(a) for a in args)
         label = f"{func_name}({args_str})"
         hover = f"{func_name}({args_str}) = {result}"
         if memoized:
-            hover += "<br>Memoized: Yes"
+            hover += "<br>Repeated state: a memo would skip this call"
         labels.append(label)
         hover_texts.append(hover)
 
-        is_current = (pos == step - 1)
+        is_current = (idx == step - 1)
         colors.append("red" if is_current else f"hsl({depth * 60 % 360}, 70%, 50%)")
         sizes.append(35 if is_current else 25)
 
@@ -229,7 +1001,7 @@ def create_recursion_tree(func_name, input_val, calls, step):
 
     node_trace = go.Scatter(
         x=node_x, y=node_y,
-        mode="markers+text",
+        mode="markers+text" if len(visible) <= MAX_LABELED_NODES else "markers",
         text=labels,
         textposition="bottom center",
         hoverinfo="text",
@@ -245,13 +1017,15 @@ def create_recursion_tree(func_name, input_val, calls, step):
         hoverinfo="none"
     )
 
-    all_y = [-c[1] for c in calls]   # full depth range for stable axes
+    # Full depth range for stable axes; trace files store it in their header.
+    max_depth = calls.max_depth if isinstance(calls, TraceFile) else max(c[1] for c in calls)
     fig = go.Figure(
         data=[edge_trace, node_trace],
         layout=go.Layout(
             title=dict(
                 text=f"Recursion Tree — {func_name}({input_val})  "
-                     f"(Step {step}/{len(calls)})",
+                     f"(Step {step}/{len(calls)})"
+                     + (f"  · last {TREE_WINDOW} calls and their ancestors" if windowed else ""),
                 font=dict(size=18, color="white"),
                 x=0.5, xanchor="center"
             ),
@@ -259,9 +1033,9 @@ def create_recursion_tree(func_name, input_val, calls, step):
             plot_bgcolor="#0d0d0d",
             paper_bgcolor="#0d0d0d",
             xaxis=dict(showgrid=False, zeroline=False, visible=False,
-                       range=[-0.5, len(calls) - 0.5]),
+                       range=[-0.5, (len(visible) if windowed else len(calls)) - 0.5]),
             yaxis=dict(showgrid=False, zeroline=False, visible=False,
-                       range=[min(all_y) - 1, 1]),
+                       range=[-max_depth - 1, 1]),
             margin=dict(l=10, r=10, t=60, b=10),
             annotations=[annotation]
         )
@@ -277,6 +1051,8 @@ def run_app():
     )
     # Inject CSS immediately after set_page_config (must be first Streamlit call)
     st.markdown(_APP_CSS, unsafe_allow_html=True)
+    # LLM calls and code runs from this rerun count against this user's quota.
+    scheduler.bind(get_session_id(), get_client_ip())
     
     # ── Sidebar ────────────────────────────────────────────────────────────────
     with st.sidebar:
@@ -288,6 +1064,24 @@ def run_app():
         if enable_tts:
             st.success("🎵 TTS active")
 
+        structured = st.checkbox(
+            "🧩 Structured output (JSON)", value=False,
+            help="Ask for schema-constrained JSON: shorter answers, fields render as they "
+                 "arrive, and edge cases / bugs / Q&A are kept as records"
+        )
+
+        enable_prefetch = st.checkbox(
+            "⚡ Prefetch analyses", value=False,
+            help="Once the code stops changing, start Explanation / Complexity / Bugs "
+                 "in the background so clicking the tab is instant"
+        )
+
+        enable_batching = st.checkbox(
+            "📦 Batch related analyses", value=True,
+            help="One click on an Interview button, What-If scenario, Edge Cases or Bugs also "
+                 "answers its related analyses in the same LLM call, so they open instantly"
+        )
+
         st.divider()
         st.markdown("## 🌐 Language")
         languages = [
@@ -300,6 +1094,28 @@ def run_app():
                                       label_visibility="collapsed")
         st.caption(f"✅ Active: **{selected_lang.upper()}**")
 
+        st.divider()
+        with st.expander("📡 Model Routing"):
+            st.caption("Rolling p95 per tier vs its SLO, and per-prompt-type stats.")
+            st.dataframe(
+                [{"tier": name, **s} for name, s in router.tier_stats().items()],
+                use_container_width=True, hide_index=True
+            )
+            route_stats = router.route_stats()
+            if route_stats:
+                st.dataframe(
+                    [{"prompt_type": name, **s, "tiers": str(s["tiers"])}
+                     for name, s in route_stats.items()],
+                    use_container_width=True, hide_index=True
+                )
+            else:
+                st.caption("No LLM calls yet.")
+
+        show_perf = st.checkbox("📊 Performance Panel", value=False,
+                                help="Per-stage latency, cache hit rates and in-flight work for this process")
+        # Filled at the end of the run so it includes this rerun's spans.
+        perf_panel = st.container() if show_perf else None
+
         st.divider()
         st.caption("ExplainMate v2.0 · Built with Streamlit")
         code = ""  # initialise before ace widget
@@ -342,21 +1158,35 @@ def run_app():
             max_chars=200
         )
 
-    if run_clicked:
-        if code.strip():
-            with st.spinner(f"Running {selected_lang.upper()} code…"):
-                output = run_code(selected_lang, code, stdin=stdin_data)
-            st.success("✅ Executed successfully")
-            st.code(output, language="text")
-        else:
-            st.warning("⚠️ Please paste code before running.")
+    if run_clicked and not code.strip():
+        st.warning("⚠️ Please paste code before running.")
+
+    def _run_job(job, lang=selected_lang, source=code, stdin=stdin_data):
+        # Local runs stream stdout/stderr into job.progress while the program runs.
+        return run_code(lang, source, stdin=stdin, on_output=lambda text: setattr(job, "progress", text or "…"))
+
+    run_job = background_job("run", "run", code_key(f"{code}\0{stdin_data}", selected_lang), _run_job,
+                             run_clicked and bool(code.strip()), f"Running {selected_lang.upper()} code")
+    if run_job is not None and run_job.status == "done":
+        st.success("✅ Executed successfully")
+        st.code(run_job.result, language="text")
+    elif run_job is not None and run_job.status == "error":
+        st.error(f"❌ {run_job.error}")
+
+    with st.expander("🧪 Test Matrix — run many stdin / expected-output cases at once"):
+        render_test_matrix(code, selected_lang)
+
+    with st.expander("🗂️ Project Context — callers and callees from the surrounding repository"):
+        project_context, project_symbols, project_index = render_project_index(code, selected_lang)
 
     if follow_up:
         if st.button("💭 Ask", type="secondary"):
             if code.strip():
                 with st.spinner("Thinking…"):
                     _outline, _ = prepare_outline(code, selected_lang)
-                    response = query_llm(prompts.followup_prompt(code, follow_up, _outline))
+                    if project_context:
+                        _outline = f"{_outline}\n\n{project_context}"
+                    response = ask_llm("followup", prompts.followup_prompt(code, follow_up, _outline), structured)
                 with st.expander("📝 Response", expanded=True):
                     type_writer_effect(response, enable_tts=enable_tts)
             else:
@@ -370,6 +1200,31 @@ def run_app():
     else:
         outline, complexity_hint = ("", "")
 
+    # The output mode is part of the version so toggling it invalidates prefetches;
+    # answers given with project context are stored apart from snippet-only ones.
+    output_mode = "json" if structured else "prose"
+    if project_context:
+        outline = f"{outline}\n\n{project_context}"
+        output_mode += ":project:" + hashlib.sha256(project_context.encode("utf-8")).hexdigest()[:12]
+    version = code_key(code, f"{selected_lang}:{output_mode}")
+
+    def _prefetch_task(kind, prompt):
+        if structured:
+            prompt = prompts.structured_prompt(kind, prompt)
+        return lambda: query_llm(prompt, kind)
+
+    def batched(section, siblings, single_prompt):
+        return batch_job(section, siblings, version, code, outline, single_prompt, structured, enable_batching)
+
+    if enable_prefetch and code.strip():
+        prefetcher.code_changed(get_session_id(), version, {
+            "explanation": _prefetch_task("explanation", prompts.explanation_prompt(code, outline, complexity_hint)),
+            "complexity":  _prefetch_task("complexity", prompts.complexity_prompt(code, outline, complexity_hint)),
+            "bug_finder":  _prefetch_task("bug_finder", prompts.bug_finder_prompt(code, outline)),
+        })
+    elif "session_id" in st.session_state:
+        prefetcher.cancel(get_session_id())
+
     _NO_CODE_MSG = """
     <div class='empty-state'>
         📋 <strong>No code detected.</strong><br>
@@ -389,16 +1244,66 @@ def run_app():
         if not code.strip():
             st.markdown(_NO_CODE_MSG, unsafe_allow_html=True)
         else:
-            if st.button("🔍 Generate Explanation", type="primary"):
-                with st.spinner("Explaining code…"):
-                    response = query_llm(prompts.explanation_prompt(code, outline, complexity_hint))
+            incremental = st.checkbox(
+                "♻️ Explain per definition — after an edit only changed functions are re-analyzed",
+                key="incremental_explain"
+            )
+            extra_aspects = st.multiselect(
+                "Also note for each definition", ["bugs", "complexity"], key="incremental_aspects"
+            ) if incremental else []
+            if incremental and structured:
+                st.caption("Per-definition mode returns prose; structured output applies to whole-file explanations.")
+            generate, fresh_explanation = requested("explanation", st.button("🔍 Generate Explanation", type="primary"))
+            explain_mode = "incremental" if incremental else "large" if is_large(code) else "whole"
+            if explain_mode == "large":
+                explanation, first = tab_answer(
+                    "explanation", f"{version}:large", generate, "Explaining a large file in chunks",
+                    lambda: None, lambda: large_explanation_job(code, selected_lang, outline)
+                )
+            elif explain_mode == "incremental":
+                aspects = ("explanation", *extra_aspects)
+                explanation, first = tab_answer(
+                    "explanation", f"{version}:incremental:{','.join(aspects)}", generate,
+                    "Explaining changed definitions", lambda: None,
+                    lambda: incremental_explanation_job(code, selected_lang, outline, complexity_hint, aspects)
+                )
+            else:
+                explanation, first = tab_answer(
+                    "explanation", f"{version}:whole", generate, "Explaining code",
+                    lambda: indexed_answer("explanation", code, selected_lang, output_mode, fresh_explanation),
+                    lambda: prefetch_job("explanation", version,
+                                         prompts.explanation_prompt(code, outline, complexity_hint), structured),
+                    lambda raw: index_answer("explanation", code, selected_lang, output_mode,
+                                             finish_answer("explanation", raw, version, structured))
+                )
+            if isinstance(explanation, str) and explain_mode != "whole":
+                st.warning(explanation)  # the request was over the LLM quota
+            elif explanation is not None:
+                report = explanation if explain_mode != "whole" else None
+                if explain_mode == "large":
+                    st.caption(
+                        f"📚 Large file ({code.count(chr(10)) + 1} lines) — explained in chunks, then summarized: "
+                        f"{report['llm_calls']} LLM call(s), {report['cached_calls']} reused from cache."
+                    )
+                elif explain_mode == "incremental":
+                    st.caption(
+                        f"♻️ Reused {report['reused']} of {len(report['units'])} definition(s) from cache, "
+                        f"queried {report['queried']}"
+                        + ("; file summary reused." if report["summary_cached"] else "; file summary re-stitched.")
+                    )
                 col_a, col_b = st.columns(2)
                 with col_a:
                     with st.expander("📜 Code Outline", expanded=True):
                         st.code(outline, language="text")
                 with col_b:
                     with st.expander("📝 Explanation", expanded=True):
-                        type_writer_effect(response, enable_tts=enable_tts)
+                        reveal(report["summary"] if report else explanation, first, enable_tts)
+                if explain_mode == "large":
+                    with st.expander("🗂️ Breakdown by class and section", expanded=False):
+                        render_large_breakdown(report)
+                elif explain_mode == "incremental":
+                    with st.expander("🧩 Per-definition notes", expanded=False):
+                        render_unit_notes(report["units"])
 
     # ── Tab 2 · Complexity ─────────────────────────────────────────────────────
     with tab2:
@@ -406,12 +1311,19 @@ def run_app():
         if not code.strip():
             st.markdown(_NO_CODE_MSG, unsafe_allow_html=True)
         else:
-            if st.button("📈 Analyze Complexity", type="primary"):
-                with st.spinner("Analyzing…"):
-                    response = query_llm(prompts.complexity_prompt(code, outline, complexity_hint))
+            analyze, fresh_complexity = requested("complexity", st.button("📈 Analyze Complexity", type="primary"))
+            response, first = tab_answer(
+                "complexity", version, analyze, "Analyzing complexity",
+                lambda: indexed_answer("complexity", code, selected_lang, output_mode, fresh_complexity),
+                lambda: prefetch_job("complexity", version,
+                                     prompts.complexity_prompt(code, outline, complexity_hint), structured),
+                lambda raw: index_answer("complexity", code, selected_lang, output_mode,
+                                         finish_answer("complexity", raw, version, structured))
+            )
+            if response is not None:
                 st.info(f"🧠 Quick estimate: **{complexity_hint}**")
                 with st.expander("🔍 Detailed AI Analysis", expanded=True):
-                    type_writer_effect(response, enable_tts=enable_tts)
+                    reveal(response, first, enable_tts)
 
     # ── Tab 3 · Interview ──────────────────────────────────────────────────────
     with tab3:
@@ -420,32 +1332,49 @@ def run_app():
             st.markdown(_NO_CODE_MSG, unsafe_allow_html=True)
         else:
             st.caption("Choose a question style — each generates a fresh set of interview questions.")
-            c1, c2, c3, c4 = st.columns(4)
-            btn_std  = c1.button("🧠 Standard Q&A",   type="secondary", use_container_width=True)
-            btn_diff = c2.button("📊 By Difficulty",   type="secondary", use_container_width=True)
-            btn_wb   = c3.button("📋 Whiteboard",      type="secondary", use_container_width=True)
-            btn_to   = c4.button("⚖️ Trade-Offs",      type="secondary", use_container_width=True)
-
-            if btn_std:
-                with st.spinner("Generating Standard Q&A…"):
-                    response = query_llm(prompts.interview_prompt(code, outline))
-                with st.expander("Questions & Answers", expanded=True):
-                    type_writer_effect(response, enable_tts=enable_tts)
-            if btn_diff:
-                with st.spinner("Generating Difficulty-based Questions…"):
-                    response = query_llm(prompts.difficulty_based_questions_prompt(code, outline))
-                with st.expander("Easy / Medium / Hard", expanded=True):
-                    type_writer_effect(response, enable_tts=enable_tts)
-            if btn_wb:
-                with st.spinner("Preparing Whiteboard Mock…"):
-                    response = query_llm(prompts.whiteboard_questions_prompt(code, outline))
-                with st.expander("Whiteboard Mock Session", expanded=True):
-                    type_writer_effect(response, enable_tts=enable_tts)
-            if btn_to:
-                with st.spinner("Analyzing Trade-Offs…"):
-                    response = query_llm(prompts.tradeoff_explanation_prompt(code, outline))
-                with st.expander("Trade-Off Analysis", expanded=True):
-                    type_writer_effect(response, enable_tts=enable_tts)
+            patterns = detect_patterns(code, selected_lang)
+            if patterns:
+                st.caption("🧩 Detected pattern: " + ", ".join(
+                    f"**{p['name']}** ({'; '.join(p['evidence'][:2])})" for p in patterns[:2]
+                ))
+            # Buttons the question bank answers locally stay out of the batch.
+            interview_group = [
+                (kind, kind, {})
+                for kind in ("interview", "difficulty_based_questions", "whiteboard_questions", "tradeoff_explanation")
+                if not (kind in BANK_KINDS and bank_answer(kind, patterns))
+            ]
+            interview_buttons = [
+                # kind, button, status label, expander title, prompt
+                ("interview", "🧠 Standard Q&A", "Generating Standard Q&A", "Questions & Answers",
+                 prompts.interview_prompt),
+                ("difficulty_based_questions", "📊 By Difficulty", "Generating Difficulty-based Questions",
+                 "Easy / Medium / Hard", prompts.difficulty_based_questions_prompt),
+                ("whiteboard_questions", "📋 Whiteboard", "Preparing Whiteboard Mock", "Whiteboard Mock Session",
+                 prompts.whiteboard_questions_prompt),
+                ("tradeoff_explanation", "⚖️ Trade-Offs", "Analyzing Trade-Offs", "Trade-Off Analysis",
+                 prompts.tradeoff_explanation_prompt),
+            ]
+            clicks = [requested(kind, column.button(button, type="secondary", use_container_width=True))
+                      for (kind, button, *_), column in zip(interview_buttons, st.columns(4))]
+
+            for (kind, _, label, title, build_prompt), (clicked, fresh) in zip(interview_buttons, clicks):
+                def _local(kind=kind, fresh=fresh):
+                    local = (question_bank_answer(kind, patterns, fresh)
+                             or indexed_answer(kind, code, selected_lang, output_mode, fresh))
+                    if local:
+                        return local
+                    waiting = waiting_batch_answer(kind, kind, version, structured)
+                    return waiting and index_answer(kind, code, selected_lang, output_mode, waiting)
+                response, first = tab_answer(
+                    kind, version, clicked, label, _local,
+                    lambda kind=kind, build_prompt=build_prompt: batched((kind, kind, {}), interview_group,
+                                                                         build_prompt(code, outline)),
+                    lambda result, kind=kind: index_answer(kind, code, selected_lang, output_mode,
+                                                           finish_batch(result, kind, version, structured))
+                )
+                if response is not None:
+                    with st.expander(title, expanded=True):
+                        reveal(response, first, enable_tts)
     
     # ── Tab 4 · Edge Cases ─────────────────────────────────────────────────────
     with tab4:
@@ -454,11 +1383,28 @@ def run_app():
             st.markdown(_NO_CODE_MSG, unsafe_allow_html=True)
         else:
             st.caption("Generates 5 edge test cases with inputs, expected outputs, and reasons.")
-            if st.button("🧪 Generate Edge Cases", type="primary"):
-                with st.spinner("Finding edge cases…"):
-                    response = query_llm(prompts.edge_case_prompt(code, outline))
+            edge_prompt = llm_prompt("edge_case", prompts.edge_case_prompt(code, outline), structured)
+            response, first = tab_answer(
+                "edge_case", version, st.button("🧪 Generate Edge Cases", type="primary"), "Finding edge cases",
+                lambda: None, lambda: lambda job, prompt=edge_prompt: query_llm(prompt, "edge_case"),
+                lambda raw: finish_answer("edge_case", raw, version, structured)
+            )
+            if response is not None:
                 with st.expander("Edge Case Report", expanded=True):
-                    type_writer_effect(response, enable_tts=enable_tts)
+                    reveal(response, first, enable_tts)
+
+            # Structured mode keeps the cases as records, so they can be executed
+            # — but only against the code version they were generated for.
+            record = st.session_state.get("structured_records", {}).get("edge_case")
+            edge_cases = record["data"] if record and record["version"] == version else None
+            if structured and edge_cases and edge_cases.get("cases"):
+                if st.button(f"▶️ Run the {len(edge_cases['cases'])} generated cases", type="secondary"):
+                    cases = [
+                        {"name": c["input"][:40] or f"case {i + 1}", "stdin": c["input"], "expected": c["expected"]}
+                        for i, c in enumerate(edge_cases["cases"])
+                    ]
+                    with st.spinner(f"Running {len(cases)} case(s)…"):
+                        render_matrix_results(run_matrix(selected_lang, code, cases))
 
     # ── Tab 5 · Bug Finder ─────────────────────────────────────────────────────
     with tab5:
@@ -467,11 +1413,15 @@ def run_app():
             st.markdown(_NO_CODE_MSG, unsafe_allow_html=True)
         else:
             st.caption("Scans for bugs, bad practices, missing edge case handling, and suggests fixes.")
-            if st.button("🔍 Hunt Bugs", type="primary"):
-                with st.spinner("Scanning for bugs…"):
-                    response = query_llm(prompts.bug_finder_prompt(code, outline))
+            response, first = tab_answer(
+                "bug_finder", version, st.button("🔍 Hunt Bugs", type="primary"), "Scanning for bugs",
+                lambda: None,
+                lambda: prefetch_job("bug_finder", version, prompts.bug_finder_prompt(code, outline), structured),
+                lambda raw: finish_answer("bug_finder", raw, version, structured)
+            )
+            if response is not None:
                 with st.expander("Bug Report & Fixes", expanded=True):
-                    type_writer_effect(response, enable_tts=enable_tts)
+                    reveal(response, first, enable_tts)
 
     # ── Tab 6 · Optimize ──────────────────────────────────────────────────────
     with tab6:
@@ -480,11 +1430,29 @@ def run_app():
             st.markdown(_NO_CODE_MSG, unsafe_allow_html=True)
         else:
             st.caption("Suggests a faster / more memory-efficient version with trade-off comparison.")
-            if st.button("🚀 Optimize Code", type="primary"):
-                with st.spinner("Optimizing…"):
-                    response = query_llm(prompts.optimization_prompt(code, outline))
+            profile = None
+            if selected_lang == "python":
+                with st.expander("⏱️ Profile Code — measure where a real run spends its time"):
+                    profile = render_profiler(code, stdin_data, version)
+            hotspots = format_hotspots(profile, code) if profile else ""
+            if hotspots:
+                st.caption("📌 Measured hotspots from the profile will be sent with the request.")
+            optimize_clicked = st.button("🚀 Optimize Code", type="primary")
+            optimize_prompt = prompts.optimization_prompt(code, outline, hotspots)
+            if structured:
+                optimize_prompt = prompts.structured_prompt("optimization", optimize_prompt)
+            optimize_job = background_job("llm", "optimization", version,
+                                          lambda job, prompt=optimize_prompt: query_llm(prompt, "optimization"),
+                                          optimize_clicked, "Optimizing")
+            if optimize_job is not None and optimize_job.status == "done":
+                response = finish_structured("optimization", optimize_job.result, version) if structured else optimize_job.result
                 with st.expander("Optimized Version", expanded=True):
-                    type_writer_effect(response, enable_tts=enable_tts)
+                    if first_view(optimize_job):
+                        type_writer_effect(response, enable_tts=enable_tts)
+                    else:
+                        st.markdown(response)
+            elif optimize_job is not None and optimize_job.status == "error":
+                st.error(f"❌ {optimize_job.error}")
 
     # ── Tab 7 · What-If ───────────────────────────────────────────────────────
     with tab7:
@@ -498,15 +1466,22 @@ def run_app():
                 ("🔁 Duplicate Values",   "What if there are duplicates?"),
                 ("📈 Pre-sorted Array",  "What if the array is sorted?"),
             ]
+            what_if_group = [(f"what_if_{i}", "followup", {"question": q}) for i, (_, q) in enumerate(common_questions)]
             for i, (label, q) in enumerate(common_questions):
                 with st.container(border=True):
                     col_q, col_btn = st.columns([5, 1])
                     col_q.markdown(f"**{label}** — _{q}_")
-                    if col_btn.button("Analyze", key=f"what_if_{i}", type="secondary"):
-                        with st.spinner(f"Analyzing: {q}"):
-                            response = query_llm(prompts.followup_prompt(code, q, outline))
+                    section = what_if_group[i]
+                    response, first = tab_answer(
+                        section[0], version, col_btn.button("Analyze", key=f"what_if_{i}", type="secondary"),
+                        f"Analyzing: {q}",
+                        lambda section=section: waiting_batch_answer(section[0], "followup", version, structured),
+                        lambda section=section, q=q: batched(section, what_if_group, prompts.followup_prompt(code, q, outline)),
+                        lambda result: finish_batch(result, "followup", version, structured)
+                    )
+                    if response is not None:
                         with st.expander(label, expanded=True):
-                            type_writer_effect(response, enable_tts=enable_tts)
+                            reveal(response, first, enable_tts)
     
     # ── Tab 8 · AI Assistant ───────────────────────────────────────────────────
     with tab8:
@@ -515,44 +1490,78 @@ def run_app():
         # ─ Voice input ──────────────────────────────────────────────────
         with st.expander("🎤 Voice-to-Text (click to expand)"):
             st.caption("Speak a question about your code and get an AI response.")
-            if st.button("🎤 Start Recording", type="secondary"):
+            def _voice_job(job, source=code, context=outline):
                 voice_input = voice_to_text()
-                if voice_input:
-                    st.chat_message("user").markdown(f"**Voice Input:** {voice_input}")
-                    with st.spinner("Responding…"):
-                        response = query_llm(prompts.followup_prompt(code, voice_input, outline))
-                    st.chat_message("assistant").markdown(response)
-                    if enable_tts:
-                        speak_text(response)
+                return voice_input, query_llm(prompts.followup_prompt(source, voice_input, context), "followup")
+
+            voice_job = background_job("voice", "voice", version, _voice_job,
+                                       st.button("🎤 Start Recording", type="secondary"), "Listening… speak now")
+            if voice_job is not None and voice_job.status == "done":
+                voice_input, response = voice_job.result
+                st.chat_message("user").markdown(f"**Voice Input:** {voice_input}")
+                st.chat_message("assistant").markdown(response)
+                if enable_tts and first_view(voice_job):
+                    speak_text(response)
+            elif voice_job is not None and voice_job.status == "error":
+                st.error(voice_job.error)
 
         # ─ Chat ────────────────────────────────────────────────────────
         col_chat_hdr, col_clear = st.columns([5, 1])
         col_chat_hdr.markdown("**💬 Chat with AI**")
+
+        # Only the recent window + a summary live in session state; older
+        # messages are paged out to the server-side store (core.chat_memory).
+        if "chat_memory" not in st.session_state:
+            st.session_state.chat_memory = ChatMemory(get_session_id())
+        memory = st.session_state.chat_memory
+
         if col_clear.button("Clear", type="secondary", key="clear_chat"):
-            st.session_state.messages = []
+            memory.clear()
             st.rerun()
 
-        if "messages" not in st.session_state:
-            st.session_state.messages = []
+        if memory.archived:
+            with st.expander(f"🗂️ {memory.archived} earlier message(s) archived"):
+                if memory.summary:
+                    st.markdown(f"**Summary used as context:**\n\n{memory.summary}")
+                if st.checkbox("Show the most recent archived messages", key="show_archived_chat"):
+                    for message in memory.earlier(limit=20):
+                        with st.chat_message(message["role"]):
+                            st.markdown(message["content"])
 
-        for message in st.session_state.messages:
+        for message in memory.window:
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
 
         if not code.strip():
             st.caption("⚠️ Paste code in the editor above for context-aware answers.")
 
-        if prompt := st.chat_input("Ask about the code…"):
-            st.session_state.messages.append({"role": "user", "content": prompt})
+        # Replies run as background jobs and join the conversation when they
+        # arrive; the input is disabled while one is pending.
+        pending_turn = st.session_state.get("chat_pending")
+        chat_fn = None
+        if prompt := st.chat_input("Ask about the code…", disabled=pending_turn is not None):
+            history, summary = list(memory.window), memory.summary
+            memory.add("user", prompt, summarize=summarize_chat)
             with st.chat_message("user"):
                 st.markdown(prompt)
-            with st.spinner("Thinking…"):
+            chat_prompt = prompts.conversation_prompt(code, prompt, outline, summary, history)
+            chat_fn = lambda job, p=chat_prompt: query_llm(p, "conversation")
+            pending_turn = st.session_state["chat_pending"] = str(st.session_state.get("chat_turn", 0) + 1)
+            st.session_state["chat_turn"] = int(pending_turn)
+        chat_job = (background_job("llm", "chat", pending_turn, chat_fn, chat_fn is not None, "Thinking")
+                    if pending_turn is not None else None)
+        if pending_turn is not None and chat_job is None:
+            del st.session_state["chat_pending"]  # the job expired
+        elif chat_job is not None and chat_job.done:
+            del st.session_state["chat_pending"]
+            if chat_job.status == "done":
                 with st.chat_message("assistant"):
-                    response = query_llm(prompts.followup_prompt(code, prompt, outline))
-                    st.markdown(response)
+                    st.markdown(chat_job.result)
                     if enable_tts:
-                        speak_text(response)
-            st.session_state.messages.append({"role": "assistant", "content": response})
+                        speak_text(chat_job.result)
+                memory.add("assistant", chat_job.result, summarize=summarize_chat)
+            elif chat_job.status == "error":
+                st.error(f"❌ {chat_job.error}")
     
     # ── Tab 9 · Viz Complexity ───────────────────────────────────────────────────
     with tab9:
@@ -596,7 +1605,8 @@ def run_app():
                 with sub_tab2:
                     col_graph1, col_graph2 = st.columns(2)
                     with col_graph1:
-                        graph_buffer, _, _ = generate_complexity_graph(code)
+                        with span("render", chart="complexity"):
+                            graph_buffer, _, _ = generate_complexity_graph(code)
                         st.image(graph_buffer, caption=f"Complexity Trade-off ({selected_lang})", use_container_width=True)
                     with col_graph2:
                         st.info("📊 Bar chart: Time vs Space comparison")
@@ -605,9 +1615,12 @@ def run_app():
                     if selected_lang == "python":
                         report = cyclomatic_complexity_report(code)
                         st.code(report, language="text")
-                        graph_buffer = generate_function_call_graph(code)
+                        extra_edges = [edge for sym in project_symbols for edge in project_index.call_edges(sym["fq"])]
+                        with span("render", chart="call_graph"):
+                            graph_buffer = generate_function_call_graph(code, extra_edges=extra_edges)
                         if graph_buffer:
-                            st.image(graph_buffer, caption="Function Call Graph", use_container_width=True)
+                            caption = "Function Call Graph" + (" (gray: project callers / callees)" if extra_edges else "")
+                            st.image(graph_buffer, caption=caption, use_container_width=True)
                     else:
                         st.info("🐍 Available only for Python.")
     
@@ -642,25 +1655,43 @@ def run_app():
             st.session_state["rec_code"] = recursion_code
             recursion_input = st.text_input("Input (e.g., 5 or 10):", "5")
 
-            if st.button("🎬 Trace Calls", type="primary"):
+            trace_clicked = st.button("🎬 Trace Calls", type="primary")
+            input_eval = None
+            if trace_clicked:
                 try:
                     input_eval = eval(recursion_input)
-                    with st.spinner("Tracing recursive calls..."):
-                        calls, error = execute_instrumented_code(recursion_code, input_eval)
+                except Exception as e:
+                    st.error(f"❌ Invalid input: {e}")
+                    trace_clicked = False
+
+            def _trace_job(job, source=recursion_code, value=input_eval):
+                with span("tracer"):
+                    calls, error = execute_instrumented_code(source, value)
+                return source, value, calls, error
+
+            trace_job = background_job("trace", "trace", code_key(f"{recursion_code}\0{recursion_input}", "trace"),
+                                       _trace_job, trace_clicked, "Tracing recursive calls")
+            # A finished trace is moved into the step-through state once.
+            if trace_job is not None and trace_job.done and st.session_state.get("rec_job") != trace_job.id:
+                st.session_state["rec_job"] = trace_job.id
+                if trace_job.status == "error":
+                    st.error(f"❌ {trace_job.error}")
+                elif trace_job.status == "done":
+                    traced_code, input_eval, calls, error = trace_job.result
+                    func_name = get_first_function_name(traced_code)
                     if error:
                         st.error(f"❌ {error}")
+                    elif not func_name:
+                        st.error("❌ No function found in the code.")
                     else:
-                        func_name = get_first_function_name(recursion_code)
-                        if not func_name:
-                            st.error("❌ No function found in the code.")
-                        else:
-                            st.session_state["rec_calls"] = calls
-                            st.session_state["rec_func"] = func_name
-                            st.session_state["rec_input"] = input_eval
-                            st.session_state["rec_step"] = 1
-                            st.success(f"✅ Traced {len(calls)} recursive calls!")
-                except Exception as e:
-                    st.error(f"❌ Invalid input: {e}")
+                        set_rec_calls(calls)
+                        st.session_state["rec_func"] = func_name
+                        st.session_state["rec_input"] = input_eval
+                        st.session_state["rec_traced_code"] = traced_code
+                        st.session_state["rec_step"] = 1
+                        st.success(f"✅ Traced {len(calls)} recursive calls!")
+
+            render_trace_files()
 
             # Step-through controls (only shown after tracing)
             if "rec_calls" in st.session_state:
@@ -699,22 +1730,36 @@ def run_app():
                     with col_info:
                         cur = calls[step - 1]
                         args_str = ", ".join(str(a) for a in cur[0])
-                        memo_tag = " 🔁 (memoized)" if cur[5] else ""
+                        memo_tag = " 🔁 (repeated state)" if cur[5] else ""
                         st.info(
                             f"**{func_name}({args_str})** → `{cur[4]}`{memo_tag}  "
                             f"| depth {cur[1]}"
                         )
+                    render_full_values(cur)
                 else:
                     cur = calls[0]
                     args_str = ", ".join(str(a) for a in cur[0])
                     st.info(f"**{func_name}({args_str})** → `{cur[4]}` | depth {cur[1]}")
+                    render_full_values(cur)
 
-                fig = create_recursion_tree(func_name, input_val, calls, step=step)
+                with span("render", chart="recursion_tree"):
+                    fig = create_recursion_tree(func_name, input_val, calls, step=step)
                 if fig:
                     st.plotly_chart(fig, use_container_width=True, height=680)
                 else:
                     st.error("❌ Tree generation failed.")
+
+                st.markdown("#### 🧪 What would memoization save?")
+                render_memo_simulation(st.session_state.get("rec_traced_code", recursion_code), func_name, input_val)
     
+    pending = jobs.pending(get_session_id())
+    if pending:
+        poll_jobs(get_session_id(), [job.id for job in pending])
+
+    if perf_panel is not None:
+        with perf_panel:
+            render_performance_panel()
+
     # Footer
     # ── Footer ───────────────────────────────────────────────────────────────
     st.divider()
@@ -725,6 +1770,7 @@ def run_app():
         unsafe_allow_html=True
     )
 
+@traced("prepare_outline")
 def prepare_outline(code_text, lang):
     if lang != "python":
         return generate_outline(code_text, lang=lang), "Heuristic applied."
@@ -732,21 +1778,20 @@ def prepare_outline(code_text, lang):
     complexity_hint = guess_time_complexity(code_text)
     return outline, complexity_hint
 
+@traced("voice_to_text")
 def voice_to_text():
+    """Record one question from the microphone. Runs as a background job, so failures are raised."""
     r = sr.Recognizer()
     with sr.Microphone() as source:
-        with st.spinner("Listening... Speak now!"):
-            try:
-                audio = r.listen(source, timeout=5, phrase_time_limit=20)
-                text = r.recognize_google(audio)
-                return text
-            except sr.WaitTimeoutError:
-                st.warning("⏰ Timeout. Try again.")
-            except sr.UnknownValueError:
-                st.error("🤷 Could not understand.")
-            except sr.RequestError as e:
-                st.error(f"🌐 Error: {e}")
-    return ""
+        try:
+            audio = r.listen(source, timeout=5, phrase_time_limit=20)
+            return r.recognize_google(audio)
+        except sr.WaitTimeoutError:
+            raise RuntimeError("⏰ Timeout. Try again.")
+        except sr.UnknownValueError:
+            raise RuntimeError("🤷 Could not understand.")
+        except sr.RequestError as e:
+            raise RuntimeError(f"🌐 Error: {e}")
 
 if __name__ == "__main__":
     run_app()
\ No newline at end of file
@@ -0,0 +1,330 @@
+"""
+Micro-benchmarks for the analysis utilities across input sizes.
+
+Usage:
+    python -m benchmarks.bench_analysis                       # run + print table
+    python -m benchmarks.bench_analysis --save benchmarks/baselines/analysis.json
+    python -m benchmarks.bench_analysis --compare benchmarks/baselines/analysis.json --threshold 0.25
+
+For every function and input size the best-of-N wall time and the peak
+traced memory (tracemalloc) are recorded. `growth` is the fitted log-log
+slope of time vs. size: ~1.0 means linear, ~2.0 quadratic. With --compare,
+any case slower than baseline by more than --threshold is flagged and the
+process exits with status 1.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 50000]
+DEFAULT_RECURSION_SIZES = [5, 10, 15, 20]
+
+
+# ── Synthetic inputs ──────────────────────────────────────────────────────────
+_PY_BLOCK = '''def func_{i}(items, target):
+    total = 0
+    seen = set()
+    for x in items:
+        for y in items:
+            if x + y == target and x not in seen:
+                seen.add(x)
+                total += func_{j}(items[1:], target) if len(items) > 3 else 0
+    data = sorted(items)
+    lookup = {{k: v for k, v in enumerate(data)}}
+    return total + len(lookup)
+
+'''
+
+_C_BLOCK = '''int func_{i}(int *items, int n, int target) {{
+    int total = 0;
+    int buf[64];
+    for (int a = 0; a < n; a++) {{
+        for (int b = 0; b < n; b++) {{
+            if (items[a] + items[b] == target) {{
+                total += func_{j}(items + 1, n - 1, target);
+            }}
+        }}
+    }}
+    while (total > 100) {{ total /= 2; }}
+    return total + buf[0];
+}}
+
+'''
+
+_MD_BLOCK = '''## Step {i}
+The **function** `func_{i}` iterates over the list with a for loop -> O(n).
+- if x == target: return early
+- else: recurse via [link](https://example.com/{i})
+```python
+def f(x): return x * 2
+```
+'''
+
+
+def _repeat_block(block: str, lines: int) -> str:
+    block_lines = block.count("\n")
+    n_blocks = max(1, math.ceil(lines / block_lines))
+    parts = [block.format(i=i, j=(i + 1) % n_blocks) for i in range(n_blocks)]
+    return "".join(parts)
+
+
+def make_python_source(lines: int) -> str:
+    """Roughly `lines` lines of Python with nested loops, recursion, sets and dicts."""
+    return _repeat_block(_PY_BLOCK, lines)
+
+
+def make_c_source(lines: int) -> str:
+    """Roughly `lines` lines of C-like code with nested loops and recursion."""
+    return _repeat_block(_C_BLOCK, lines)
+
+
+def make_markdown(lines: int) -> str:
+    """Roughly `lines` lines of LLM-style markdown for the TTS preprocessor."""
+    return _repeat_block(_MD_BLOCK, lines)
+
+
+RECURSIVE_FIB = '''def fib(n):
+    if n <= 1:
+        return n
+    return fib(n - 1) + fib(n - 2)
+'''
+
+MERGE_SORT = '''def merge_sort(items):
+    if len(items) <= 1:
+        return items
+    mid = len(items) // 2
+    left, right = merge_sort(items[:mid]), merge_sort(items[mid:])
+    merged, i, j = [], 0, 0
+    while i < len(left) and j < len(right):
+        if left[i] <= right[j]:
+            merged.append(left[i]); i += 1
+        else:
+            merged.append(right[j]); j += 1
+    return merged + left[i:] + right[j:]
+'''
+
+
+# ── Benchmark registry ────────────────────────────────────────────────────────
+# name → (setup(size) -> callable, sizes_kind, max_size)
+# setup does the imports so a missing optional dependency only skips that case.
+def _bench_generate_outline(size):
+    from utils.utils_ast import generate_outline
+    code = make_python_source(size)
+    return lambda: generate_outline(code, lang="python")
+
+
+def _bench_generate_outline_generic(size):
+    from utils.utils_ast import generate_outline
+    code = make_c_source(size)
+    return lambda: generate_outline(code, lang="cpp")
+
+
+def _bench_guess_time_complexity(size):
+    from utils.utils_complexity import guess_time_complexity
+    code = make_c_source(size)
+    return lambda: guess_time_complexity(code)
+
+
+def _bench_heuristic_time_advanced(size):
+    from utils.utils_complexity_advanced import heuristic_time_complexity
+    code = make_c_source(size)
+    return lambda: heuristic_time_complexity(code)
+
+
+def _bench_heuristic_time_generic(size):
+    from utils.utils_complexity_generic import heuristic_time_complexity
+    code = make_c_source(size)
+    return lambda: heuristic_time_complexity(code)
+
+
+def _bench_heuristic_space(size):
+    from utils.utils_complexity_generic import heuristic_space_complexity
+    code = make_python_source(size)
+    return lambda: heuristic_space_complexity(code)
+
+
+def _bench_cyclomatic(size):
+    from utils.utils_complexity_advanced import cyclomatic_complexity_report
+    code = make_python_source(size)
+    return lambda: cyclomatic_complexity_report(code)
+
+
+def _bench_call_graph(size):
+    from utils.utils_complexity_advanced import generate_function_call_graph
+    code = make_python_source(size)
+    return lambda: generate_function_call_graph(code)
+
+
+def _bench_tts_preprocess(size):
+    from app import preprocess_text_for_tts
+    text = make_markdown(size)
+    return lambda: preprocess_text_for_tts(text)
+
+
+def _bench_instrumented_merge_sort(size):
+    import random
+    from utils.utils_ast import execute_instrumented_code
+    data = random.Random(size).sample(range(size * 10), size)
+    return lambda: execute_instrumented_code(MERGE_SORT, [data])
+
+
+def _bench_instrumented_fib(size):
+    from utils.utils_ast import execute_instrumented_code
+    return lambda: execute_instrumented_code(RECURSIVE_FIB, size)
+
+
+BENCHMARKS = {
+    "generate_outline[python]":            (_bench_generate_outline,        "lines", None),
+    "generate_outline[c]":                 (_bench_generate_outline_generic, "lines", None),
+    "guess_time_complexity":               (_bench_guess_time_complexity,   "lines", None),
+    "heuristic_time_complexity[advanced]": (_bench_heuristic_time_advanced, "lines", None),
+    "heuristic_time_complexity[generic]":  (_bench_heuristic_time_generic,  "lines", None),
+    "heuristic_space_complexity":          (_bench_heuristic_space,         "lines", None),
+    "cyclomatic_complexity_report":        (_bench_cyclomatic,              "lines", None),
+    # spring_layout + matplotlib rendering is quadratic in the node count;
+    # capped so a default run finishes in reasonable time.
+    "generate_function_call_graph":        (_bench_call_graph,              "lines", 10000),
+    "preprocess_text_for_tts":             (_bench_tts_preprocess,          "lines", None),
+    "execute_instrumented_code[fib]":      (_bench_instrumented_fib,        "recursion", None),
+    "execute_instrumented_code[merge_sort]": (_bench_instrumented_merge_sort, "lines", None),
+}
+
+
+# ── Measurement ───────────────────────────────────────────────────────────────
+def measure(fn, repeat: int = 3) -> dict:
+    """Best-of-`repeat` wall time and the peak traced memory of one extra run."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"time_ms": round(best * 1000, 4), "peak_kib": round(peak / 1024, 1)}
+
+
+def growth_exponent(points) -> float | None:
+    """Least-squares slope of log(time) vs log(size); None with < 2 usable points."""
+    pts = [(math.log(s), math.log(t)) for s, t in points if s > 0 and t > 0]
+    if len(pts) < 2:
+        return None
+    mean_x = sum(x for x, _ in pts) / len(pts)
+    mean_y = sum(y for _, y in pts) / len(pts)
+    var = sum((x - mean_x) ** 2 for x, _ in pts)
+    if var == 0:
+        return None
+    return round(sum((x - mean_x) * (y - mean_y) for x, y in pts) / var, 2)
+
+
+def run_benchmarks(only=None, sizes=None, recursion_sizes=None, repeat=3, max_lines=None,
+                   log=print) -> dict:
+    sizes = sizes or DEFAULT_SIZES
+    recursion_sizes = recursion_sizes or DEFAULT_RECURSION_SIZES
+    results = {}
+
+    for name, (setup, kind, cap) in BENCHMARKS.items():
+        if only and not any(o in name for o in only):
+            continue
+        case_sizes = recursion_sizes if kind == "recursion" else sizes
+        limit = min(x for x in (cap, max_lines) if x) if (cap or max_lines) else None
+        if kind == "lines" and limit:
+            case_sizes = [s for s in case_sizes if s <= limit]
+
+        rows = {}
+        for size in case_sizes:
+            try:
+                fn = setup(size)
+            except ImportError as e:
+                log(f"  skip {name}: {e}")
+                break
+            rows[str(size)] = measure(fn, repeat=repeat)
+            log(f"  {name:<38} {kind}={size:<7} "
+                f"{rows[str(size)]['time_ms']:>11.3f} ms  {rows[str(size)]['peak_kib']:>10.1f} KiB")
+        if rows:
+            results[name] = {
+                "kind":   kind,
+                "sizes":  rows,
+                "growth": growth_exponent([(int(s), r["time_ms"]) for s, r in rows.items()]),
+            }
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """List of (name, size, baseline_ms, current_ms, ratio) slower than 1 + threshold."""
+    regressions = []
+    for name, res in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for size, row in res["sizes"].items():
+            old = base["sizes"].get(size)
+            # Sub-0.05 ms timings are dominated by noise.
+            if not old or old["time_ms"] < 0.05:
+                continue
+            ratio = row["time_ms"] / old["time_ms"]
+            if ratio > 1 + threshold:
+                regressions.append((name, size, old["time_ms"], row["time_ms"], round(ratio, 2)))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ExplainMate analysis utilities.")
+    parser.add_argument("--only", nargs="*", help="substring filter on benchmark names")
+    parser.add_argument("--sizes", nargs="*", type=int, help=f"source sizes in lines (default {DEFAULT_SIZES})")
+    parser.add_argument("--recursion-sizes", nargs="*", type=int,
+                        help=f"recursion inputs (default {DEFAULT_RECURSION_SIZES})")
+    parser.add_argument("--max-lines", type=int, help="skip source sizes above this")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="write results as a JSON baseline to this path")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown vs baseline before flagging (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    # Quiet matplotlib when no display is available.
+    os.environ.setdefault("MPLBACKEND", "Agg")
+
+    print(f"Python {platform.python_version()} on {platform.platform()}")
+    results = run_benchmarks(args.only, args.sizes, args.recursion_sizes, args.repeat, args.max_lines)
+
+    print("\nGrowth (log-log slope of time vs size, 1.0 ≈ linear):")
+    for name, res in results.items():
+        print(f"  {name:<38} {res['growth']}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "python":    platform.python_version(),
+                "platform":  platform.platform(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results":   results,
+            }, f, indent=2)
+        print(f"\nSaved baseline → {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for name, size, old, new, ratio in regressions:
+                print(f"  {name} @ {size}: {old:.3f} ms → {new:.3f} ms (x{ratio})")
+            return 1
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+Load test for the headless API (api.py) against the deterministic fake LLM.
+
+Usage:
+    python -m benchmarks.load_api                          # spawn a local server, run the default mix
+    python -m benchmarks.load_api --concurrency 64 --requests 2000
+    python -m benchmarks.load_api --url http://127.0.0.1:8080 --only outline,prompt_stream
+    python -m benchmarks.load_api --save benchmarks/baselines/api.json
+
+Unless --url is given, a server is started in a subprocess with
+LLM_BACKEND=fake (latency from FAKE_LLM_LATENCY_MS, default 50 ms here), so
+results measure the service itself rather than a remote model. For each
+endpoint the table shows throughput, latency percentiles and how many
+requests were rejected with 429 (backpressure) or 504 (deadline). Each client
+thread sends its own X-API-Key, so it is a separate caller for the per-caller
+pool limit and quotas; the spawned server's LLM and CPU quotas are lifted
+unless --quotas is given.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+_SAMPLE = '''def fib(n, memo={}):
+    if n < 2:
+        return n
+    if n in memo:
+        return memo[n]
+    memo[n] = fib(n - 1) + fib(n - 2)
+    return memo[n]
+
+def main():
+    for i in range(10):
+        print(fib(i))
+
+main()
+'''
+
+# name → (path, body, streamed)
+SCENARIOS = {
+    "outline":         ("/v1/outline", {"code": _SAMPLE, "lang": "python"}, False),
+    "heuristics":      ("/v1/heuristics", {"code": _SAMPLE, "lang": "python"}, False),
+    "cyclomatic":      ("/v1/cyclomatic", {"code": _SAMPLE, "lang": "python"}, False),
+    "call_graph":      ("/v1/call-graph", {"code": _SAMPLE, "lang": "python"}, False),
+    "recursion_trace": ("/v1/recursion-trace", {"code": _SAMPLE, "input": 12}, False),
+    "run":             ("/v1/run", {"code": _SAMPLE, "language": "python"}, False),
+    "prompt":          ("/v1/prompt/explanation", {"code": _SAMPLE, "lang": "python"}, False),
+    "prompt_stream":   ("/v1/prompt/bug_finder", {"code": _SAMPLE, "lang": "python", "stream": True}, True),
+}
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, env_overrides: dict) -> subprocess.Popen:
+    env = {**os.environ, "LLM_BACKEND": "fake", "FAKE_LLM_LATENCY_MS": os.getenv("FAKE_LLM_LATENCY_MS", "50"),
+           **env_overrides}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen([sys.executable, os.path.join(root, "api.py"), "--port", str(port)],
+                            cwd=root, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"API server did not start:\n{proc.stdout.read()}")
+
+
+class Worker:
+    """One client thread with its own keep-alive connection."""
+
+    def __init__(self, host, port, api_key):
+        self.host, self.port = host, port
+        self.headers = {"Content-Type": "application/json", "X-API-Key": api_key}
+        self.conn = None
+
+    def request(self, path, body, streamed):
+        data = json.dumps(body).encode("utf-8")
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            start = time.perf_counter()
+            try:
+                self.conn.request("POST", path, data, self.headers)
+                resp = self.conn.getresponse()
+                first_byte = None
+                if streamed:
+                    while True:
+                        chunk = resp.read1(4096) if hasattr(resp, "read1") else resp.read(4096)
+                        if first_byte is None:
+                            first_byte = time.perf_counter() - start
+                        if not chunk:
+                            break
+                else:
+                    resp.read()
+                if resp.getheader("Connection", "").lower() == "close":
+                    self.conn.close()
+                    self.conn = None
+                return resp.status, time.perf_counter() - start, first_byte
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    return 0, time.perf_counter() - start, None
+        return 0, 0.0, None
+
+
+def run_scenario(host, port, name, requests, concurrency) -> dict:
+    path, body, streamed = SCENARIOS[name]
+    local = threading.local()
+    results = []
+    lock = threading.Lock()
+    clients = itertools.count(1)
+
+    def one(_):
+        if not hasattr(local, "worker"):
+            local.worker = Worker(host, port, f"load-{name}-{next(clients)}")
+        outcome = local.worker.request(path, body, streamed)
+        with lock:
+            results.append(outcome)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    ok = [ms for status, ms, _ in results if status == 200]
+    ttfb = [t for status, _, t in results if status == 200 and t is not None]
+    return {
+        "endpoint":     name,
+        "requests":     requests,
+        "concurrency":  concurrency,
+        "ok":           len(ok),
+        "rejected_429": sum(1 for s, _, _ in results if s == 429),
+        "timeout_504":  sum(1 for s, _, _ in results if s == 504),
+        "errors":       sum(1 for s, _, _ in results if s not in (200, 429, 504)),
+        "rps":          round(len(ok) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms":       round(_percentile(ok, 50) * 1000, 1),
+        "p95_ms":       round(_percentile(ok, 95) * 1000, 1),
+        "p99_ms":       round(_percentile(ok, 99) * 1000, 1),
+        "ttfb_p50_ms":  round(_percentile(ttfb, 50) * 1000, 1) if ttfb else None,
+    }
+
+
+def print_table(rows):
+    cols = ["endpoint", "ok", "rejected_429", "timeout_504", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "ttfb_p50_ms"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in cols}
+    print("  ".join(c.ljust(widths[c]) for c in cols))
+    for r in rows:
+        print("  ".join(str(r[c]).ljust(widths[c]) for c in cols))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the ExplainMate HTTP API.")
+    parser.add_argument("--url", help="existing server (default: spawn one with the fake LLM backend)")
+    parser.add_argument("--only", help="comma-separated scenario names: " + ",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--quotas", action="store_true", help="keep the per-caller quotas (core.scheduler)")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = "127.0.0.1", _free_port()
+        unlimited = {name: "1000000" for name in ("LLM_PER_MIN_SESSION", "LLM_BURST_SESSION", "LLM_PER_MIN_IP",
+                                                   "LLM_BURST_IP", "CPU_BUDGET_S", "CPU_REFILL_PER_MIN")}
+        server = start_server(port, {} if args.quotas else unlimited)
+    try:
+        rows = [run_scenario(host, port, name, args.requests, args.concurrency) for name in names]
+    finally:
+        if server:
+            server.terminate()
+            server.wait(5)
+
+    print_table(rows)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": rows}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+"""
+Concurrent-session load test for the Streamlit app (app.py) against the
+deterministic fake LLM.
+
+Usage:
+    python -m benchmarks.load_app                                  # 1, 2, 4, 8 sessions
+    python -m benchmarks.load_app --sessions 1 4 16 --iterations 5
+    python -m benchmarks.load_app --script paste explain run chat
+    python -m benchmarks.load_app --save benchmarks/baselines/app.json
+    python -m benchmarks.load_app --compare benchmarks/baselines/app.json --threshold 0.25
+
+Every simulated session is a Streamlit AppTest (a real script run with its
+own session state) driven through a click script. The default script pastes
+code, explains it, runs it, traces recursion and sends a chat message, each
+step `--iterations` times. All sessions share one process, just like users
+of one `streamlit run` server, so LLM calls, subprocesses and chart renders
+compete exactly as they do in production.
+
+The code editor (streamlit-ace) is a custom component that AppTest cannot
+drive, so its value comes from session state. The typing animation sleeps
+20 ms per character and is turned off unless --typewriter is given. Answer
+reuse (snippet index, question bank) would make every session after the
+first instant, so it is disabled unless --warm. Every simulated session
+shares one (missing) client IP, so the per-IP LLM quota is lifted unless
+--quotas is given.
+
+For each session count the table shows throughput, p50/p95/p99 latency per
+action and peak CPU/RSS; a CPU/RSS timeline is kept in the saved JSON. The
+saturation point is the first count where adding sessions gains less than
+10% throughput while p95 latency grows by more than 50%.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_ENTRY = '''import os, sys
+sys.path.insert(0, {root!r})
+os.chdir({root!r})
+import streamlit as st
+import app
+app.st_ace = lambda **kw: st.session_state.get("_loadtest_code", "")
+if os.getenv("LOADTEST_TYPEWRITER") != "1":
+    app.type_writer_effect = lambda text, speed=0.02, enable_tts=False: st.markdown(text)
+app.run_app()
+'''
+
+SNIPPETS = [
+    '''def fibonacci(n, memo={}):
+    if n < 2:
+        return n
+    if n not in memo:
+        memo[n] = fibonacci(n - 1) + fibonacci(n - 2)
+    return memo[n]
+
+for i in range(15):
+    print(i, fibonacci(i))
+''',
+    '''def binary_search(arr, target):
+    lo, hi = 0, len(arr) - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if arr[mid] == target:
+            return mid
+        if arr[mid] < target:
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    return -1
+
+print(binary_search(list(range(0, 1000, 3)), 333))
+''',
+    '''def bubble_sort(items):
+    items = list(items)
+    for i in range(len(items)):
+        for j in range(len(items) - i - 1):
+            if items[j] > items[j + 1]:
+                items[j], items[j + 1] = items[j + 1], items[j]
+    return items
+
+print(bubble_sort([5, 3, 9, 1, 7, 2, 8]))
+''',
+    '''from collections import Counter
+
+def top_words(text, k=3):
+    words = [w.strip(".,").lower() for w in text.split()]
+    return Counter(words).most_common(k)
+
+print(top_words("the cat and the hat and the bat"))
+''',
+]
+CHAT_QUESTIONS = ["What does this code do?", "What is its time complexity?", "How can I make it faster?"]
+
+
+# ── Actions ───────────────────────────────────────────────────────────────────
+def _button(at, text):
+    return next(b for b in at.button if text in b.label)
+
+
+def act_paste(at, rng):
+    at.session_state["_loadtest_code"] = rng.choice(SNIPPETS)
+    at.run()
+
+
+def act_explain(at, rng):
+    _button(at, "Generate Explanation").click()
+    at.run()
+
+
+def _settle(at, poll_s=0.05):
+    # Runs and traces are background jobs (core.jobs); rerun once they finish,
+    # as the page's poller would.
+    from core.jobs import jobs
+    session_id = at.session_state["session_id"]
+    while jobs.pending(session_id):
+        time.sleep(poll_s)
+    at.run()
+
+
+def act_run(at, rng):
+    _button(at, "Run Code").click()
+    at.run()
+    _settle(at)
+
+
+def act_trace(at, rng):
+    next(t for t in at.text_input if t.label.startswith("Input")).set_value(str(rng.randint(5, 12)))
+    _button(at, "Trace Calls").click()
+    at.run()
+    _settle(at)
+
+
+def act_chat(at, rng):
+    at.chat_input[0].set_value(rng.choice(CHAT_QUESTIONS))
+    at.run()
+
+
+ACTIONS = {"paste": act_paste, "explain": act_explain, "run": act_run, "trace": act_trace, "chat": act_chat}
+DEFAULT_SCRIPT = ["paste", "explain", "run", "trace", "chat"]
+
+
+# ── Process sampling ──────────────────────────────────────────────────────────
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+class Sampler(threading.Thread):
+    """CPU (% of all cores, children included) and RSS of this process every `interval` s."""
+
+    def __init__(self, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    @staticmethod
+    def _cpu():
+        t = os.times()
+        return t.user + t.system + t.children_user + t.children_system
+
+    def run(self):
+        start, cpu0 = time.monotonic(), self._cpu()
+        last_t, last_cpu = start, cpu0
+        cores = os.cpu_count() or 1
+        while not self._done.wait(self.interval):
+            now, cpu = time.monotonic(), self._cpu()
+            pct = 100 * (cpu - last_cpu) / max(1e-9, now - last_t) / cores
+            self.samples.append({"t": round(now - start, 2), "cpu_pct": round(pct, 1), "rss_mb": round(_rss_mb(), 1)})
+            last_t, last_cpu = now, cpu
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+# ── Runner ────────────────────────────────────────────────────────────────────
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _session(entry, script, iterations, seed, timeout, timings, errors, lock):
+    from streamlit.testing.v1 import AppTest
+    rng = random.Random(seed)
+    at = AppTest.from_file(entry, default_timeout=timeout)
+    at.run()
+    for _ in range(iterations):
+        for name in script:
+            start = time.perf_counter()
+            try:
+                ACTIONS[name](at, rng)
+                failed = bool(at.exception)
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - start
+            with lock:
+                timings.setdefault(name, []).append(elapsed)
+                if failed:
+                    errors[name] = errors.get(name, 0) + 1
+
+
+def run_level(entry, sessions, script, iterations, timeout) -> dict:
+    timings, errors, lock = {}, {}, threading.Lock()
+    sampler = Sampler()
+    threads = [
+        threading.Thread(target=_session, args=(entry, script, iterations, i, timeout, timings, errors, lock))
+        for i in range(sessions)
+    ]
+    sampler.start()
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+
+    every = [v for values in timings.values() for v in values]
+    return {
+        "sessions":   sessions,
+        "actions":    len(every),
+        "errors":     sum(errors.values()),
+        "elapsed_s":  round(elapsed, 2),
+        "throughput": round(len(every) / elapsed, 2) if elapsed else 0.0,
+        "p95_ms":     round(_percentile(every, 95) * 1000, 1),
+        "per_action": {
+            name: {
+                "count":  len(values),
+                "errors": errors.get(name, 0),
+                "p50_ms": round(_percentile(values, 50) * 1000, 1),
+                "p95_ms": round(_percentile(values, 95) * 1000, 1),
+                "p99_ms": round(_percentile(values, 99) * 1000, 1),
+            }
+            for name, values in timings.items()
+        },
+        "cpu_pct_max": max((s["cpu_pct"] for s in sampler.samples), default=0.0),
+        "rss_mb_max":  max((s["rss_mb"] for s in sampler.samples), default=round(_rss_mb(), 1)),
+        "timeline":    sampler.samples,
+    }
+
+
+def saturation_point(levels: list):
+    """First session count whose throughput gain is < 10% while p95 grows > 50%."""
+    for prev, cur in zip(levels, levels[1:]):
+        if cur["throughput"] < prev["throughput"] * 1.10 and cur["p95_ms"] > prev["p95_ms"] * 1.5:
+            return cur["sessions"]
+    return None
+
+
+def print_table(levels: list, script: list):
+    header = f"{'sessions':>8}  {'actions/s':>9}  {'errors':>6}  {'cpu%':>5}  {'rss MB':>7}  " + "  ".join(
+        f"{name + ' p50/p95/p99 ms':>28}" for name in script)
+    print(header)
+    for level in levels:
+        cells = []
+        for name in script:
+            a = level["per_action"].get(name)
+            cells.append(f"{a['p50_ms']:>8.0f}/{a['p95_ms']:>8.0f}/{a['p99_ms']:>8.0f}" if a else f"{'-':>26}")
+        print(f"{level['sessions']:>8}  {level['throughput']:>9.2f}  {level['errors']:>6}  "
+              f"{level['cpu_pct_max']:>5.0f}  {level['rss_mb_max']:>7.0f}  " + "  ".join(f"{c:>28}" for c in cells))
+
+
+def compare(current: list, baseline: list, threshold: float) -> list:
+    """(sessions, metric, baseline, current, ratio) for throughput drops and p95 rises beyond threshold."""
+    old_by_sessions = {level["sessions"]: level for level in baseline}
+    regressions = []
+    for level in current:
+        old = old_by_sessions.get(level["sessions"])
+        if not old:
+            continue
+        if old["throughput"] and level["throughput"] < old["throughput"] / (1 + threshold):
+            regressions.append((level["sessions"], "throughput", old["throughput"], level["throughput"],
+                                round(level["throughput"] / old["throughput"], 2)))
+        for name, row in level["per_action"].items():
+            base = old["per_action"].get(name)
+            # Sub-10 ms actions are dominated by noise.
+            if base and base["p95_ms"] >= 10 and row["p95_ms"] > base["p95_ms"] * (1 + threshold):
+                regressions.append((level["sessions"], f"{name} p95_ms", base["p95_ms"], row["p95_ms"],
+                                    round(row["p95_ms"] / base["p95_ms"], 2)))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the ExplainMate Streamlit app with simulated sessions.")
+    parser.add_argument("--sessions", nargs="*", type=int, default=[1, 2, 4, 8],
+                        help="concurrent session counts to measure, in order")
+    parser.add_argument("--script", nargs="*", default=DEFAULT_SCRIPT, choices=list(ACTIONS),
+                        help="click script each session repeats")
+    parser.add_argument("--iterations", type=int, default=3, help="times each session repeats the script")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per script run")
+    parser.add_argument("--typewriter", action="store_true", help="keep the 20 ms/char typing animation")
+    parser.add_argument("--warm", action="store_true", help="allow answer reuse across sessions")
+    parser.add_argument("--quotas", action="store_true", help="keep the per-IP LLM quota (core.scheduler)")
+    parser.add_argument("--save", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed throughput drop / p95 rise vs baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    os.environ.setdefault("FAKE_LLM_LATENCY_MS", "300")
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    if args.typewriter:
+        os.environ["LOADTEST_TYPEWRITER"] = "1"
+    if not args.warm:
+        # An estimated similarity never exceeds 1.0, so nothing is reused.
+        os.environ["SNIPPET_MATCH_THRESHOLD"] = "1.01"
+    if not args.quotas:
+        os.environ["LLM_PER_MIN_IP"] = os.environ["LLM_BURST_IP"] = "1000000"
+
+    print(f"Python {platform.python_version()} on {platform.platform()}, {os.cpu_count()} CPU(s); "
+          f"backend={os.environ['LLM_BACKEND']} latency={os.environ['FAKE_LLM_LATENCY_MS']} ms")
+    with tempfile.TemporaryDirectory(prefix="explainmate-load-") as tmp:
+        entry = os.path.join(tmp, "entry.py")
+        with open(entry, "w", encoding="utf-8") as f:
+            f.write(_ENTRY.format(root=ROOT))
+        # Warm-up: imports and first-run caches are not part of the measurement.
+        run_level(entry, 1, ["paste"], 1, args.timeout)
+        levels = []
+        for n in args.sessions:
+            print(f"… {n} session(s)", flush=True)
+            levels.append(run_level(entry, n, args.script, args.iterations, args.timeout))
+
+    print()
+    print_table(levels, args.script)
+    saturated = saturation_point(levels)
+    print(f"\nSaturation point: {saturated} sessions" if saturated
+          else "\nSaturation point: not reached in the measured range")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "python":     platform.python_version(),
+                "platform":   platform.platform(),
+                "cpus":       os.cpu_count(),
+                "timestamp":  time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "script":     args.script,
+                "saturation": saturated,
+                "levels":     levels,
+            }, f, indent=2)
+        print(f"Saved → {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["levels"]
+        regressions = compare(levels, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for sessions, metric, old, new, ratio in regressions:
+                print(f"  {sessions} session(s) {metric}: {old} → {new} (x{ratio})")
+            return 1
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
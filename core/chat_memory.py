@@ -0,0 +1,155 @@
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from core.model_router import estimate_tokens
+
+load_dotenv()
+
+# Token budget for the verbatim window of recent turns sent with each question,
+# and for the rolling summary of everything paged out of that window.
+WINDOW_TOKENS  = int(os.getenv("CHAT_WINDOW_TOKENS", "1500"))
+SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "300"))
+MIN_WINDOW_MESSAGES = 2   # always keep the latest question + answer verbatim
+
+STORE_PATH = os.getenv("CHAT_STORE_PATH", os.path.join(".explainmate", "chat_history.sqlite3"))
+STORE_TTL_DAYS = float(os.getenv("CHAT_STORE_TTL_DAYS", "7"))
+
+
+class ChatStore:
+    """
+    Server-side archive of chat messages paged out of st.session_state.
+    One SQLite file shared by every session in the process.
+    """
+
+    def __init__(self, path: str = STORE_PATH, ttl_days: float = STORE_TTL_DAYS):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " session_id TEXT NOT NULL, seq INTEGER NOT NULL,"
+                " role TEXT NOT NULL, content TEXT NOT NULL, ts REAL NOT NULL,"
+                " PRIMARY KEY (session_id, seq))"
+            )
+            if ttl_days > 0:
+                self._conn.execute("DELETE FROM messages WHERE ts < ?", (time.time() - ttl_days * 86400,))
+
+    def append(self, session_id: str, seq: int, role: str, content: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?)",
+                (session_id, seq, role, content, time.time()),
+            )
+
+    def count(self, session_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0]
+
+    def page(self, session_id: str, before_seq: int, limit: int = 20) -> list:
+        """Up to `limit` archived messages older than `before_seq`, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, role, content FROM messages WHERE session_id = ? AND seq < ?"
+                " ORDER BY seq DESC LIMIT ?",
+                (session_id, before_seq, limit),
+            ).fetchall()
+        return [{"seq": s, "role": r, "content": c} for s, r, c in reversed(rows)]
+
+    def clear(self, session_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+
+_store = None
+
+
+def get_store() -> ChatStore:
+    """Process-wide ChatStore, opened on first use."""
+    global _store
+    if _store is None:
+        _store = ChatStore()
+    return _store
+
+
+def _extractive_summary(previous: str, messages: list) -> str:
+    """LLM-free fallback: keep the user questions that were paged out."""
+    questions = [m["content"].strip().splitlines()[0] for m in messages if m["role"] == "user" and m["content"].strip()]
+    parts = [previous] if previous else []
+    parts += [f"- Asked: {q[:120]}" for q in questions]
+    return "\n".join(parts)
+
+
+def _clip_tokens(text: str, max_tokens: int) -> str:
+    """Keep the tail of `text` within roughly `max_tokens` (newest facts matter most)."""
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else "…" + text[-max_chars:]
+
+
+class ChatMemory:
+    """
+    Rolling chat window + compact summary, kept within a fixed token budget.
+
+    Only the window, the summary and a few counters live in session state;
+    messages evicted from the window are written to the ChatStore and folded
+    into the summary by `summarize(previous_summary, evicted_messages)`.
+    """
+
+    def __init__(self, session_id: str, window_tokens: int = WINDOW_TOKENS,
+                 summary_tokens: int = SUMMARY_TOKENS, store: ChatStore | None = None):
+        self.session_id = session_id
+        self.window_tokens = window_tokens
+        self.summary_tokens = summary_tokens
+        self.window = []          # [{"seq", "role", "content"}]
+        self.summary = ""
+        self.archived = 0
+        self._next_seq = 0
+        self._store = store
+
+    @property
+    def store(self) -> ChatStore:
+        return self._store or get_store()
+
+    def _window_size(self) -> int:
+        return sum(estimate_tokens(m["content"]) for m in self.window)
+
+    def add(self, role: str, content: str, summarize=None):
+        """
+        Append a message, then page the oldest messages out until the window
+        fits its budget. `summarize` defaults to an extractive summary.
+        """
+        self.window.append({"seq": self._next_seq, "role": role, "content": content})
+        self._next_seq += 1
+
+        evicted = []
+        while len(self.window) > MIN_WINDOW_MESSAGES and self._window_size() > self.window_tokens:
+            evicted.append(self.window.pop(0))
+        if not evicted:
+            return
+
+        for m in evicted:
+            self.store.append(self.session_id, m["seq"], m["role"], m["content"])
+        self.archived += len(evicted)
+
+        try:
+            summary = (summarize or _extractive_summary)(self.summary, evicted)
+        except Exception:
+            summary = _extractive_summary(self.summary, evicted)
+        self.summary = _clip_tokens(summary.strip(), self.summary_tokens)
+
+    def earlier(self, limit: int = 20) -> list:
+        """The most recent archived messages (oldest first), loaded from the store."""
+        first_in_window = self.window[0]["seq"] if self.window else self._next_seq
+        return self.store.page(self.session_id, first_in_window, limit)
+
+    def clear(self):
+        self.store.clear(self.session_id)
+        self.window = []
+        self.summary = ""
+        self.archived = 0
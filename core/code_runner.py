@@ -1,8 +1,23 @@
 import subprocess
 import tempfile
 import os
-import requests
+import re
+import shutil
+import hashlib
+import codecs
+import threading
+import time
+from collections import deque
 from dotenv import load_dotenv
+from core import telemetry
+from core.jdoodle_client import get_client as get_jdoodle_client
+from core.scheduler import scheduler
+from core.telemetry import span
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
 
 load_dotenv()
 
@@ -29,19 +44,303 @@ JDOODLE_LANG_MAP = {
     "haskell":    ("haskell",     "4"),
 }
 
-# File extensions for local temp-file execution (future use)
-EXT_MAP = {
-    "python": "py",
-    "javascript": "js",
-    "java": "java",
-    "cpp": "cpp",
+# ── Local toolchains ──────────────────────────────────────────────────────────
+# Languages run on the host when their tools are on PATH (JDoodle otherwise).
+# Placeholders: {src} source file, {out} binary, {dir} build dir, {main} Java class,
+# {mem} RUN_MEMORY_MB. `limit_memory`: True caps the address space (RLIMIT_AS);
+# "data" caps only the data segment (RLIMIT_DATA), for runtimes that reserve
+# large virtual address space up front; False leaves the cap to the runtime's
+# own heap flag or `env`.
+LOCAL_TOOLCHAINS = {
+    "javascript": {
+        "ext": "js", "tools": ["node"],
+        "compile": None,
+        "run": ["node", "--max-old-space-size={mem}", "{src}"],
+        "limit_memory": "data",
+    },
+    "c": {
+        "ext": "c", "tools": ["gcc"],
+        "compile": ["gcc", "-O2", "-std=c11", "{src}", "-o", "{out}", "-lm"],
+        "run": ["{out}"],
+        "limit_memory": True,
+    },
+    "cpp": {
+        "ext": "cpp", "tools": ["g++"],
+        "compile": ["g++", "-O2", "-std=c++17", "{src}", "-o", "{out}"],
+        "run": ["{out}"],
+        "limit_memory": True,
+    },
+    "java": {
+        "ext": "java", "tools": ["javac", "java"],
+        "compile": ["javac", "-d", "{dir}", "{src}"],
+        "run": ["java", "-Xmx{mem}m", "-cp", "{dir}", "{main}"],
+        "limit_memory": False,
+    },
+    "go": {
+        "ext": "go", "tools": ["go"],
+        "compile": ["go", "build", "-o", "{out}", "{src}"],
+        "run": ["{out}"],
+        "env": {"GOMEMLIMIT": "{mem}MiB"},
+        "limit_memory": "data",
+    },
+    "rust": {
+        "ext": "rs", "tools": ["rustc"],
+        "compile": ["rustc", "-O", "-o", "{out}", "{src}"],
+        "run": ["{out}"],
+        "limit_memory": True,
+    },
 }
 
+# Set LOCAL_RUNNERS=0 to send every non-Python language to JDoodle.
+LOCAL_RUNNERS_ENABLED = os.getenv("LOCAL_RUNNERS", "1") != "0"
+RUN_TIMEOUT_S      = 10
+COMPILE_TIMEOUT_S  = int(os.getenv("COMPILE_TIMEOUT_S", "60"))
+RUN_MEMORY_MB      = int(os.getenv("RUN_MEMORY_MB", "512"))
+RUN_MAX_FILE_MB    = 16
+# Max program output kept in memory per run; older output is dropped first.
+RUN_OUTPUT_CAP_BYTES = max(4096, int(os.getenv("RUN_OUTPUT_CAP_BYTES", str(256 * 1024))))
+BUILD_CACHE_DIR    = os.getenv(
+    "BUILD_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "explainmate", "builds")
+)
+BUILD_CACHE_MAX_ENTRIES = int(os.getenv("BUILD_CACHE_MAX_ENTRIES", "200"))
+
 
-def _run_python_local(code: str, stdin: str = "") -> str:
+def _limit_resources(timeout: int, limit_memory, limit_files: bool):
+    """
+    preexec_fn for child processes: cap CPU time, written file size and memory
+    (`limit_memory` as in LOCAL_TOOLCHAINS).
+    """
+    def apply():
+        resource.setrlimit(resource.RLIMIT_CPU, (timeout + 1, timeout + 1))
+        if limit_files:
+            file_bytes = RUN_MAX_FILE_MB * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_FSIZE, (file_bytes, file_bytes))
+        if limit_memory and RUN_MEMORY_MB > 0:
+            mem_bytes = RUN_MEMORY_MB * 1024 * 1024
+            limit = resource.RLIMIT_DATA if limit_memory == "data" else resource.RLIMIT_AS
+            resource.setrlimit(limit, (mem_bytes, mem_bytes))
+    return apply if resource is not None else None
+
+
+def _run_process(cmd: list, stdin: str = "", timeout: int = RUN_TIMEOUT_S,
+                 cwd: str | None = None, limit_memory: bool = True, limit_files: bool = True):
+    """Run one sandboxed child process to completion (used for compilers)."""
+    return subprocess.run(
+        cmd,
+        input=stdin,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+        cwd=cwd,
+        preexec_fn=_limit_resources(timeout, limit_memory, limit_files),
+    )
+
+
+def _merge_lines(chunks) -> str:
+    """
+    Interleave stdout and stderr line by line, ordered by when each line
+    started. The two pipes are read by separate threads, so a line's
+    newline can arrive after the other stream's next chunk (e.g. `print`
+    writes the text and the newline separately); merging whole lines keeps
+    them intact.
+    """
+    lines, partial = [], {}     # partial: stream → [start ts, text]
+    for ts, stream, text, _ in chunks:
+        for piece in text.splitlines(keepends=True):
+            current = partial.setdefault(stream, [ts, ""])
+            current[1] += piece
+            if piece.endswith(("\n", "\r")):
+                lines.append((current[0], len(lines), current[1]))
+                del partial[stream]
+    lines += [(start, len(lines) + i, text) for i, (start, text) in enumerate(partial.values())]
+    return "".join(text for _, _, text in sorted(lines))
+
+
+class OutputRing:
+    """
+    Time-ordered stdout/stderr chunks from one run, capped at `cap_bytes`.
+    When the cap is exceeded the oldest chunks are dropped and a marker
+    records how much was cut, so runaway output cannot exhaust memory.
+    """
+
+    def __init__(self, cap_bytes: int = RUN_OUTPUT_CAP_BYTES):
+        self.cap_bytes = cap_bytes
+        self._chunks = deque()   # (monotonic_ts, stream, text, nbytes)
+        self._size = 0
+        self._total = 0
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        """Bytes appended so far, including any dropped; grows with every chunk."""
+        with self._lock:
+            return self._total
+
+    def append(self, stream: str, text: str, nbytes: int):
+        with self._lock:
+            self._chunks.append((time.monotonic(), stream, text, nbytes))
+            self._size += nbytes
+            self._total += nbytes
+            while self._size > self.cap_bytes and len(self._chunks) > 1:
+                _, _, _, n = self._chunks.popleft()
+                self._size -= n
+                self._dropped += n
+
+    def render(self, stream: str | None = None) -> str:
+        """Merged output (or one stream), prefixed with a truncation marker if needed."""
+        with self._lock:
+            chunks = list(self._chunks)
+            dropped = self._dropped
+        if stream is not None:
+            text = "".join(c[2] for c in chunks if c[1] == stream)
+        else:
+            text = _merge_lines(chunks)
+        if dropped:
+            text = f"… [{dropped:,} bytes of earlier output truncated] …\n" + text
+        return text
+
+
+class StreamedRun:
+    """Result of _stream_process; mirrors the CompletedProcess fields we use."""
+
+    def __init__(self, ring: OutputRing, returncode: int | None, timed_out: bool,
+                 cpu_s: float | None = None):
+        self.ring = ring
+        self.returncode = returncode
+        self.timed_out = timed_out
+        self.cpu_s = cpu_s
+
+    @property
+    def stdout(self) -> str:
+        return self.ring.render("stdout")
+
+    @property
+    def stderr(self) -> str:
+        return self.ring.render("stderr")
+
+    @property
+    def merged(self) -> str:
+        return self.ring.render()
+
+
+def _pump(pipe, stream: str, ring: OutputRing):
+    """Reader thread: move raw bytes from a pipe into the ring as they arrive."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    fd = pipe.fileno()
+    while True:
+        data = os.read(fd, 4096)
+        if not data:
+            break
+        ring.append(stream, decoder.decode(data), len(data))
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        ring.append(stream, tail, len(tail.encode("utf-8")))
+    pipe.close()
+
+
+def _feed_stdin(pipe, stdin: str):
+    try:
+        if stdin:
+            pipe.write(stdin.encode("utf-8"))
+    except (BrokenPipeError, OSError):
+        pass  # program exited without reading all input
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+
+def _wait_child(proc, timeout: float):
+    """
+    proc.wait(timeout) that also returns the child's CPU seconds, read from
+    os.wait4 (None where that is unavailable). Raises TimeoutExpired like wait.
+    """
+    if not hasattr(os, "wait4"):
+        proc.wait(timeout=timeout)
+        return None
+    deadline = time.monotonic() + timeout
+    while True:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return usage.ru_utime + usage.ru_stime
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+        time.sleep(min(0.01, remaining))
+
+
+def _stream_process(cmd: list, stdin: str = "", timeout: int = RUN_TIMEOUT_S,
+                    cwd: str | None = None, limit_memory=True,
+                    on_output=None, interval: float = 0.1, env: dict | None = None) -> StreamedRun:
+    """
+    Run one sandboxed child process with stdout/stderr streamed into an
+    OutputRing. `on_output(merged_text)` is called from the caller's thread
+    every `interval` seconds while new output arrives, and once at the end.
+    `env` entries are added to the inherited environment. The child's CPU time is charged to the current user (core.scheduler).
+    """
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        env={**os.environ, **env} if env else None,
+        preexec_fn=_limit_resources(timeout, limit_memory, True),
+    )
+    ring = OutputRing()
+    threads = [
+        threading.Thread(target=_pump, args=(proc.stdout, "stdout", ring), daemon=True),
+        threading.Thread(target=_pump, args=(proc.stderr, "stderr", ring), daemon=True),
+        threading.Thread(target=_feed_stdin, args=(proc.stdin, stdin), daemon=True),
+    ]
+    for t in threads:
+        t.start()
+
+    deadline = time.monotonic() + timeout
+    timed_out = False
+    last_total = -1
+    while True:
+        try:
+            cpu_s = _wait_child(proc, interval)
+            break
+        except subprocess.TimeoutExpired:
+            if time.monotonic() >= deadline:
+                proc.kill()
+                cpu_s = _wait_child(proc, RUN_TIMEOUT_S)
+                timed_out = True
+                break
+        if on_output and ring.total_bytes != last_total:
+            last_total = ring.total_bytes
+            on_output(ring.render())
+
+    for t in threads:
+        t.join(timeout=1)
+    if on_output:
+        on_output(ring.render())
+    scheduler.charge_cpu(cpu_s)
+    return StreamedRun(ring, proc.returncode, timed_out, cpu_s)
+
+
+def _timed_out_output(result: StreamedRun) -> str:
+    partial = result.merged.rstrip()
+    message = f"⏰ Execution timed out ({RUN_TIMEOUT_S}s limit)."
+    return f"{partial}\n\n{message}" if partial else message
+
+
+def _format_output(result) -> str:
+    # Streamed runs keep stdout and stderr interleaved in the order they were written.
+    text = result.merged if isinstance(result, StreamedRun) else result.stdout or result.stderr
+    return text or "(no output)"
+
+
+def _run_python_local(code: str, stdin: str = "", on_output=None) -> str:
     """
     Execute Python code locally using subprocess — no API required.
-    Runs in an isolated temp file with a 10-second timeout.
+    Runs in an isolated temp file with a 10-second timeout; output is streamed
+    to `on_output` as it is produced and capped at RUN_OUTPUT_CAP_BYTES.
     """
     try:
         with tempfile.NamedTemporaryFile(
@@ -50,88 +349,184 @@ def _run_python_local(code: str, stdin: str = "") -> str:
             f.write(code)
             tmp_path = f.name
 
-        result = subprocess.run(
-            ["python", tmp_path],
-            input=stdin,
-            capture_output=True,
-            text=True,
-            timeout=10,
-        )
-        os.unlink(tmp_path)
-
-        if result.stdout:
-            return result.stdout
-        if result.stderr:
-            return result.stderr
-        return "(no output)"
+        try:
+            # -u: unbuffered, so prints reach the UI while the program runs.
+            result = _stream_process(["python", "-u", tmp_path], stdin,
+                                     limit_memory=True, on_output=on_output)
+        finally:
+            os.unlink(tmp_path)
+        if result.timed_out:
+            return _timed_out_output(result)
+        return _format_output(result)
 
-    except subprocess.TimeoutExpired:
-        return "⏰ Execution timed out (10s limit)."
     except FileNotFoundError:
         return "❌ Python interpreter not found. Make sure Python is in PATH."
     except Exception as e:
         return f"❌ Local execution error: {e}"
 
 
-def _run_jdoodle(language: str, code: str, stdin: str = "") -> str:
+def local_toolchain_available(language: str) -> bool:
+    """True when every tool the language needs is on PATH."""
+    spec = LOCAL_TOOLCHAINS.get(language)
+    return bool(spec) and all(shutil.which(tool) for tool in spec["tools"])
+
+
+def _java_main_class(code: str) -> str:
+    """javac requires a public class to live in <ClassName>.java."""
+    match = re.search(r'public\s+(?:final\s+|abstract\s+)*class\s+(\w+)', code)
+    if match:
+        return match.group(1)
+    match = re.search(r'class\s+(\w+)[^{]*\{(?:(?!\bclass\b).)*?static\s+void\s+main\s*\(', code, re.S)
+    return match.group(1) if match else "Main"
+
+
+def _build_key(language: str, code: str, spec: dict) -> str:
+    """Hash of source, compiler command line and resolved compiler binaries."""
+    h = hashlib.sha256()
+    h.update(language.encode())
+    h.update(b"\0" + code.encode("utf-8"))
+    h.update(b"\0" + repr(spec["compile"]).encode())
+    for tool in spec["tools"]:
+        path = shutil.which(tool) or ""
+        mtime = os.path.getmtime(path) if path else 0
+        h.update(f"\0{path}:{mtime}".encode())
+    return h.hexdigest()
+
+
+def _evict_builds():
+    """Keep at most BUILD_CACHE_MAX_ENTRIES builds, dropping least recently used."""
+    try:
+        entries = [os.path.join(BUILD_CACHE_DIR, d) for d in os.listdir(BUILD_CACHE_DIR)]
+    except OSError:
+        return
+    entries = [e for e in entries if os.path.isdir(e) and not os.path.basename(e).startswith(".")]
+    if len(entries) <= BUILD_CACHE_MAX_ENTRIES:
+        return
+    entries.sort(key=os.path.getmtime)
+    for path in entries[: len(entries) - BUILD_CACHE_MAX_ENTRIES]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _get_or_build(language: str, code: str, spec: dict):
     """
-    Execute code via JDoodle API.
-    Requires JDOODLE_CLIENT_ID and JDOODLE_CLIENT_SECRET in .env
-    Free tier: 200 executions / day — https://www.jdoodle.com/compiler-api/
+    Return (build_dir, None) for a compiled snippet, compiling only on a cache
+    miss, or (None, error_message) when compilation fails.
     """
-    client_id     = os.getenv("JDOODLE_CLIENT_ID", "")
-    client_secret = os.getenv("JDOODLE_CLIENT_SECRET", "")
+    main = _java_main_class(code) if language == "java" else "main"
+    key = _build_key(language, code, spec)
+    build_dir = os.path.join(BUILD_CACHE_DIR, key)
 
-    if not client_id or not client_secret:
-        return (
-            "⚠️ JDoodle API keys not configured.\n"
-            "Add JDOODLE_CLIENT_ID and JDOODLE_CLIENT_SECRET to your .env file.\n"
-            "Get a free key at: https://www.jdoodle.com/compiler-api/"
-        )
+    if os.path.exists(os.path.join(build_dir, ".ok")):
+        os.utime(build_dir)  # mark as recently used
+        telemetry.record_cache("build", True)
+        return build_dir, None
+    telemetry.record_cache("build", False)
 
-    jdoodle_lang, version_idx = JDOODLE_LANG_MAP.get(language, (language, "0"))
+    os.makedirs(BUILD_CACHE_DIR, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".build-", dir=BUILD_CACHE_DIR)
+    try:
+        src = os.path.join(staging, f"{main}.{spec['ext']}")
+        with open(src, "w", encoding="utf-8") as f:
+            f.write(code)
+        fields = {"src": src, "out": os.path.join(staging, "main"), "dir": staging, "main": main}
+        cmd = [part.format(**fields) for part in spec["compile"]]
+        with span("compile", language=language):
+            result = _run_process(cmd, timeout=COMPILE_TIMEOUT_S, cwd=staging,
+                                  limit_memory=False, limit_files=False)
+        if result.returncode != 0:
+            return None, f"❌ Compilation failed:\n{result.stderr or result.stdout}"
+        with open(os.path.join(staging, ".ok"), "w") as f:
+            f.write(main)
+        try:
+            os.rename(staging, build_dir)
+        except OSError:
+            pass  # a concurrent run built the same key first
+        _evict_builds()
+        return build_dir, None
+    finally:
+        if os.path.isdir(staging):
+            shutil.rmtree(staging, ignore_errors=True)
 
-    payload = {
-        "clientId":     client_id,
-        "clientSecret": client_secret,
-        "script":       code,
-        "language":     jdoodle_lang,
-        "versionIndex": version_idx,
-        "stdin":        stdin,
-    }
 
+def _run_local_toolchain(language: str, code: str, stdin: str = "", on_output=None) -> str:
+    """
+    Compile (once per source/flags hash) and run a snippet with a host toolchain.
+    Same timeout and resource limits as the Python runner.
+    """
+    spec = LOCAL_TOOLCHAINS[language]
+    mem = RUN_MEMORY_MB if RUN_MEMORY_MB > 0 else None
+    env = {k: v.format(mem=mem) for k, v in spec.get("env", {}).items()} if mem else None
+    run = spec["run"] if mem else [part for part in spec["run"] if "{mem}" not in part]
     try:
-        resp = requests.post(
-            "https://api.jdoodle.com/v1/execute",
-            json=payload,
-            timeout=15,
-        )
-        data = resp.json()
-
-        if "output" in data:
-            return data["output"]
-        elif "error" in data:
-            return f"JDoodle error: {data['error']}"
+        if spec["compile"]:
+            build_dir, error = _get_or_build(language, code, spec)
+            if error:
+                return error
+            with open(os.path.join(build_dir, ".ok")) as f:
+                main = f.read().strip()
+            fields = {"src": "", "out": os.path.join(build_dir, "main"), "dir": build_dir,
+                      "main": main, "mem": mem}
+            cmd = [part.format(**fields) for part in run]
+            result = _stream_process(cmd, stdin, cwd=build_dir, limit_memory=spec["limit_memory"],
+                                     on_output=on_output, env=env)
         else:
-            return f"Unexpected response: {data}"
+            with tempfile.TemporaryDirectory() as tmp:
+                src = os.path.join(tmp, f"main.{spec['ext']}")
+                with open(src, "w", encoding="utf-8") as f:
+                    f.write(code)
+                cmd = [part.format(src=src, mem=mem) for part in run]
+                result = _stream_process(cmd, stdin, cwd=tmp, limit_memory=spec["limit_memory"],
+                                         on_output=on_output, env=env)
+        if result.timed_out:
+            return _timed_out_output(result)
+        return _format_output(result)
+
+    except subprocess.TimeoutExpired:
+        return f"⏰ Compilation timed out ({COMPILE_TIMEOUT_S}s limit)."
+    except OSError:
+        raise
+    except Exception as e:
+        return f"❌ Local execution error: {e}"
+
+
+def _run_jdoodle(language: str, code: str, stdin: str = "") -> str:
+    """
+    Execute code via JDoodle API.
+    Requires JDOODLE_CLIENT_ID and JDOODLE_CLIENT_SECRET in .env
+    Free tier: 200 executions / day — https://www.jdoodle.com/compiler-api/
 
-    except requests.Timeout:
-        return "⏰ JDoodle request timed out."
+    Goes through the shared JDoodleClient (keep-alive session, retries,
+    daily quota ledger, cache of identical runs).
+    """
+    jdoodle_lang, version_idx = JDOODLE_LANG_MAP.get(language, (language, "0"))
+
+    try:
+        return get_jdoodle_client().execute(jdoodle_lang, version_idx, code, stdin)
     except Exception as e:
         return f"❌ JDoodle error: {e}"
 
 
-def run_code(language: str, code: str, stdin: str = "") -> str:
+def run_code(language: str, code: str, stdin: str = "", on_output=None) -> str:
     """
     Run code in the given language.
 
     Strategy:
       • Python  → local subprocess (fast, unlimited, no API key needed)
+      • JS / C / C++ / Java / Go / Rust → local toolchain when installed,
+        with compiled artifacts cached by source hash
       • Others  → JDoodle API (free tier, needs JDOODLE_CLIENT_ID/SECRET in .env)
+
+    Local runs call `on_output(text)` with the merged stdout/stderr so far
+    while the program is still running.
     """
     lang = language.lower().strip()
 
-    if lang == "python":
-        return _run_python_local(code, stdin)
-    else:
+    with span("runner", language=lang):
+        if lang == "python":
+            return _run_python_local(code, stdin, on_output)
+        if LOCAL_RUNNERS_ENABLED and local_toolchain_available(lang):
+            try:
+                return _run_local_toolchain(lang, code, stdin, on_output)
+            except OSError:
+                pass  # broken local toolchain / cache dir → fall back to JDoodle
         return _run_jdoodle(lang, code, stdin)
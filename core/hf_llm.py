@@ -1,17 +1,106 @@
 import os
+import time
+from typing import Iterator
 from dotenv import load_dotenv
 from langsmith import traceable
-# from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
-from langchain_google_genai import ChatGoogleGenerativeAI
+from core.llm_backends import get_backend
+from core.model_router import router, estimate_tokens
+from core.telemetry import span
+from core.scheduler import scheduler
+from core import prompts
 load_dotenv()
 
 
-model = ChatGoogleGenerativeAI(model="gemini-2.5-flash",temperature=0.7)
+# Selected by LLM_BACKEND: "gemini" (default), "openai" (local/OpenAI-compatible
+# server) or "fake" (deterministic offline stand-in).
+backend = get_backend()
+
+# Upper bound on a batched call's output, whatever the sections ask for.
+BATCH_MAX_OUTPUT_TOKENS = int(os.getenv("BATCH_MAX_OUTPUT_TOKENS", "4096"))
+
+
 @traceable(name="LLM_Query_for_Assistant")
-def query_llm(prompt: str) -> str:
-    response = model.invoke(prompt)
-    if hasattr(response, "content"):
-        return response.content
-    if isinstance(response, dict) and "content" in response:
-        return response["content"]
-    return str(response)
\ No newline at end of file
+def query_llm(prompt: str, prompt_type: str = "default") -> str:
+    """
+    Send a prompt to the model tier routed for `prompt_type`
+    (see core.model_router) and record its latency and token usage.
+    Waits for the caller's LLM quota first (see core.scheduler).
+    """
+    scheduler.acquire_llm()
+    tier_name, tier = router.select(prompt_type)
+
+    start = time.perf_counter()
+    try:
+        with span("llm", prompt_type=prompt_type, tier=tier_name):
+            result = backend.invoke(prompt, tier)
+    except Exception:
+        router.record(prompt_type, tier_name, (time.perf_counter() - start) * 1000, error=True)
+        raise
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    router.record(
+        prompt_type, tier_name, latency_ms,
+        input_tokens=result.input_tokens or estimate_tokens(prompt),
+        output_tokens=result.output_tokens or estimate_tokens(result.text),
+    )
+    return result.text
+
+
+def stream_llm(prompt: str, prompt_type: str = "default") -> Iterator[str]:
+    """
+    Streaming variant of query_llm: yields text chunks as the backend produces
+    them and records stats once the stream is exhausted.
+    """
+    scheduler.acquire_llm()
+    tier_name, tier = router.select(prompt_type)
+
+    start = time.perf_counter()
+    parts = []
+    try:
+        with span("llm_stream", prompt_type=prompt_type, tier=tier_name):
+            for chunk in backend.stream(prompt, tier):
+                parts.append(chunk)
+                yield chunk
+    except Exception:
+        router.record(prompt_type, tier_name, (time.perf_counter() - start) * 1000, error=True)
+        raise
+    text = "".join(parts)
+    router.record(
+        prompt_type, tier_name, (time.perf_counter() - start) * 1000,
+        input_tokens=estimate_tokens(prompt),
+        output_tokens=estimate_tokens(text),
+    )
+
+
+def query_batch(code: str, outline: str, sections: list, structured: bool = False) -> dict:
+    """
+    Answer several analyses of the same code with one call (see
+    core.prompts.batch_prompt) and split the response into
+    {section_id: text}. Recorded as "batch" and sent to the highest tier any
+    section is routed to, with the output budget raised to cover every
+    section. Sections missing from the response are left out.
+    """
+    scheduler.acquire_llm()
+    prompt = prompts.batch_prompt(code, outline, sections, structured)
+    primary = router.batch_tier(prompt_type for _, prompt_type, _ in sections)
+    tier_name, tier = router.select("batch", primary)
+    budget = min(BATCH_MAX_OUTPUT_TOKENS, prompts.batch_output_tokens(sections))
+    if tier.get("max_output_tokens"):
+        # The cap also covers the tier's thinking tokens; leave room for both.
+        budget += tier.get("thinking_budget") or 0
+        tier = {**tier, "max_output_tokens": max(tier["max_output_tokens"], budget)}
+
+    start = time.perf_counter()
+    try:
+        with span("llm", prompt_type="batch", tier=tier_name, sections=len(sections)):
+            result = backend.invoke(prompt, tier)
+    except Exception:
+        router.record("batch", tier_name, (time.perf_counter() - start) * 1000, error=True, primary=primary)
+        raise
+    router.record(
+        "batch", tier_name, (time.perf_counter() - start) * 1000,
+        input_tokens=result.input_tokens or estimate_tokens(prompt),
+        output_tokens=result.output_tokens or estimate_tokens(result.text),
+        primary=primary,
+    )
+    return prompts.split_batch(result.text, [section_id for section_id, _, _ in sections])
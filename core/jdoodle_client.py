@@ -0,0 +1,298 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from core import telemetry
+
+try:
+    import fcntl  # POSIX only
+except ImportError:
+    fcntl = None
+
+load_dotenv()
+
+API_URL        = os.getenv("JDOODLE_API_URL", "https://api.jdoodle.com/v1").rstrip("/")
+DAILY_QUOTA    = int(os.getenv("JDOODLE_DAILY_QUOTA", "200"))
+WARN_FRACTION  = float(os.getenv("JDOODLE_WARN_FRACTION", "0.8"))
+MAX_RETRIES    = int(os.getenv("JDOODLE_MAX_RETRIES", "2"))
+CACHE_TTL_S    = float(os.getenv("JDOODLE_CACHE_TTL_S", "3600"))
+CACHE_MAX      = int(os.getenv("JDOODLE_CACHE_MAX", "256"))
+LEDGER_PATH    = os.getenv("JDOODLE_LEDGER_PATH", os.path.join(".explainmate", "jdoodle_quota.json"))
+REQUEST_TIMEOUT_S = 15
+
+# 429 means the daily credits are spent; it is not retried.
+_RETRY_STATUSES = {500, 502, 503, 504}
+
+
+def _today() -> str:
+    # JDoodle's daily credits reset at midnight UTC.
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+class QuotaLedger:
+    """
+    Local count of JDoodle credits spent today, persisted to a small JSON file
+    so restarts and multiple sessions share one view of the daily quota.
+    The file is re-read before every read and update; updates hold a lock
+    file so processes sharing the ledger do not overwrite each other.
+    """
+
+    def __init__(self, path: str = LEDGER_PATH, quota: int = DAILY_QUOTA):
+        self.path = path
+        self.quota = quota
+        self._lock = threading.Lock()
+        self._state = {"date": _today(), "used": 0}
+        self._refresh()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("date") == _today() and isinstance(state.get("used"), int):
+                return state
+        except (OSError, ValueError, AttributeError):
+            pass
+        return None
+
+    def _refresh(self):
+        # Adopt credits other processes spent; keep ours if the file is behind
+        # (e.g. it could not be written).
+        self._roll()
+        state = self._load()
+        if state and state["used"] > self._state["used"]:
+            self._state = {"date": state["date"], "used": state["used"]}
+
+    @contextmanager
+    def _file_lock(self):
+        # Exclusive lock on "<path>.lock" around read-modify-write. Without
+        # fcntl (Windows) only the thread lock applies.
+        f = None
+        if fcntl is not None:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                f = open(f"{self.path}.lock", "a")
+                fcntl.flock(f, fcntl.LOCK_EX)
+            except OSError:
+                f = None
+        try:
+            yield
+        finally:
+            if f is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+                f.close()
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._state, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # the in-memory count still protects this process
+
+    def _roll(self):
+        if self._state["date"] != _today():
+            self._state = {"date": _today(), "used": 0}
+
+    def used(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._state["used"]
+
+    def remaining(self) -> int:
+        return max(0, self.quota - self.used())
+
+    def spend(self, n: int = 1):
+        with self._lock, self._file_lock():
+            self._refresh()
+            self._state["used"] += n
+            self._save()
+
+    def sync(self, used: int):
+        """Adopt the server's own count when it is ahead of ours."""
+        with self._lock, self._file_lock():
+            self._refresh()
+            if used > self._state["used"]:
+                self._state["used"] = used
+                self._save()
+
+
+class JDoodleClient:
+    """
+    JDoodle execute API over one keep-alive session, with bounded retries,
+    a local quota ledger and a TTL cache of results for identical inputs.
+
+    Degradation as the daily quota runs down:
+      • below WARN_FRACTION  → normal, failed requests retried
+      • at/after the warning → a quota note is appended, no retries
+      • quota exhausted      → only cached results; new runs refused locally
+    """
+
+    def __init__(self, api_url: str = API_URL, ledger: QuotaLedger | None = None,
+                 max_retries: int = MAX_RETRIES, cache_ttl_s: float = CACHE_TTL_S,
+                 cache_max: int = CACHE_MAX):
+        self.api_url = api_url.rstrip("/")
+        self.ledger = ledger or QuotaLedger()
+        self.max_retries = max_retries
+        self.cache_ttl_s = cache_ttl_s
+        self.cache_max = cache_max
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=8))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=8))
+
+        self._cache = OrderedDict()   # key → (expires_at, output)
+        self._cache_lock = threading.Lock()
+        self._synced_on = None
+
+    # ── Cache ─────────────────────────────────────────────────────────────────
+    @staticmethod
+    def _key(language: str, version_idx: str, code: str, stdin: str) -> str:
+        raw = "\0".join((language, version_idx, code, stdin))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str):
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                return entry[1]
+            self._cache.pop(key, None)
+            return None
+
+    def _cache_put(self, key: str, output: str):
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic() + self.cache_ttl_s, output)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_max:
+                self._cache.popitem(last=False)
+
+    # ── Quota ─────────────────────────────────────────────────────────────────
+    def _sync_quota(self, client_id: str, client_secret: str):
+        """Once per day, ask JDoodle how many credits were already spent."""
+        if self._synced_on == _today():
+            return
+        self._synced_on = _today()
+        try:
+            resp = self.session.post(
+                f"{self.api_url}/credit-spent",
+                json={"clientId": client_id, "clientSecret": client_secret},
+                timeout=5,
+            )
+            used = resp.json().get("used")
+            if isinstance(used, int):
+                self.ledger.sync(used)
+        except Exception:
+            pass
+
+    def _quota_reached(self, used: int) -> str:
+        return (
+            f"🚫 JDoodle daily quota reached ({used}/{self.ledger.quota}). "
+            "It resets at 00:00 UTC — install the language toolchain locally to keep running."
+        )
+
+    def quota_status(self) -> dict:
+        used = self.ledger.used()
+        return {"used": used, "quota": self.ledger.quota, "remaining": max(0, self.ledger.quota - used)}
+
+    # ── Execute ───────────────────────────────────────────────────────────────
+    def execute(self, language: str, version_idx: str, code: str, stdin: str = "",
+                use_cache: bool = True) -> str:
+        """Run code on JDoodle; returns program output or a user-facing message."""
+        client_id     = os.getenv("JDOODLE_CLIENT_ID", "")
+        client_secret = os.getenv("JDOODLE_CLIENT_SECRET", "")
+
+        if not client_id or not client_secret:
+            return (
+                "⚠️ JDoodle API keys not configured.\n"
+                "Add JDOODLE_CLIENT_ID and JDOODLE_CLIENT_SECRET to your .env file.\n"
+                "Get a free key at: https://www.jdoodle.com/compiler-api/"
+            )
+
+        key = self._key(language, version_idx, code, stdin)
+        if use_cache:
+            cached = self._cache_get(key)
+            telemetry.record_cache("jdoodle", cached is not None)
+            if cached is not None:
+                return cached
+
+        self._sync_quota(client_id, client_secret)
+        used = self.ledger.used()
+        if used >= self.ledger.quota:
+            return self._quota_reached(used)
+        warn = used + 1 >= WARN_FRACTION * self.ledger.quota
+        retries = 0 if warn else self.max_retries
+
+        payload = {
+            "clientId":     client_id,
+            "clientSecret": client_secret,
+            "script":       code,
+            "language":     language,
+            "versionIndex": version_idx,
+            "stdin":        stdin,
+        }
+
+        data, error = None, None
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(min(4.0, 0.5 * 2 ** (attempt - 1)))
+            try:
+                resp = self.session.post(f"{self.api_url}/execute", json=payload, timeout=REQUEST_TIMEOUT_S)
+            except requests.Timeout:
+                # It may still have run and been billed; re-read the server's count next time.
+                self._synced_on = None
+                error = "⏰ JDoodle request timed out."
+                continue
+            except requests.ConnectionError as e:
+                error = f"❌ JDoodle error: {e}"
+                continue
+            if resp.status_code == 429:
+                self.ledger.sync(self.ledger.quota)
+                return self._quota_reached(self.ledger.quota)
+            if resp.status_code in _RETRY_STATUSES:
+                error = f"JDoodle error: HTTP {resp.status_code}"
+                continue
+            if resp.status_code == 200:
+                # Only executions JDoodle answered are billed.
+                self.ledger.spend()
+            try:
+                data = resp.json()
+            except ValueError:
+                error = f"Unexpected response: {resp.text[:200]}"
+            break
+
+        if data is None:
+            return error
+        if "output" in data:
+            output = data["output"]
+            if use_cache and str(data.get("statusCode", 200)) == "200":
+                self._cache_put(key, output)
+        elif "error" in data:
+            return f"JDoodle error: {data['error']}"
+        else:
+            return f"Unexpected response: {data}"
+
+        if warn:
+            status = self.quota_status()
+            output += (f"\n\n⚠️ JDoodle quota: {status['used']}/{status['quota']} used today "
+                       f"({status['remaining']} left).")
+        return output
+
+
+_client = None
+
+
+def get_client() -> JDoodleClient:
+    """Process-wide client so every run shares the session, cache and ledger."""
+    global _client
+    if _client is None:
+        _client = JDoodleClient()
+    return _client
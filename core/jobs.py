@@ -0,0 +1,253 @@
+import itertools
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from core import telemetry
+from core.scheduler import scheduler
+
+load_dotenv()
+
+# Worker threads per job type; a slow type (e.g. code runs) cannot starve another.
+# Within a type, sessions share the workers by weighted fair queueing.
+DEFAULT_WORKERS = {"llm": 8, "run": 2, "trace": 2, "voice": 1, "index": 1}
+WORKERS = {
+    job_type: int(os.getenv(f"JOB_WORKERS_{job_type.upper()}", str(default)))
+    for job_type, default in DEFAULT_WORKERS.items()
+}
+# Finished jobs (and their results) are kept this long for later reruns.
+RESULT_TTL_S = float(os.getenv("JOB_RESULT_TTL_S", "1800"))
+# Max jobs remembered per session; the oldest finished ones go first.
+MAX_PER_SESSION = int(os.getenv("JOB_MAX_PER_SESSION", "50"))
+
+QUEUED, RUNNING, DONE, ERROR, CANCELLED = "queued", "running", "done", "error", "cancelled"
+_FINISHED = (DONE, ERROR, CANCELLED)
+
+
+class Job:
+    """
+    One submitted action. `fn(job)` runs on a worker; it may set
+    `job.progress` (e.g. output so far) for the UI to show while it runs.
+    """
+    __slots__ = ("id", "session_id", "ip", "job_type", "name", "key", "status", "result", "error",
+                 "progress", "submitted", "started", "finished", "tags", "_fn")
+
+    def __init__(self, job_id, session_id, ip, job_type, name, key, fn):
+        self.id = job_id
+        self.session_id = session_id
+        self.ip = ip
+        self.job_type = job_type
+        self.name = name
+        self.key = key
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.progress = None
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.tags = None           # (virtual start, virtual finish, id) in its fair queue
+        self._fn = fn
+
+    @property
+    def done(self) -> bool:
+        return self.status in _FINISHED
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since submission (or until it finished)."""
+        return (self.finished or time.monotonic()) - self.submitted
+
+
+def _eligible_in(job: Job) -> float:
+    # Seconds until the job's user may start it: LLM tokens / CPU budget.
+    if job.job_type == "llm":
+        return scheduler.llm_wait(job.session_id, job.ip)
+    if job.job_type == "run":
+        return scheduler.cpu_wait(job.session_id)
+    return 0.0
+
+
+def _cost(job: Job) -> float:
+    # Runs cost what the session's recent runs used; everything else costs 1.
+    return scheduler.cpu_cost(job.session_id) if job.job_type == "run" else 1.0
+
+
+class _FairQueue:
+    """
+    Start-time fair queueing of one job type across sessions. Each session's
+    jobs get virtual start/finish tags advanced by cost / weight, and a free
+    worker takes the eligible job with the smallest finish tag, so a session
+    that submits many jobs (or expensive runs) cannot push others back.
+    Jobs of a session over its quota are skipped until it refills.
+    """
+
+    def __init__(self, job_type: str, workers: int, run):
+        self._run = run
+        self._cond = threading.Condition()
+        self._queued = []
+        self._vtime = 0.0
+        self._last_finish = {}     # session → virtual finish tag of its last job
+        for i in range(max(1, workers)):
+            threading.Thread(target=self._work, name=f"job-{job_type}-{i}", daemon=True).start()
+
+    def push(self, job: Job):
+        with self._cond:
+            start = max(self._vtime, self._last_finish.get(job.session_id, 0.0))
+            finish = start + _cost(job) / scheduler.weight(job.ip)
+            self._last_finish[job.session_id] = finish
+            job.tags = (start, finish, job.id)
+            self._queued.append(job)
+            self._cond.notify()
+
+    def position(self, job: Job) -> int:
+        """1-based place of a queued job in the serving order (ignoring quotas)."""
+        with self._cond:
+            return 1 + sum(1 for j in self._queued if j.status == QUEUED and j.tags < job.tags)
+
+    def _next(self) -> Job:
+        with self._cond:
+            while True:
+                self._queued = [j for j in self._queued if j.status == QUEUED]
+                retry, waits = None, {}
+                for job in sorted(self._queued, key=lambda j: j.tags[1:]):
+                    wait = waits.setdefault(job.session_id, _eligible_in(job))
+                    if wait <= 0:
+                        self._queued.remove(job)
+                        self._vtime = max(self._vtime, job.tags[0])
+                        # Sessions whose last tag is behind the clock start from it anyway.
+                        self._last_finish = {k: f for k, f in self._last_finish.items() if f > self._vtime}
+                        return job
+                    retry = wait if retry is None else min(retry, wait)
+                self._cond.wait(timeout=min(retry, 1.0) if retry is not None else None)
+
+    def _work(self):
+        while True:
+            self._run(self._next())
+
+
+class JobQueue:
+    """
+    Process-wide queue for long actions (LLM calls, code runs, tracing, voice,
+    project indexing).
+
+    Usage from a Streamlit rerun:
+        jobs.submit(session_id, "llm", "optimization", code_hash, fn)
+        ...
+        job = jobs.get(session_id, "optimization", code_hash)
+
+    Jobs run on a worker pool per job type, shared fairly between sessions
+    (see _FairQueue), and outlive the rerun that submitted them; results
+    are looked up by (session, name, key), so they survive reruns and
+    several can be in flight at once.
+    """
+
+    def __init__(self, workers=None, result_ttl_s=RESULT_TTL_S, max_per_session=MAX_PER_SESSION):
+        self.result_ttl_s = result_ttl_s
+        self.max_per_session = max_per_session
+        self._pools = {job_type: _FairQueue(job_type, n, self._run) for job_type, n in (workers or WORKERS).items()}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs = {}        # job id → Job
+        self._latest = {}      # (session, name, key) → job id
+
+    # ── Submission ────────────────────────────────────────────────────────────
+    def submit(self, session_id: str, job_type: str, name: str, key: str, fn, replace: bool = False,
+               ip: str | None = None) -> Job:
+        """
+        Queue `fn(job)` unless a job for the same session, name and key is
+        already queued or running (or finished, unless `replace`), in which
+        case that job is returned instead.
+        """
+        if job_type not in self._pools:
+            raise ValueError(f"Unknown job type '{job_type}'. Choose one of: {', '.join(self._pools)}")
+        with self._lock:
+            self._gc_locked()
+            current = self._jobs.get(self._latest.get((session_id, name, key)))
+            if current and (not current.done or not replace):
+                return current
+            job = Job(next(self._ids), session_id, ip, job_type, name, key, fn)
+            self._jobs[job.id] = job
+            self._latest[(session_id, name, key)] = job.id
+        self._pools[job_type].push(job)
+        telemetry.incr(f"jobs_submitted_{job_type}")
+        return job
+
+    def _run(self, job: Job):
+        with self._lock:
+            if job.status != QUEUED:
+                return
+            job.status, job.started = RUNNING, time.monotonic()
+        telemetry.record_duration(f"job_wait:{job.job_type}", job.started - job.submitted, name=job.name)
+        try:
+            with scheduler.bound(job.session_id, job.ip):
+                result, error, status = job._fn(job), None, DONE
+        except Exception as e:
+            result, error, status = None, str(e) or type(e).__name__, ERROR
+        with self._lock:
+            if job.status == RUNNING:
+                job.result, job.error, job.status = result, error, status
+            job.finished = time.monotonic()
+            job._fn = None
+        telemetry.record_duration(f"job_run:{job.job_type}", job.finished - job.started,
+                                  error=status == ERROR, name=job.name)
+
+    # ── Lookup ────────────────────────────────────────────────────────────────
+    def get(self, session_id: str, name: str, key: str):
+        """Latest job for this session, name and key, or None."""
+        with self._lock:
+            return self._jobs.get(self._latest.get((session_id, name, key)))
+
+    def pending(self, session_id: str) -> list:
+        """The session's queued and running jobs, oldest first."""
+        with self._lock:
+            return [j for j in self._jobs.values() if j.session_id == session_id and not j.done]
+
+    def position(self, job: Job) -> int:
+        """1-based place of a queued job among the queued jobs of its type."""
+        return self._pools[job.job_type].position(job)
+
+    def blocked_for(self, job: Job) -> float:
+        """Seconds until the job's session is within its quota again (0 when it is)."""
+        return _eligible_in(job)
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancel a job. Queued jobs never start; a running one finishes in the
+        background but its result is discarded.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return False
+            job.status, job.finished = CANCELLED, time.monotonic()
+        telemetry.incr("jobs_cancelled")
+        return True
+
+    def stats(self) -> dict:
+        """Queued / running / finished job counts per job type."""
+        with self._lock:
+            counts = {job_type: {QUEUED: 0, RUNNING: 0, "finished": 0} for job_type in self._pools}
+            for job in self._jobs.values():
+                counts[job.job_type][job.status if not job.done else "finished"] += 1
+            return counts
+
+    # ── Housekeeping ──────────────────────────────────────────────────────────
+    def _gc_locked(self):
+        now = time.monotonic()
+        per_session = {}
+        for job in sorted(self._jobs.values(), key=lambda j: j.id, reverse=True):
+            kept = per_session.setdefault(job.session_id, 0)
+            if job.done and (now - job.finished > self.result_ttl_s or kept >= self.max_per_session):
+                self._drop_locked(job)
+            else:
+                per_session[job.session_id] = kept + 1
+
+    def _drop_locked(self, job: Job):
+        del self._jobs[job.id]
+        latest = (job.session_id, job.name, job.key)
+        if self._latest.get(latest) == job.id:
+            del self._latest[latest]
+
+
+jobs = JobQueue()
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from typing import Iterator, NamedTuple, Protocol
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class LLMResult(NamedTuple):
+    text: str
+    input_tokens: int | None = None
+    output_tokens: int | None = None
+
+
+class LLMBackend(Protocol):
+    """
+    What query_llm needs from a model provider. `tier` is the tier config
+    chosen by core.model_router (model, temperature, max_output_tokens,
+    thinking_budget, …).
+    """
+    name: str
+
+    def invoke(self, prompt: str, tier: dict) -> LLMResult: ...
+
+    def stream(self, prompt: str, tier: dict) -> Iterator[str]: ...
+
+
+# ── Google Gemini (LangChain) ─────────────────────────────────────────────────
+class GeminiBackend:
+    """Google Gemini through langchain-google-genai. Needs GOOGLE_API_KEY."""
+    name = "gemini"
+
+    def __init__(self):
+        self._models = {}
+
+    def _model(self, tier: dict):
+        key = (tier["model"], tier.get("temperature", 0.7), tier.get("max_output_tokens"),
+               tier.get("thinking_budget"))
+        if key not in self._models:
+            # Imported lazily so the other backends work without the Google SDK.
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            kwargs = {}
+            if tier.get("thinking_budget") is not None:
+                kwargs["thinking_budget"] = tier["thinking_budget"]
+            self._models[key] = ChatGoogleGenerativeAI(
+                model=tier["model"],
+                temperature=tier.get("temperature", 0.7),
+                max_output_tokens=tier.get("max_output_tokens"),
+                **kwargs,
+            )
+        return self._models[key]
+
+    @staticmethod
+    def _text(response) -> str:
+        if hasattr(response, "content"):
+            return response.content
+        if isinstance(response, dict) and "content" in response:
+            return response["content"]
+        return str(response)
+
+    def invoke(self, prompt: str, tier: dict) -> LLMResult:
+        response = self._model(tier).invoke(prompt)
+        usage = getattr(response, "usage_metadata", None) or {}
+        return LLMResult(self._text(response), usage.get("input_tokens"), usage.get("output_tokens"))
+
+    def stream(self, prompt: str, tier: dict) -> Iterator[str]:
+        for chunk in self._model(tier).stream(prompt):
+            text = self._text(chunk)
+            if text:
+                yield text
+
+
+# ── Local / OpenAI-compatible HTTP server ─────────────────────────────────────
+class OpenAICompatibleBackend:
+    """
+    Any server speaking the OpenAI chat-completions API (vLLM, llama.cpp,
+    Ollama, HuggingFace TGI, LM Studio, …).
+
+    Env: LLM_BASE_URL (default http://localhost:8000/v1), LLM_API_KEY,
+    LLM_LOCAL_MODEL (overrides the tier's model name, which is usually a
+    Gemini name the local server does not know).
+    """
+    name = "openai"
+
+    def __init__(self, base_url: str | None = None, api_key: str | None = None,
+                 model: str | None = None, timeout: float = 120):
+        self.base_url = (base_url or os.getenv("LLM_BASE_URL", "http://localhost:8000/v1")).rstrip("/")
+        self.api_key = api_key or os.getenv("LLM_API_KEY", "")
+        self.model = model or os.getenv("LLM_LOCAL_MODEL", "")
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def _payload(self, prompt: str, tier: dict, stream: bool) -> dict:
+        payload = {
+            "model":       self.model or tier["model"],
+            "messages":    [{"role": "user", "content": prompt}],
+            "temperature": tier.get("temperature", 0.7),
+            "stream":      stream,
+        }
+        if tier.get("max_output_tokens"):
+            payload["max_tokens"] = tier["max_output_tokens"]
+        return payload
+
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    def invoke(self, prompt: str, tier: dict) -> LLMResult:
+        resp = self._session.post(
+            f"{self.base_url}/chat/completions",
+            json=self._payload(prompt, tier, stream=False),
+            headers=self._headers(),
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        usage = data.get("usage") or {}
+        return LLMResult(
+            data["choices"][0]["message"]["content"] or "",
+            usage.get("prompt_tokens"),
+            usage.get("completion_tokens"),
+        )
+
+    def stream(self, prompt: str, tier: dict) -> Iterator[str]:
+        with self._session.post(
+            f"{self.base_url}/chat/completions",
+            json=self._payload(prompt, tier, stream=True),
+            headers=self._headers(),
+            timeout=self.timeout,
+            stream=True,
+        ) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    yield delta["content"]
+
+
+# ── Deterministic fake (offline benchmarking / CI) ────────────────────────────
+_FAKE_VOCAB = (
+    "the function iterates over the input list and returns a result in linear time "
+    "each recursive call reduces the problem size by one until the base case "
+    "a dictionary caches intermediate values so repeated states are computed once "
+    "edge cases include empty input negative numbers and very large values"
+).split()
+
+
+_FAKE_MARKER_RE = re.compile(r"^=== \w+ ===$", re.M)
+
+
+class FakeBackend:
+    """
+    Deterministic stand-in: the same prompt and tier always give the same text.
+
+    Env: FAKE_LLM_CHARS (response size, default 400), FAKE_LLM_LATENCY_MS
+    (total simulated latency, default 0), FAKE_LLM_CHUNK_CHARS (stream chunk
+    size, default 16). Latency is spread evenly across stream chunks.
+    """
+    name = "fake"
+
+    def __init__(self, chars: int | None = None, latency_ms: float | None = None,
+                 chunk_chars: int | None = None):
+        self.chars = chars if chars is not None else int(os.getenv("FAKE_LLM_CHARS", "400"))
+        self.latency_ms = (latency_ms if latency_ms is not None
+                           else float(os.getenv("FAKE_LLM_LATENCY_MS", "0")))
+        self.chunk_chars = max(1, chunk_chars if chunk_chars is not None
+                               else int(os.getenv("FAKE_LLM_CHUNK_CHARS", "16")))
+
+    def _text(self, prompt: str, tier: dict) -> str:
+        # Batched prompts (core.prompts.batch_prompt) get one answer per marker.
+        markers = _FAKE_MARKER_RE.findall(prompt)
+        if markers:
+            return "\n".join(f"{marker}\n{self._answer(f'{marker}{prompt}', tier)}" for marker in markers)
+        return self._answer(prompt, tier)
+
+    def _answer(self, prompt: str, tier: dict) -> str:
+        seed = hashlib.sha256(f"{tier.get('model')}\0{prompt}".encode("utf-8")).digest()
+        rng = random.Random(seed)
+        words, size = [], 0
+        while size < self.chars:
+            word = rng.choice(_FAKE_VOCAB)
+            words.append(word)
+            size += len(word) + 1
+        text = " ".join(words)[: self.chars]
+        # Break into short lines so markdown rendering looks like a real answer.
+        return "\n".join(text[i:i + 80] for i in range(0, len(text), 80))
+
+    def invoke(self, prompt: str, tier: dict) -> LLMResult:
+        text = self._text(prompt, tier)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return LLMResult(text, max(1, len(prompt) // 4), max(1, len(text) // 4))
+
+    def stream(self, prompt: str, tier: dict) -> Iterator[str]:
+        text = self._text(prompt, tier)
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+        delay = self.latency_ms / 1000 / len(chunks)
+        for chunk in chunks:
+            if delay:
+                time.sleep(delay)
+            yield chunk
+
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "openai": OpenAICompatibleBackend,
+    "fake":   FakeBackend,
+}
+
+
+def get_backend(name: str | None = None) -> LLMBackend:
+    """Instantiate the backend named by `name` or the LLM_BACKEND env var (default: gemini)."""
+    name = (name or os.getenv("LLM_BACKEND", "gemini")).lower().strip()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
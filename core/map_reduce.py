@@ -0,0 +1,247 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from core import prompts, telemetry
+from core.hf_llm import query_llm
+from core.unit_analysis import unit_cache
+from utils.utils_units import split_units
+
+load_dotenv()
+
+# Files with at least this many lines are explained with the map-reduce pipeline.
+LARGE_FILE_LINES = int(os.getenv("MAP_REDUCE_MIN_LINES", "400"))
+# Max source lines per map chunk; definitions are never split unless larger.
+CHUNK_MAX_LINES = int(os.getenv("MAP_REDUCE_CHUNK_LINES", "150"))
+# Max LLM calls in flight during the map and reduce phases.
+WORKERS = int(os.getenv("MAP_REDUCE_WORKERS", "6"))
+# Max notes fed into one reduce call; more are summarized in sections first.
+REDUCE_FANIN = max(2, int(os.getenv("MAP_REDUCE_FANIN", "12")))
+
+
+def is_large(code: str) -> bool:
+    return code.count("\n") + 1 >= LARGE_FILE_LINES
+
+
+def _hash(*parts) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+# ── Chunking ──────────────────────────────────────────────────────────────────
+def _line_windows(unit: dict, max_lines: int) -> list:
+    """Last resort for one oversized block: cut at blank lines near the limit."""
+    lines = unit["source"].split("\n")
+    parts, start = [], 0
+    while start < len(lines):
+        end = min(len(lines), start + max_lines)
+        if end < len(lines):
+            blank = max((i for i in range(start + max_lines // 2, end) if not lines[i].strip()), default=None)
+            end = blank + 1 if blank is not None else end
+        source = "\n".join(lines[start:end])
+        parts.append({
+            "name":     f"{unit['name']} (part {len(parts) + 1})",
+            "kind":     unit["kind"],
+            "start":    unit["start"] + start,
+            "end":      unit["start"] + end - 1,
+            "source":   source,
+            "key":      _hash(unit["key"], str(len(parts)), source),
+            "children": [],
+        })
+        start = end
+    return parts
+
+
+def _fit(unit: dict, max_lines: int) -> list:
+    if unit["end"] - unit["start"] + 1 <= max_lines:
+        return [unit]
+    if unit["children"]:
+        return [part for child in unit["children"] for part in _fit(child, max_lines)]
+    return _line_windows(unit, max_lines)
+
+
+def make_chunks(code: str, lang: str, max_lines: int = CHUNK_MAX_LINES) -> list:
+    """
+    Pack consecutive definitions into chunks of at most `max_lines` lines,
+    never mixing members of different classes. Each chunk is
+    {"label", "parent", "start", "end", "source", "key", "members"} where
+    `parent` is the enclosing class name (None for module level).
+    """
+    chunks, current = [], None
+    for top in split_units(code, lang):
+        parent = top["name"] if top["kind"] == "class" and top["children"] else None
+        for unit in _fit(top, max_lines) if parent or top["end"] - top["start"] + 1 > max_lines else [top]:
+            size = unit["end"] - unit["start"] + 1
+            if current and current["parent"] == parent and current["end_line"] - current["start"] + 1 + size <= max_lines:
+                current["members"].append(unit)
+                current["end_line"] = unit["end"]
+            else:
+                current = {"parent": parent, "start": unit["start"], "end_line": unit["end"], "members": [unit]}
+                chunks.append(current)
+
+    lines = code.split("\n")
+    for chunk in chunks:
+        chunk["end"] = chunk.pop("end_line")
+        chunk["source"] = "\n".join(lines[chunk["start"] - 1:chunk["end"]])
+        chunk["key"] = _hash(lang, *(u["key"] for u in chunk["members"]))
+        names = [u["name"] for u in chunk["members"] if u["kind"] != "module"]
+        chunk["label"] = f"lines {chunk['start']}-{chunk['end']}" + (f": {', '.join(names[:6])}" if names else "")
+    return chunks
+
+
+# ── Map / reduce ──────────────────────────────────────────────────────────────
+def _failed(text: str) -> bool:
+    return text.startswith(("❌", "⏰"))
+
+
+def _cached_query(key: str, prompt: str, prompt_type: str, query, store: bool = True):
+    """
+    Cached `query(prompt, prompt_type)`. Failures are never stored, and
+    neither is a summary built from a failed input (`store=False`), so the
+    next run retries them.
+    """
+    text = unit_cache.get(key)
+    if text is not None:
+        return text, True
+    text = query(prompt, prompt_type)
+    if store and not _failed(text):
+        unit_cache.put(key, text)
+    return text, False
+
+
+def _parallel(jobs: dict, workers: int, on_done):
+    """Run {id: zero-arg callable} with bounded parallelism; on_done(id, result) in this thread."""
+    results = {}
+    if not jobs:
+        return results
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs))), thread_name_prefix="map-reduce") as pool:
+        futures = {pool.submit(fn): job_id for job_id, fn in jobs.items()}
+        for future in as_completed(futures):
+            job_id = futures[future]
+            try:
+                results[job_id] = future.result()
+            except Exception as e:
+                results[job_id] = (f"❌ Analysis failed: {e}", False)
+            on_done(job_id, results[job_id])
+    return results
+
+
+def explain_large(code: str, lang: str, outline: str, query=query_llm,
+                  workers: int = WORKERS, on_event=None) -> dict:
+    """
+    Map-reduce explanation for files too big for one prompt:
+
+      map     — every chunk is explained concurrently (at most `workers` calls)
+      reduce  — class summaries from their chunks, then the top-level notes in
+                groups of REDUCE_FANIN until one module summary remains
+
+    `on_event(kind, payload)` streams partial results in the caller's thread:
+    ("plan", {"chunks"}), ("chunk", {"chunk", "notes", "cached"}),
+    ("class", {"name", "summary"}), ("section", {"name", "summary"}) and
+    finally ("summary", text).
+    Every call is cached on its inputs, so re-running after an edit only
+    re-queries the chunks that changed and the summaries above them.
+
+    Returns {"summary", "classes", "chunks", "llm_calls", "cached_calls"}.
+    """
+    emit = on_event or (lambda kind, payload: None)
+    stats = {"llm_calls": 0, "cached_calls": 0}
+
+    def count(cached):
+        stats["cached_calls" if cached else "llm_calls"] += 1
+
+    with telemetry.span("map_reduce", lang=lang):
+        chunks = make_chunks(code, lang)
+        emit("plan", {"chunks": len(chunks)})
+
+        # Map
+        def map_job(chunk):
+            prompt = prompts.chunk_explanation_prompt(chunk["source"], chunk["label"], outline)
+            return lambda: _cached_query(_hash("chunk", chunk["key"]), prompt, "chunk_explanation", query)
+
+        def on_chunk(i, result):
+            chunks[i]["notes"], cached = result
+            count(cached)
+            emit("chunk", {"chunk": chunks[i], "notes": chunks[i]["notes"], "cached": cached})
+
+        _parallel({i: map_job(c) for i, c in enumerate(chunks)}, workers, on_chunk)
+
+        # Reduce · classes
+        classes = {}
+        for chunk in chunks:
+            if chunk["parent"]:
+                classes.setdefault(chunk["parent"], []).append(chunk)
+        class_summaries = {}
+
+        def class_job(name):
+            members = classes[name]
+            notes = "\n".join(f"[{c['label']}]\n{c['notes']}" for c in members)
+            key = _hash("class", name, *(c["key"] for c in members))
+            store = not any(_failed(c["notes"]) for c in members)
+            return lambda: _cached_query(key, prompts.reduce_summary_prompt("class", name, notes), "reduce_summary",
+                                         query, store)
+
+        def on_class(name, result):
+            class_summaries[name], cached = result
+            count(cached)
+            emit("class", {"name": name, "summary": class_summaries[name]})
+
+        # A class that fits in one chunk is already summarized by its map note.
+        single = {name for name, members in classes.items() if len(members) == 1}
+        for name in single:
+            class_summaries[name] = classes[name][0]["notes"]
+            emit("class", {"name": name, "summary": class_summaries[name]})
+        _parallel({name: class_job(name) for name in classes if name not in single}, workers, on_class)
+
+        # Reduce · module, hierarchically. Items are (key, text, failed), where
+        # failed marks text that is or was built from a failed call.
+        items, seen = [], set()
+        for chunk in chunks:
+            if chunk["parent"] is None:
+                items.append((chunk["key"], f"[{chunk['label']}]\n{chunk['notes']}", _failed(chunk["notes"])))
+            elif chunk["parent"] not in seen:
+                seen.add(chunk["parent"])
+                members = classes[chunk["parent"]]
+                summary = class_summaries[chunk["parent"]]
+                items.append((_hash(*(c["key"] for c in members)),
+                              f"[class {chunk['parent']}, lines {members[0]['start']}-{members[-1]['end']}]\n{summary}",
+                              _failed(summary) or any(_failed(c["notes"]) for c in members)))
+
+        level = 0
+        while len(items) > REDUCE_FANIN:
+            level += 1
+            groups = [items[i:i + REDUCE_FANIN] for i in range(0, len(items), REDUCE_FANIN)]
+            reduced = [None] * len(groups)
+
+            def section_job(g, group, level=level):
+                name = f"level {level}, part {g + 1} of {len(groups)}"
+                key = _hash("section", *(k for k, _, _ in group))
+                notes = "\n".join(text for _, text, _ in group)
+                store = not any(failed for _, _, failed in group)
+                return lambda: _cached_query(key, prompts.reduce_summary_prompt("section", name, notes), "reduce_summary",
+                                             query, store)
+
+            def on_section(g, result, level=level):
+                text, cached = result
+                count(cached)
+                failed = _failed(text) or any(failed for _, _, failed in groups[g])
+                reduced[g] = (_hash("section", *(k for k, _, _ in groups[g])), f"[section {g + 1}]\n{text}", failed)
+                emit("section", {"name": f"level {level}, part {g + 1}", "summary": text})
+
+            _parallel({g: section_job(g, group) for g, group in enumerate(groups)}, workers, on_section)
+            items = reduced
+
+        summary, cached = _cached_query(
+            _hash("module", *(k for k, _, _ in items)),
+            prompts.reduce_summary_prompt("module", "", "\n".join(text for _, text, _ in items), outline),
+            "reduce_summary", query, not any(failed for _, _, failed in items),
+        )
+        count(cached)
+        emit("summary", summary)
+
+    return {
+        "summary":      summary,
+        "classes":      class_summaries,
+        "chunks":       chunks,
+        "llm_calls":    stats["llm_calls"],
+        "cached_calls": stats["cached_calls"],
+    }
@@ -0,0 +1,130 @@
+"""
+Runs one function from a user script, either as written or with transparent
+argument-keyed caching, in a child process started by core.memo_sim. Standard
+library only, copied next to the script like core/profile_harness.py.
+
+    python memo_harness.py <script> <func> <input_repr> <plain|memo> <result.json> <budget_s>
+
+Writes {"status", "calls", "unique_states", "cache_hits", "uncacheable",
+"wall_ms", "peak_kb", "result", "error"} to <result.json>, also after a timeout, so a
+plain run that never finishes still reports how far it got.
+"""
+import json
+import reprlib
+import resource
+import signal
+import sys
+import time
+
+RESULT_REPR_LIMIT = 120
+RECURSION_LIMIT = 10000
+
+
+class _BudgetExceeded(BaseException):
+    pass
+
+
+def _freeze(value):
+    """Hashable stand-in for an argument, so list/dict/set inputs can be cached."""
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(_freeze(v) for v in value))
+    if isinstance(value, dict):
+        return ("dict", frozenset((_freeze(k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return ("set", frozenset(_freeze(v) for v in value))
+    hash(value)
+    return value
+
+
+def _state_key(args, kwargs):
+    try:
+        return _freeze((args, tuple(sorted(kwargs.items()))))
+    except TypeError:
+        return None
+
+
+def _preview(value) -> str:
+    r = reprlib.Repr()
+    r.maxstring = r.maxother = RESULT_REPR_LIMIT
+    return r.repr(value)
+
+
+def _peak_kb() -> int:
+    # ru_maxrss is in KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def main():
+    script, func_name, input_repr, mode, result_path, budget_s = sys.argv[1:7]
+    stats = {"calls": 0, "cache_hits": 0, "uncacheable": 0}
+    states = set()    # hashes of argument states; cheap enough for the plain run
+    cache = {}
+
+    def _blocked_input(prompt=""):
+        raise RuntimeError("input() is not supported here; pass the value via the Input field.")
+
+    def make_wrapper(f):
+        def wrapper(*args, **kwargs):
+            stats["calls"] += 1
+            key = _state_key(args, kwargs)
+            if key is None:
+                stats["uncacheable"] += 1
+                return f(*args, **kwargs)
+            states.add(hash(key))
+            if mode == "memo":
+                if key in cache:
+                    stats["cache_hits"] += 1
+                    return cache[key]
+                cache[key] = result = f(*args, **kwargs)
+                return result
+            return f(*args, **kwargs)
+        return wrapper
+
+    def _on_budget(signum, frame):
+        raise _BudgetExceeded()
+
+    status, error, result, wall = "ok", None, None, 0.0
+    baseline_kb = _peak_kb()
+    try:
+        with open(script, "r", encoding="utf-8") as f:
+            namespace = {"__name__": "__memo_sim__", "input": _blocked_input, "print": lambda *a, **kw: None}
+            exec(compile(f.read(), "<your code>", "exec"), namespace)
+        if func_name not in namespace:
+            raise NameError(f"function {func_name!r} not found")
+        namespace[func_name] = wrapped = make_wrapper(namespace[func_name])
+        value = eval(input_repr, {})
+        args = value if isinstance(value, (list, tuple)) else (value,)
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), RECURSION_LIMIT))
+        baseline_kb = _peak_kb()
+
+        signal.signal(signal.SIGALRM, _on_budget)
+        signal.setitimer(signal.ITIMER_REAL, float(budget_s))
+        started = time.perf_counter()
+        try:
+            result = wrapped(*args)
+        finally:
+            wall = time.perf_counter() - started
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    except _BudgetExceeded:
+        status = "timeout"
+    except BaseException as e:
+        status, error = "error", f"{type(e).__name__}: {e}"
+
+    report = {
+        "status":        status,
+        "calls":         stats["calls"],
+        "unique_states": len(states),
+        "cache_hits":    stats["cache_hits"],
+        "uncacheable":   stats["uncacheable"],
+        "wall_ms":       round(wall * 1000, 3),
+        "peak_kb":       max(0, _peak_kb() - baseline_kb),
+        "result":        _preview(result) if status == "ok" else None,
+        "error":         error,
+    }
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(report, f)
+
+
+if __name__ == "__main__":
+    main()
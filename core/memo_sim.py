@@ -0,0 +1,75 @@
+import json
+import os
+import shutil
+import tempfile
+from dotenv import load_dotenv
+from core.code_runner import RUN_TIMEOUT_S, _stream_process
+from core.telemetry import span
+
+load_dotenv()
+
+_HARNESS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memo_harness.py")
+
+# Per-run budget; the exponential "as written" run is simply stopped here.
+MEMO_SIM_TIMEOUT_S = int(os.getenv("MEMO_SIM_TIMEOUT_S", str(RUN_TIMEOUT_S)))
+
+MODES = ("plain", "memo")
+
+
+def _run_mode(tmp: str, script: str, func_name: str, input_repr: str, mode: str) -> dict:
+    result_path = os.path.join(tmp, f"{mode}.json")
+    budget = max(1, MEMO_SIM_TIMEOUT_S - 1)
+    try:
+        run = _stream_process(
+            ["python", os.path.join(tmp, "_memo_harness.py"), script, func_name, input_repr,
+             mode, result_path, str(budget)],
+            cwd=tmp, timeout=MEMO_SIM_TIMEOUT_S, limit_memory=True,
+        )
+    except OSError as e:
+        return _failed(f"❌ Local execution error: {e}")
+    try:
+        with open(result_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        if run.timed_out:
+            return _failed(f"⏰ Execution timed out ({MEMO_SIM_TIMEOUT_S}s limit).")
+        # Killed by the memory limit or a hard crash before the report was written.
+        return _failed(f"❌ Run failed: {run.stderr.strip()[-300:] or 'no report produced'}")
+
+
+def _failed(message: str) -> dict:
+    return {"status": "failed", "calls": 0, "unique_states": 0, "cache_hits": 0, "uncacheable": 0,
+            "wall_ms": 0.0, "peak_kb": 0, "result": None, "error": message}
+
+
+def simulate_memoization(code: str, func_name: str, input_value) -> dict:
+    """
+    Call `func_name(input_value)` twice, each in its own sandboxed process:
+    once as written and once with every call cached on its arguments.
+
+    Returns {"plain": run, "memo": run, "speedup", "same_result"} where each
+    run is {"status", "calls", "unique_states", "cache_hits", "uncacheable",
+    "wall_ms", "peak_kb", "result", "error"} and status is "ok", "error",
+    "timeout" (counts cover the part that ran) or "failed". The runs are
+    sequential so they never compete for the CPU and their timings compare.
+    """
+    input_repr = repr(input_value)
+    with span("memo_sim"), tempfile.TemporaryDirectory(prefix="explainmate-memo-") as tmp:
+        script = os.path.join(tmp, "main.py")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(code)
+        shutil.copy(_HARNESS, os.path.join(tmp, "_memo_harness.py"))
+        runs = {mode: _run_mode(tmp, script, func_name, input_repr, mode) for mode in MODES}
+
+    plain, memo = runs["plain"], runs["memo"]
+    both_ok = plain["status"] == memo["status"] == "ok"
+    speedup = None
+    if memo["status"] == "ok" and plain["status"] in ("ok", "timeout") and memo["wall_ms"] > 0:
+        # After a timeout this is a lower bound.
+        speedup = plain["wall_ms"] / memo["wall_ms"]
+    return {
+        "plain":       plain,
+        "memo":        memo,
+        "speedup":     speedup,
+        "same_result": plain["result"] == memo["result"] if both_ok else None,
+    }
@@ -0,0 +1,228 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+from core.telemetry import percentile
+
+load_dotenv()
+
+# ── Model tiers ───────────────────────────────────────────────────────────────
+# Each tier is one model configuration. `slo_ms` is the latency objective for
+# the tier's rolling p95; when it is exceeded, requests move to `fallback`.
+# On Gemini 2.5 thinking tokens count against `max_output_tokens`, so every
+# tier sets an explicit `thinking_budget` and keeps its cap well above it
+# (None = uncapped). gemini-2.5-pro cannot turn thinking off (minimum 128).
+DEFAULT_TIERS = {
+    "fast": {
+        "model":             "gemini-2.5-flash-lite",
+        "temperature":       0.5,
+        "max_output_tokens": 1024,
+        "thinking_budget":   0,
+        "slo_ms":            4000,
+        "fallback":          None,
+    },
+    "balanced": {
+        "model":             "gemini-2.5-flash",
+        "temperature":       0.7,
+        "max_output_tokens": 4096,
+        "thinking_budget":   1024,
+        "slo_ms":            8000,
+        "fallback":          "fast",
+    },
+    "deep": {
+        "model":             "gemini-2.5-pro",
+        "temperature":       0.3,
+        "max_output_tokens": None,
+        "thinking_budget":   2048,
+        "slo_ms":            20000,
+        "fallback":          "balanced",
+    },
+}
+
+# Maps prompt types (see core.prompts.PROMPT_TYPES) → tier name.
+# Short answers go to the fast tier, code rewrites to the deep tier.
+DEFAULT_ROUTES = {
+    "explanation":                "balanced",
+    "complexity":                 "balanced",
+    "followup":                   "fast",
+    "interview":                  "balanced",
+    "edge_case":                  "balanced",
+    "bug_finder":                 "deep",
+    "optimization":               "deep",
+    "whiteboard_questions":       "balanced",
+    "difficulty_based_questions": "balanced",
+    "tradeoff_explanation":       "fast",
+    "conversation":               "fast",
+    "chat_summary":               "fast",
+    "unit_analysis":              "fast",
+    "stitch_summary":             "fast",
+    "chunk_explanation":          "fast",
+    "reduce_summary":             "balanced",
+    "default":                    "balanced",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) when the API reports none."""
+    return max(1, len(text or "") // 4)
+
+
+class ModelRouter:
+    """
+    Picks a model tier per prompt type and tracks per-route latency/token stats.
+
+    A tier whose rolling p95 latency exceeds its SLO is skipped in favour of its
+    `fallback` tier. While degraded, one probe request every `probe_interval_s`
+    still goes to the primary tier so it can recover once it is fast again.
+    """
+
+    def __init__(self, tiers=None, routes=None, window=50, min_samples=5,
+                 probe_interval_s=30.0):
+        self.tiers = {name: dict(cfg) for name, cfg in (tiers or DEFAULT_TIERS).items()}
+        self.routes = dict(routes or DEFAULT_ROUTES)
+        self.window = window
+        self.min_samples = min_samples
+        self.probe_interval_s = probe_interval_s
+
+        self._lock = threading.Lock()
+        self._tier_latency = {name: deque(maxlen=window) for name in self.tiers}
+        self._last_probe = {}
+        self._route_stats = {}
+
+    # ── Selection ─────────────────────────────────────────────────────────────
+    def tier_p95(self, tier_name: str) -> float:
+        with self._lock:
+            return percentile(list(self._tier_latency.get(tier_name, ())), 95)
+
+    def _is_degraded(self, tier_name: str) -> bool:
+        samples = self._tier_latency.get(tier_name)
+        if not samples or len(samples) < self.min_samples:
+            return False
+        return percentile(list(samples), 95) > self.tiers[tier_name].get("slo_ms", float("inf"))
+
+    def primary_tier(self, prompt_type: str) -> str:
+        """The tier a prompt type is routed to before any fallback."""
+        tier_name = self.routes.get(prompt_type) or self.routes.get("default", "balanced")
+        return tier_name if tier_name in self.tiers else next(iter(self.tiers))
+
+    def _rank(self, tier_name: str) -> int:
+        # Number of fallbacks below a tier: deep → balanced → fast ranks deep 2.
+        rank, seen = 0, {tier_name}
+        while (tier_name := self.tiers.get(tier_name, {}).get("fallback")) and tier_name not in seen:
+            seen.add(tier_name)
+            rank += 1
+        return rank
+
+    def batch_tier(self, prompt_types) -> str:
+        """Highest tier among the prompt types' routes, so batching never downgrades one."""
+        return max((self.primary_tier(p) for p in prompt_types), key=self._rank)
+
+    def select(self, prompt_type: str = "default", tier_name: str | None = None):
+        """
+        Return (tier_name, tier_config) for a prompt type (or for the primary
+        `tier_name` when given), following fallbacks while the chosen tier is
+        over its SLO.
+        """
+        tier_name = tier_name if tier_name in self.tiers else self.primary_tier(prompt_type)
+
+        now = time.monotonic()
+        seen = set()
+        with self._lock:
+            while tier_name not in seen and self._is_degraded(tier_name):
+                seen.add(tier_name)
+                fallback = self.tiers[tier_name].get("fallback")
+                if not fallback or fallback not in self.tiers:
+                    break
+                if now - self._last_probe.setdefault(tier_name, now) >= self.probe_interval_s:
+                    self._last_probe[tier_name] = now
+                    break
+                tier_name = fallback
+        return tier_name, self.tiers[tier_name]
+
+    # ── Stats ─────────────────────────────────────────────────────────────────
+    def record(self, prompt_type: str, tier_name: str, latency_ms: float,
+               input_tokens: int = 0, output_tokens: int = 0, error: bool = False,
+               primary: str | None = None):
+        """
+        Record the outcome of one call routed for `prompt_type` to `tier_name`
+        (`primary`: the tier it was meant for, when not the prompt type's route).
+        """
+        primary = primary or self.primary_tier(prompt_type)
+        with self._lock:
+            self._tier_latency.setdefault(tier_name, deque(maxlen=self.window)).append(latency_ms)
+            stats = self._route_stats.setdefault(prompt_type, {
+                "calls": 0, "errors": 0, "fallbacks": 0,
+                "input_tokens": 0, "output_tokens": 0,
+                "latency_ms": deque(maxlen=self.window),
+                "tiers": {},
+            })
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["fallbacks"] += int(tier_name != primary)
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+            stats["latency_ms"].append(latency_ms)
+            stats["tiers"][tier_name] = stats["tiers"].get(tier_name, 0) + 1
+
+    def route_stats(self) -> dict:
+        """Snapshot of per-route call counts, latency percentiles and token totals."""
+        with self._lock:
+            snapshot = {}
+            for prompt_type, s in self._route_stats.items():
+                latencies = list(s["latency_ms"])
+                snapshot[prompt_type] = {
+                    "calls":         s["calls"],
+                    "errors":        s["errors"],
+                    "fallbacks":     s["fallbacks"],
+                    "p50_ms":        round(percentile(latencies, 50), 1),
+                    "p95_ms":        round(percentile(latencies, 95), 1),
+                    "input_tokens":  s["input_tokens"],
+                    "output_tokens": s["output_tokens"],
+                    "tiers":         dict(s["tiers"]),
+                }
+            return snapshot
+
+    def tier_stats(self) -> dict:
+        """Rolling p95 vs SLO for every tier."""
+        with self._lock:
+            return {
+                name: {
+                    "model":    cfg.get("model"),
+                    "samples":  len(self._tier_latency.get(name, ())),
+                    "p95_ms":   round(percentile(list(self._tier_latency.get(name, ())), 95), 1),
+                    "slo_ms":   cfg.get("slo_ms"),
+                    "degraded": self._is_degraded(name),
+                }
+                for name, cfg in self.tiers.items()
+            }
+
+
+def load_router(config_path: str | None = None) -> ModelRouter:
+    """
+    Build a router from the defaults, overlaid with a JSON config file.
+
+    The file path comes from `config_path` or the LLM_ROUTER_CONFIG env var and
+    may contain any of: "tiers" (merged per tier), "routes", "window",
+    "min_samples", "probe_interval_s".
+    """
+    tiers = {name: dict(cfg) for name, cfg in DEFAULT_TIERS.items()}
+    routes = dict(DEFAULT_ROUTES)
+    options = {}
+
+    path = config_path or os.getenv("LLM_ROUTER_CONFIG", "")
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        for name, overrides in config.get("tiers", {}).items():
+            tiers.setdefault(name, {}).update(overrides)
+        routes.update(config.get("routes", {}))
+        for key in ("window", "min_samples", "probe_interval_s"):
+            if key in config:
+                options[key] = config[key]
+
+    return ModelRouter(tiers=tiers, routes=routes, **options)
+
+
+router = load_router()
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from core import telemetry
+
+load_dotenv()
+
+# Seconds the editor content must stay unchanged before prefetching starts.
+DEBOUNCE_S = float(os.getenv("PREFETCH_DEBOUNCE_S", "3"))
+# Max prefetched LLM calls per session in any rolling hour.
+BUDGET_PER_HOUR = int(os.getenv("PREFETCH_BUDGET_PER_HOUR", "15"))
+# Max analyses queued per code version.
+MAX_PER_VERSION = int(os.getenv("PREFETCH_MAX_PER_VERSION", "3"))
+WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+# Sessions not seen for this long are assumed closed and forgotten.
+SESSION_TTL_S = float(os.getenv("PREFETCH_SESSION_TTL_S", "3600"))
+
+
+def code_key(code: str, lang: str) -> str:
+    """Identifies one version of the editor content."""
+    return hashlib.sha256(f"{lang}\0{code}".encode("utf-8")).hexdigest()
+
+
+class _SessionState:
+    def __init__(self):
+        self.code_key = None
+        self.kinds = set()         # analyses scheduled for code_key
+        self.timer = None
+        self.futures = {}          # kind → Future
+        self.spent = deque()       # timestamps of prefetch submissions
+        self.seen = time.monotonic()
+
+
+class Prefetcher:
+    """
+    Speculatively runs the most-used analyses once the code stops changing.
+
+    Usage from a Streamlit rerun:
+        prefetcher.code_changed(session_id, key, {"explanation": fn, ...})
+        ...
+        future = prefetcher.take(session_id, "explanation", key)
+
+    `take` returns the finished or in-flight Future for the current code
+    version, or None when nothing was prefetched. Any change to the code
+    cancels the pending timer and queued work for the old version. Sessions
+    idle for `session_ttl_s` are dropped.
+    """
+
+    def __init__(self, debounce_s=DEBOUNCE_S, budget_per_hour=BUDGET_PER_HOUR,
+                 max_per_version=MAX_PER_VERSION, workers=WORKERS, session_ttl_s=SESSION_TTL_S):
+        self.debounce_s = debounce_s
+        self.session_ttl_s = session_ttl_s
+        self.budget_per_hour = budget_per_hour
+        self.max_per_version = max_per_version
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._usage = Counter()
+
+    # ── Usage ordering ────────────────────────────────────────────────────────
+    def record_use(self, kind: str):
+        """Count a user click on an analysis; prefetch order follows these counts."""
+        with self._lock:
+            self._usage[kind] += 1
+
+    def _ordered(self, kinds):
+        # Stable: ties keep the caller's order (Explanation, Complexity, Bugs).
+        return sorted(kinds, key=lambda k: -self._usage[k])
+
+    # ── Lifecycle ─────────────────────────────────────────────────────────────
+    def code_changed(self, session_id: str, key: str, tasks: dict):
+        """
+        Report the current code version. A new version cancels old work and
+        arms a debounce timer that submits `tasks` (kind → zero-arg callable).
+        """
+        with self._lock:
+            self._evict_locked()
+            state = self._sessions.setdefault(session_id, _SessionState())
+            state.seen = time.monotonic()
+            if state.code_key == key:
+                return
+            self._cancel_locked(state)
+            state.code_key = key
+            state.kinds = set(tasks)
+            state.timer = threading.Timer(self.debounce_s, self._launch, args=(session_id, key, tasks))
+            state.timer.daemon = True
+            state.timer.start()
+
+    def cancel(self, session_id: str):
+        """Drop all prefetch work for a session (e.g. when the editor is cleared)."""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state:
+                self._cancel_locked(state)
+                state.code_key = None
+                state.kinds = set()
+
+    def _cancel_locked(self, state: _SessionState):
+        if state.timer:
+            state.timer.cancel()
+            state.timer = None
+        for future in state.futures.values():
+            # Queued work is dropped; running calls finish but are discarded.
+            if future.cancel():
+                telemetry.incr("prefetch_cancelled")
+        state.futures = {}
+
+    def _evict_locked(self):
+        now = time.monotonic()
+        for session_id, state in list(self._sessions.items()):
+            if now - state.seen > self.session_ttl_s:
+                self._cancel_locked(state)
+                del self._sessions[session_id]
+
+    def _launch(self, session_id: str, key: str, tasks: dict):
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if not state or state.code_key != key:
+                return
+            now = time.monotonic()
+            while state.spent and now - state.spent[0] > 3600:
+                state.spent.popleft()
+            for kind in self._ordered(tasks)[: self.max_per_version]:
+                if len(state.spent) >= self.budget_per_hour:
+                    break
+                if kind in state.futures:
+                    continue
+                state.futures[kind] = self._executor.submit(tasks[kind])
+                state.spent.append(now)
+                telemetry.incr("prefetch_submitted")
+
+    # ── Consumption ───────────────────────────────────────────────────────────
+    def take(self, session_id: str, kind: str, key: str):
+        """
+        Future for `kind` on code version `key`, or None. Counted as a cache
+        hit or miss only when `kind` was scheduled for that version (a miss
+        then means the click came before the prefetch was submitted, or the
+        budget skipped it).
+        """
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if not state or state.code_key != key or kind not in state.kinds:
+                return None
+            state.seen = time.monotonic()
+            future = state.futures.get(kind)
+            if future is not None and future.cancelled():
+                future = None
+        telemetry.record_cache("prefetch", future is not None)
+        return future
+
+    def status(self, session_id: str) -> dict:
+        """kind → "ready" / "running" / "queued" for the session's current version."""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if not state:
+                return {}
+            return {
+                kind: "ready" if f.done() else "running" if f.running() else "queued"
+                for kind, f in state.futures.items()
+            }
+
+
+prefetcher = Prefetcher()
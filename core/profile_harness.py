@@ -0,0 +1,153 @@
+"""
+Runs a user script under cProfile (and optionally a line tracer) in a child
+process started by core.profiler. Standard library only: it is copied next to
+the script in a temp dir so user imports never resolve to ExplainMate modules.
+
+    python profile_harness.py <script> <result.json> <budget_s> <line_timing 0|1>
+
+The script's stdin/stdout/stderr are passed through untouched. The profile is
+written to <result.json> even when the script raises or runs past the budget.
+"""
+import cProfile
+import json
+import os
+import pstats
+import signal
+import sys
+import time
+import traceback
+
+TOP_FUNCTIONS = 25
+
+
+class _BudgetExceeded(BaseException):
+    pass
+
+
+class LineTimer:
+    """
+    Per-line hit counts and wall time for one file via sys.settrace. Time is
+    exclusive: the clock always runs for the most recently executed traced
+    line, so calls into other traced functions are charged to their own
+    lines (no double counting under recursion) while time in untraced code
+    (builtins, libraries) stays with the line that called it.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.lines = {}      # lineno → [hits, seconds]
+        self._current = None
+        self._since = 0.0
+
+    def _charge(self):
+        now = time.perf_counter()
+        if self._current is not None:
+            self.lines.setdefault(self._current, [0, 0.0])[1] += now - self._since
+        self._since = now
+
+    def _global(self, frame, event, arg):
+        if frame.f_code.co_filename != self.filename:
+            return None
+        return self._local
+
+    def _local(self, frame, event, arg):
+        if event == "line":
+            self._charge()
+            self._current = frame.f_lineno
+            self.lines.setdefault(self._current, [0, 0.0])[0] += 1
+            self._since = time.perf_counter()
+        elif event == "return":
+            self._charge()
+            back = frame.f_back
+            # Resume the caller's line if it is user code; otherwise stop the clock.
+            self._current = back.f_lineno if back and back.f_code.co_filename == self.filename else None
+            self._since = time.perf_counter()
+        return self._local
+
+    def start(self):
+        sys.settrace(self._global)
+
+    def stop(self):
+        sys.settrace(None)
+
+
+_HARNESS_ENTRIES = {"<built-in method builtins.exec>", "<method 'disable' of '_lsprof.Profiler' objects>"}
+
+
+def _functions(profiler: cProfile.Profile, script: str) -> list:
+    profiler.create_stats()
+    if not profiler.stats:
+        return []   # the script never started (e.g. a syntax error)
+    stats = pstats.Stats(profiler).stats
+    harness = os.path.abspath(__file__)
+    rows = []
+    for (filename, lineno, name), (_cc, ncalls, tottime, cumtime, callers) in stats.items():
+        if os.path.abspath(filename) == harness:
+            continue
+        if name in _HARNESS_ENTRIES and all(os.path.abspath(c[0]) == harness for c in callers):
+            continue
+        rows.append({
+            "function": name,
+            "file":     "<your code>" if filename == script else os.path.basename(filename) or filename,
+            "line":     lineno if filename == script else None,
+            "calls":    ncalls,
+            "self_ms":  round(tottime * 1000, 3),
+            "cum_ms":   round(cumtime * 1000, 3),
+        })
+    rows.sort(key=lambda r: -r["cum_ms"])
+    return rows[:TOP_FUNCTIONS]
+
+
+def main():
+    script, result_path, budget_s, line_timing = sys.argv[1], sys.argv[2], float(sys.argv[3]), sys.argv[4] == "1"
+    with open(script, "r", encoding="utf-8") as f:
+        source = f.read()
+
+    def _on_budget(signum, frame):
+        raise _BudgetExceeded()
+
+    signal.signal(signal.SIGALRM, _on_budget)
+    signal.setitimer(signal.ITIMER_REAL, budget_s)
+
+    sys.argv = [script]
+    sys.path[0] = os.path.dirname(script)
+    profiler = cProfile.Profile()
+    timer = LineTimer(script) if line_timing else None
+    status, error = "ok", None
+    started = time.perf_counter()
+    try:
+        code = compile(source, script, "exec")
+        if timer:
+            timer.start()
+        profiler.enable()
+        exec(code, {"__name__": "__main__", "__file__": script})
+    except _BudgetExceeded:
+        status = "timeout"
+    except SystemExit:
+        pass
+    except BaseException as e:
+        # Drop the harness's own frame so the traceback starts in the script.
+        tb = None if isinstance(e, SyntaxError) else e.__traceback__.tb_next
+        status, error = "error", "".join(traceback.format_exception(type(e), e, tb))
+    finally:
+        profiler.disable()
+        if timer:
+            timer.stop()
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    total_ms = (time.perf_counter() - started) * 1000
+
+    sys.stdout.flush()
+    if error:
+        sys.stderr.write(error)
+    result = {
+        "status":    status,
+        "total_ms":  round(total_ms, 3),
+        "functions": _functions(profiler, script),
+        "lines":     {str(n): {"hits": h, "ms": round(s * 1000, 3)} for n, (h, s) in (timer.lines.items() if timer else ())},
+    }
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+if __name__ == "__main__":
+    main()
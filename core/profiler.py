@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import tempfile
+from core.code_runner import RUN_TIMEOUT_S, _stream_process
+from core.telemetry import span
+
+_HARNESS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profile_harness.py")
+
+
+def profile_python(code: str, stdin: str = "", line_timing: bool = False, on_output=None) -> dict:
+    """
+    Run Python code once under cProfile in the same sandbox as the Run button.
+
+    Returns {"output", "status", "total_ms", "functions", "lines", "error"}:
+      • functions — top functions by cumulative time (calls, self_ms, cum_ms)
+      • lines     — {lineno: {"hits", "ms"}} when `line_timing` is on
+      • status    — "ok", "error" (script raised), "timeout" (profile covers
+                    the part that ran) or "failed" (no profile was produced)
+    Line timing uses sys.settrace and slows the program down several times;
+    compare lines with each other, not with the un-traced run time.
+    """
+    with span("profiler", line_timing=line_timing), tempfile.TemporaryDirectory(prefix="explainmate-prof-") as tmp:
+        script = os.path.join(tmp, "main.py")
+        result_path = os.path.join(tmp, "profile.json")
+        harness = os.path.join(tmp, "_profile_harness.py")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(code)
+        shutil.copy(_HARNESS, harness)
+
+        # The harness stops the script a second early so it can still save the
+        # profile; the hard kill at RUN_TIMEOUT_S stays as the backstop.
+        budget = max(1, RUN_TIMEOUT_S - 1)
+        try:
+            run = _stream_process(
+                ["python", "-u", harness, script, result_path, str(budget), "1" if line_timing else "0"],
+                stdin, cwd=tmp, limit_memory=True, on_output=on_output,
+            )
+        except OSError as e:
+            return _failed(f"❌ Local execution error: {e}")
+
+        try:
+            with open(result_path, "r", encoding="utf-8") as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            reason = f"⏰ Execution timed out ({RUN_TIMEOUT_S}s limit)." if run.timed_out else "❌ Profiler produced no data."
+            return _failed(reason, run.merged)
+
+    profile["output"] = run.stdout or "(no output)"
+    profile["error"] = (run.stderr.strip() or None) if profile["status"] == "error" else None
+    profile["lines"] = {int(n): v for n, v in profile["lines"].items()}
+    return profile
+
+
+def _failed(message: str, output: str = "") -> dict:
+    return {"output": output, "status": "failed", "total_ms": 0.0,
+            "functions": [], "lines": {}, "error": message}
+
+
+def hotspot_lines(profile: dict, code: str, top: int = 5) -> list:
+    """The `top` slowest source lines as (lineno, ms, hits, text)."""
+    source = code.splitlines()
+    ranked = sorted(profile.get("lines", {}).items(), key=lambda kv: -kv[1]["ms"])
+    return [
+        (n, v["ms"], v["hits"], source[n - 1].strip() if 0 < n <= len(source) else "")
+        for n, v in ranked[:top] if v["ms"] > 0
+    ]
+
+
+def format_hotspots(profile: dict, code: str, top: int = 5) -> str:
+    """Compact plain-text summary of a profile for optimization_prompt."""
+    if not profile or profile.get("status") == "failed":
+        return ""
+    lines = [f"Total run time: {profile['total_ms']:.1f} ms"
+             + (" (stopped at the time limit)" if profile["status"] == "timeout" else "")]
+    functions = [f for f in profile["functions"] if f["file"] == "<your code>" and f["function"] != "<module>"]
+    if functions:
+        lines.append("Slowest functions (cumulative time):")
+        for f in functions[:top]:
+            lines.append(f"- {f['function']} (line {f['line']}): {f['cum_ms']:.1f} ms cumulative, "
+                         f"{f['self_ms']:.1f} ms self, {f['calls']} calls")
+    others = [f for f in profile["functions"] if f["file"] != "<your code>"]
+    if others:
+        lines.append("Slowest library/builtin calls:")
+        for f in others[:3]:
+            lines.append(f"- {f['function']}: {f['cum_ms']:.1f} ms, {f['calls']} calls")
+    hot = hotspot_lines(profile, code, top)
+    if hot:
+        lines.append("Slowest lines (self time under line tracing):")
+        for n, ms, hits, text in hot:
+            lines.append(f"- line {n}: {ms:.1f} ms, {hits} hits — {text}")
+    return "\n".join(lines)
@@ -1,3 +1,26 @@
+import re
+
+# Prompt type of each builder below, used by core.model_router to pick a model tier.
+PROMPT_TYPES = (
+    "explanation",
+    "complexity",
+    "followup",
+    "interview",
+    "edge_case",
+    "bug_finder",
+    "optimization",
+    "whiteboard_questions",
+    "difficulty_based_questions",
+    "tradeoff_explanation",
+    "conversation",
+    "chat_summary",
+    "unit_analysis",
+    "stitch_summary",
+    "chunk_explanation",
+    "reduce_summary",
+    "batch",
+)
+
 def explanation_prompt(code, outline, complexity_hint):
     return (
         f"Code Outline:\\n{outline}\\n\\n"
@@ -38,9 +61,14 @@ def bug_finder_prompt(code, outline):
         f"Identify potential bugs, bad practices, or missed edge cases in this code and suggest fixes:\\n{code}"
     )
 
-def optimization_prompt(code, outline):
+def optimization_prompt(code, outline, hotspots=""):
+    profile = (
+        f"Measured profile from a real run of this code:\n{hotspots}\n\n"
+        f"Focus the optimization on these measured hotspots first; do not spend effort on lines that barely register.\n\n"
+    ) if hotspots else ""
     return (
         f"Code Outline:\\n{outline}\\n\\n"
+        f"{profile}"
         f"Suggest an optimized version of this code. Compare time/space trade-offs and explain improvements:\\n{code}"
     )
 
@@ -65,3 +93,167 @@ def tradeoff_explanation_prompt(code, outline):
         f"Explain why this solution might be chosen vs alternative approaches.\n"
         f"Discuss trade-offs, pros and cons in 3-4 lines.\nCode:\n{code}"
     )
+
+def conversation_prompt(code, question, outline, summary="", history=()):
+    turns = "\n".join(
+        f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['content']}" for m in history
+    )
+    return (
+        f"Code Outline:\n{outline}\n\n"
+        f"Given this code:\n{code}\n\n"
+        + (f"Summary of the earlier conversation:\n{summary}\n\n" if summary else "")
+        + (f"Recent conversation:\n{turns}\n\n" if turns else "")
+        + f"Answer this question (max 3 lines): {question}"
+    )
+
+def chat_summary_prompt(previous_summary, messages):
+    transcript = "\n".join(
+        f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['content']}" for m in messages
+    )
+    return (
+        f"Current summary of a conversation about some code:\n{previous_summary or '(empty)'}\n\n"
+        f"New messages:\n{transcript}\n\n"
+        f"Update the summary to include the new messages. Keep the facts, decisions and "
+        f"open questions; drop pleasantries. Max 6 short bullet points."
+    )
+
+UNIT_ASPECTS = {
+    "explanation": "Explanation: what it does, in 1-2 lines",
+    "bugs":        "Bugs: the most likely bug or unhandled edge case in 1 line, or \"none\"",
+    "complexity":  "Complexity: time and space in Big-O with a short reason",
+}
+
+def unit_analysis_prompt(unit_code, name, kind, outline, aspects=("explanation",)):
+    wanted = "\n".join(UNIT_ASPECTS[a] for a in aspects)
+    return (
+        f"File Outline (context only):\n{outline}\n\n"
+        f"Analyze only the {kind} `{name}` below, which is part of a larger file.\n"
+        f"Answer with exactly these labelled lines and nothing else:\n{wanted}\n\n"
+        f"Code:\n{unit_code}"
+    )
+
+def stitch_summary_prompt(outline, complexity_hint, notes):
+    return (
+        f"Code Outline:\n{outline}\n\n"
+        f"Complexity Hint: {complexity_hint}\n\n"
+        f"Notes on each definition in the file, in order:\n{notes}\n\n"
+        f"Using these notes, explain what the whole file does in simple terms (max 5 lines)."
+    )
+
+def chunk_explanation_prompt(chunk_code, label, outline):
+    return (
+        f"File Outline (context only):\n{outline}\n\n"
+        f"Below is one part ({label}) of a much larger file.\n"
+        f"Write one line per function, method or class it defines (\"name: what it does\"), "
+        f"then one line starting with \"Role:\" on what this part contributes to the file.\n\n"
+        f"Code:\n{chunk_code}"
+    )
+
+def reduce_summary_prompt(level, name, notes, outline=""):
+    scope = {
+        "class":   f"the class `{name}`",
+        "section": f"this section of the file ({name})",
+        "module":  "the whole file",
+    }[level]
+    return (
+        (f"Code Outline:\n{outline}\n\n" if outline else "")
+        + f"Notes on the parts of {scope}, in source order:\n{notes}\n\n"
+        + f"Summarize {scope} from these notes: its responsibility, the main pieces and how they "
+        + f"interact. Use {'6-10' if level == 'module' else '2-4'} lines and name the key functions."
+    )
+
+
+# ── Structured output mode ────────────────────────────────────────────────────
+# JSON shape each prompt type must return when structured mode is on.
+# dict → object (all keys required), [x] → array of x, (a, b) → a or b.
+_QA_LIST = [{"question": str, "answer": str}]
+
+OUTPUT_SCHEMAS = {
+    "explanation":  {"summary": str, "steps": [str], "complexity": str},
+    "complexity":   {"time": str, "space": str, "reasoning": [str]},
+    "followup":     {"answer": str},
+    "conversation": {"answer": str},
+    "interview":    {"questions": _QA_LIST},
+    "edge_case":    {"cases": [{"input": str, "expected": str, "reason": str}]},
+    "bug_finder":   {"bugs": [{"issue": str, "severity": str, "line": (int, type(None)), "fix": str}]},
+    "optimization": {
+        "optimized_code": str,
+        "time_before": str, "time_after": str,
+        "space_before": str, "space_after": str,
+        "improvements": [str],
+    },
+    "whiteboard_questions":       {"questions": _QA_LIST},
+    "difficulty_based_questions": {"questions": [{"difficulty": str, "question": str, "answer": str}]},
+    "tradeoff_explanation":       {"pros": [str], "cons": [str], "alternatives": [str]},
+}
+
+def schema_to_text(schema):
+    names = {str: "string", int: "integer", float: "number", bool: "boolean", type(None): "null"}
+    if isinstance(schema, dict):
+        return "{" + ", ".join(f'"{k}": {schema_to_text(v)}' for k, v in schema.items()) + "}"
+    if isinstance(schema, list):
+        return "[" + schema_to_text(schema[0]) + ", ...]"
+    if isinstance(schema, tuple):
+        return "|".join(schema_to_text(s) for s in schema)
+    return names.get(schema, "string")
+
+def structured_prompt(prompt_type, prompt):
+    return (
+        f"{prompt}\n\n"
+        f"Respond ONLY with one JSON object (no markdown fences, no prose before or after) "
+        f"matching exactly this shape:\n{schema_to_text(OUTPUT_SCHEMAS[prompt_type])}\n"
+        f"Keep every string short and factual."
+    )
+
+
+# ── Batched mode ──────────────────────────────────────────────────────────────
+# Several analyses of the same code answered by one call: the code and outline
+# are sent once and every section comes back under its own marker. Each prompt
+# type gets a task line and a word cap that keeps the combined answer bounded.
+BATCH_TASKS = {
+    "interview":                  ("5 concise interview questions (1 line each), each with a short answer (2 lines)", 200),
+    "difficulty_based_questions": ("3 interview questions labelled Easy, Medium and Hard, each with a concise answer (2-3 lines)", 160),
+    "whiteboard_questions":       ("3 mock whiteboard interview questions with design or optimization challenges, each with a short answer (max 3 lines)", 180),
+    "tradeoff_explanation":       ("Why this solution might be chosen over alternative approaches: trade-offs, pros and cons in 3-4 lines", 100),
+    "followup":                   ("Answer this question (max 3 lines): {question}", 80),
+}
+BATCH_MARKER = "=== {} ==="
+_MARKER_RE = re.compile(r"^[ \t*#_`]*=+\s*\[?([A-Za-z0-9_]+)\]?\s*=+[ \t*_`]*$", re.M)
+
+def batch_prompt(code, outline, sections, structured=False):
+    """
+    One prompt for several analyses. `sections` is a list of
+    (section_id, prompt_type, params) where params fill the task template.
+    """
+    parts = []
+    for section_id, prompt_type, params in sections:
+        task, words = BATCH_TASKS[prompt_type]
+        shape = (f" Write it as one JSON object (no markdown fences) matching exactly: "
+                 f"{schema_to_text(OUTPUT_SCHEMAS[prompt_type])}") if structured else ""
+        parts.append(f"{BATCH_MARKER.format(section_id)}\n{task.format(**params)}\nLimit: {words} words.{shape}")
+    return (
+        f"Code Outline:\n{outline}\n\n"
+        f"Code:\n{code}\n\n"
+        f"Answer the {len(sections)} tasks below about this code. Start each answer with its marker line, "
+        f"exactly as given, on a line of its own, and write nothing outside the answers.\n\n"
+        + "\n\n".join(parts)
+    )
+
+def batch_output_tokens(sections):
+    """Output budget for a batch: ~2 tokens per allowed word plus room for the markers."""
+    return sum(2 * BATCH_TASKS[prompt_type][1] + 16 for _, prompt_type, _ in sections)
+
+def split_batch(text, section_ids):
+    """
+    Split a batched response back into {section_id: answer}. Sections that are
+    missing or empty are left out so the caller can ask for them separately.
+    """
+    wanted = set(section_ids)
+    matches = [m for m in _MARKER_RE.finditer(text or "") if m.group(1) in wanted]
+    results = {}
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = text[m.end():end].strip()
+        if body and m.group(1) not in results:
+            results[m.group(1)] = body
+    return results
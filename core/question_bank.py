@@ -0,0 +1,228 @@
+from utils.utils_patterns import PATTERNS
+
+# Answers for the Interview tab's Standard Q&A and By Difficulty buttons when
+# the code matches a textbook pattern (see utils.utils_patterns). Indexed by
+# pattern id; "standard" is (question, answer) pairs, "difficulty" has one or
+# more (question, answer) pairs per level. An entry with "requires" is only
+# used when detect_patterns also reported those traits (the two-pointer
+# answers are about pair sums, not e.g. in-place reversal).
+QUESTION_BANK = {
+    "binary_search": {
+        "standard": [
+            ("What is the time and space complexity?",
+             "O(log n) time: every comparison halves the search range. O(1) extra space iteratively, O(log n) if written recursively."),
+            ("What precondition must the input satisfy?",
+             "It must be sorted (or, more generally, the predicate being searched must be monotonic over the range)."),
+            ("Why compute mid as lo + (hi - lo) // 2 in some languages?",
+             "In fixed-width integer languages lo + hi can overflow; the subtraction form stays in range. Python ints do not overflow."),
+            ("How do you find the first occurrence of a duplicated target?",
+             "On a match, record the index and keep searching left (hi = mid - 1) instead of returning immediately."),
+            ("What is the loop invariant?",
+             "If the target exists, it lies within [lo, hi]; each iteration shrinks that window without excluding it."),
+            ("When would you use `while lo < hi` instead of `lo <= hi`?",
+             "For searches that converge on a boundary (e.g. lower bound), where the answer is lo when the loop ends and hi = mid keeps the candidate."),
+        ],
+        "difficulty": {
+            "easy": [("What does the function return when the target is absent?",
+                      "A sentinel such as -1 once lo passes hi; the search space is empty.")],
+            "medium": [("How would you search a rotated sorted array?",
+                        "At each step one half is sorted; check whether the target lies in that half's range and discard the other. Still O(log n).")],
+            "hard": [("How can binary search find the minimum capacity that ships all packages in D days?",
+                      "Binary search on the answer: capacities are monotonic (feasible above some value), so test feasibility of mid greedily in O(n), for O(n log S) total.")],
+        },
+    },
+    "two_pointers": {
+        "requires": ("pair_sum",),
+        "standard": [
+            ("What is the time and space complexity?",
+             "O(n) time: each pointer moves at most n steps and never backwards. O(1) extra space."),
+            ("Why does the input need to be sorted here?",
+             "Sorting makes the sum monotonic in each pointer, so moving left up increases it and moving right down decreases it, which justifies discarding elements."),
+            ("Why is it safe to discard an element when moving a pointer?",
+             "If the sum is too small with the largest remaining partner, that element cannot be part of any solution, so it is dropped."),
+            ("How would you handle duplicates when listing all pairs?",
+             "After recording a pair, skip equal values on both sides before continuing."),
+            ("How does this compare with a hash-set approach?",
+             "A hash set solves unsorted input in O(n) time but O(n) space; two pointers need sorted input but only O(1) space."),
+            ("How does the pattern extend to 3Sum?",
+             "Fix one element and run two pointers on the rest: O(n²) instead of O(n³)."),
+        ],
+        "difficulty": {
+            "easy": [("When does the loop stop?",
+                      "When the pointers meet or cross; no unchecked pair remains.")],
+            "medium": [("How would you remove duplicates from a sorted array in place?",
+                        "Use a slow write pointer and a fast read pointer; copy a value only when it differs from the last written one.")],
+            "hard": [("How do two pointers solve Trapping Rain Water in O(1) space?",
+                      "Move the side with the smaller max inward; the water above it is bounded by that max, since the other side is known to be at least as high.")],
+        },
+    },
+    "sliding_window": {
+        "standard": [
+            ("What is the time and space complexity?",
+             "O(n) time: each element enters and leaves the window at most once. Space is O(k) for the window's bookkeeping (set, map or counts)."),
+            ("What invariant does the window maintain?",
+             "Between the left and right pointers the window always satisfies the constraint (e.g. no repeated characters); it shrinks from the left when violated."),
+            ("Why is this better than checking every substring?",
+             "Brute force re-scans O(n²) windows; the sliding window reuses work from the previous window."),
+            ("What is the difference between fixed- and variable-size windows?",
+             "Fixed windows add one element and drop one each step; variable windows grow on the right and shrink on the left until valid."),
+            ("What data structures usually track the window?",
+             "A running sum, a hash map of counts/last positions, or a monotonic deque for window min/max."),
+            ("What edge cases should be tested?",
+             "Empty input, window larger than the input, all-equal elements and a valid window at the very end."),
+        ],
+        "difficulty": {
+            "easy": [("How do you compute the maximum sum of any k consecutive elements?",
+                      "Sum the first k, then slide: add a[i], subtract a[i - k], and track the best. O(n).")],
+            "medium": [("How do you find the longest substring with at most k distinct characters?",
+                        "Grow right, count characters in a map; while the map has more than k keys, shrink left and decrement counts.")],
+            "hard": [("How do you find the maximum of every window of size k in O(n)?",
+                      "Keep a deque of indices with decreasing values; pop smaller values from the back, expired indices from the front; the front is the max.")],
+        },
+    },
+    "bfs": {
+        "standard": [
+            ("What is the time and space complexity?",
+             "O(V + E) time: every vertex is dequeued once and every edge examined once. O(V) space for the queue and visited set."),
+            ("Why does BFS find shortest paths in unweighted graphs?",
+             "It visits vertices in order of distance from the source, so the first time a node is reached is along a shortest path."),
+            ("Why mark nodes visited when enqueuing rather than when dequeuing?",
+             "Marking on enqueue prevents the same node from being queued many times, which can blow up the queue."),
+            ("Why use collections.deque instead of a list?",
+             "list.pop(0) is O(n); deque.popleft() is O(1)."),
+            ("How would you track the distance or level of each node?",
+             "Store (node, depth) in the queue or process the queue level by level using its length."),
+            ("When would you choose DFS instead?",
+             "When you need to explore full paths (cycle detection, topological order) or memory on wide graphs matters more than shortest paths."),
+        ],
+        "difficulty": {
+            "easy": [("What happens if the graph is disconnected?",
+                      "Only the start's component is visited; loop over all nodes and start a BFS from each unvisited one.")],
+            "medium": [("How do you find the shortest path in a grid with obstacles?",
+                        "BFS from the start cell over the 4 neighbours, skipping walls and visited cells; the first time the target is dequeued gives the distance.")],
+            "hard": [("How do you compute shortest paths when edges weigh 0 or 1?",
+                      "0-1 BFS: use a deque, push 0-weight neighbours to the front and 1-weight to the back. O(V + E).")],
+        },
+    },
+    "dfs": {
+        "standard": [
+            ("What is the time and space complexity?",
+             "O(V + E) time. O(V) space for the visited set plus the recursion stack, which can be O(V) deep."),
+            ("Why is the visited set necessary?",
+             "Without it, cycles make the traversal loop forever and shared nodes are explored repeatedly."),
+            ("What are the risks of recursive DFS in Python?",
+             "The default recursion limit (~1000) can be exceeded on deep graphs; an explicit stack avoids it."),
+            ("How do you detect a cycle in a directed graph with DFS?",
+             "Track nodes on the current path (gray); reaching a gray node again means a back edge, hence a cycle."),
+            ("How does DFS give a topological order?",
+             "Append each node after all its descendants finish; reversing that post-order is a topological sort of a DAG."),
+            ("How would you count connected components?",
+             "Start a DFS from every unvisited node and count how many times you had to start."),
+        ],
+        "difficulty": {
+            "easy": [("How would you convert this recursive DFS to an iterative one?",
+                      "Push the start on a stack; pop, skip if visited, mark it and push its unvisited neighbours.")],
+            "medium": [("How do you count the islands in a grid?",
+                        "Scan every cell; on unvisited land, increment the count and DFS to mark the whole island visited.")],
+            "hard": [("How do you find strongly connected components?",
+                      "Tarjan's algorithm: one DFS tracking discovery index and low-link; a node whose low-link equals its index roots an SCC. O(V + E).")],
+        },
+    },
+    "memoized_dp": {
+        "standard": [
+            ("What is the time and space complexity?",
+             "Number of distinct states × work per state; e.g. O(n) for Fibonacci-style recurrences, with O(n) space for the table."),
+            ("Which two properties make dynamic programming applicable?",
+             "Overlapping subproblems (the same state recurs) and optimal substructure (the answer is built from answers to smaller states)."),
+            ("What is the difference between top-down and bottom-up?",
+             "Top-down memoizes a recursive function and computes only reachable states; bottom-up fills a table in dependency order and avoids recursion."),
+            ("Why is a mutable default argument like memo={} risky?",
+             "The dict is shared across calls, so results leak between inputs with different parameters; pass it explicitly or use functools.cache."),
+            ("How can the space be reduced?",
+             "If each state depends only on the previous one or two, keep just those values (rolling array) instead of the full table."),
+            ("How do you define the state?",
+             "Choose the smallest set of parameters that fully determines the subproblem's answer, and write the transition between states."),
+        ],
+        "difficulty": {
+            "easy": [("What is the complexity of naive recursion without the memo?",
+                      "Exponential, e.g. O(2^n) for Fibonacci, because the same states are recomputed many times.")],
+            "medium": [("How would you solve coin change (fewest coins) bottom-up?",
+                        "dp[0] = 0; for every amount a, dp[a] = min(dp[a - c] + 1) over coins c ≤ a. O(amount × coins).")],
+            "hard": [("How would you compute the longest increasing subsequence faster than O(n²)?",
+                      "Keep tails[k] = smallest tail of an increasing subsequence of length k+1 and binary-search each element into it: O(n log n).")],
+        },
+    },
+    "backtracking": {
+        "standard": [
+            ("What is the time complexity?",
+             "Proportional to the size of the search tree: O(n · n!) for permutations, O(n · 2^n) for subsets."),
+            ("Why must the choice be undone after the recursive call?",
+             "The same path object is shared by all branches; undoing restores it for the next sibling choice."),
+            ("Why copy the path when recording a solution?",
+             "Appending the list itself stores a reference that later changes; path[:] freezes the current state."),
+            ("What is pruning and why does it matter?",
+             "Stopping a branch as soon as it cannot lead to a valid solution; it cuts the exponential tree dramatically in practice."),
+            ("How do you avoid duplicate results when the input has duplicates?",
+             "Sort first and skip a value equal to the previous one at the same depth unless the previous was used."),
+            ("How does backtracking differ from plain DFS?",
+             "It is DFS over partial solutions, with explicit choose / explore / un-choose steps and constraint checks."),
+        ],
+        "difficulty": {
+            "easy": [("What is the base case?",
+                      "When the partial solution is complete (e.g. its length equals n), record a copy and return.")],
+            "medium": [("How would you generate all subsets of a list?",
+                        "At each index either include or skip the element and recurse; record the path at every node or at the leaves.")],
+            "hard": [("How would you solve N-Queens efficiently?",
+                      "Place one queen per row and track used columns and both diagonals in sets, so each placement check is O(1).")],
+        },
+    },
+}
+
+# How many questions each button shows.
+STANDARD_COUNT = 5
+LEVELS = (("easy", "🟢 Easy"), ("medium", "🟡 Medium"), ("hard", "🔴 Hard"))
+BANK_KINDS = ("interview", "difficulty_based_questions")
+
+
+def _standard(patterns: list) -> str:
+    # The strongest pattern gets most questions; the next one fills the rest.
+    primary = QUESTION_BANK[patterns[0]]["standard"]
+    picks = [(patterns[0], qa) for qa in primary[:STANDARD_COUNT if len(patterns) == 1 else 3]]
+    for pattern in patterns[1:]:
+        picks += [(pattern, qa) for qa in QUESTION_BANK[pattern]["standard"][:STANDARD_COUNT - len(picks)]]
+    lines = []
+    for n, (pattern, (question, answer)) in enumerate(picks, start=1):
+        tag = f" _({PATTERNS[pattern]})_" if len(patterns) > 1 else ""
+        lines.append(f"**{n}. {question}**{tag}\n{answer}")
+    return "\n\n".join(lines)
+
+
+def _by_difficulty(patterns: list) -> str:
+    lines = []
+    for i, (level, label) in enumerate(LEVELS):
+        pattern = patterns[i % len(patterns)]
+        question, answer = QUESTION_BANK[pattern]["difficulty"][level][0]
+        lines.append(f"**{label} — {question}**\n{answer}")
+    return "\n\n".join(lines)
+
+
+def bank_patterns(detected: list) -> list:
+    """
+    Ids of the (at most two) detected patterns the bank can answer for.
+    `detected` is the output of utils.utils_patterns.detect_patterns.
+    """
+    return [d["pattern"] for d in detected
+            if d["pattern"] in QUESTION_BANK
+            and set(QUESTION_BANK[d["pattern"]].get("requires", ())) <= set(d.get("traits", ()))][:2]
+
+
+def bank_answer(kind: str, detected: list):
+    """
+    Local answer for an Interview button, or None when the button is not
+    covered or no pattern was detected. `detected` is the output of
+    utils.utils_patterns.detect_patterns (strongest first).
+    """
+    patterns = bank_patterns(detected)
+    if kind not in BANK_KINDS or not patterns:
+        return None
+    return _standard(patterns) if kind == "interview" else _by_difficulty(patterns)
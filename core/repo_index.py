@@ -0,0 +1,361 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from utils.utils_symbols import index_python_source
+
+load_dotenv()
+
+# Directories (os.pathsep-separated) whose subtrees may be indexed. Project
+# paths come from the browser, so nothing is indexed unless this is set.
+ROOTS = [os.path.realpath(root) for root in os.getenv("REPO_INDEX_ROOTS", "").split(os.pathsep) if root.strip()]
+# Max project indexes kept open by the process; the least recently used is dropped.
+MAX_OPEN = int(os.getenv("REPO_INDEX_MAX_OPEN", "8"))
+# One SQLite file per indexed project directory lives here.
+INDEX_DIR = os.getenv("REPO_INDEX_DIR", os.path.join(".explainmate", "repo_index"))
+# An index older than this is refreshed (stat-only for unchanged files) on next use.
+REFRESH_S = float(os.getenv("REPO_INDEX_REFRESH_S", "30"))
+# Files larger than this are skipped (generated code, vendored bundles).
+MAX_FILE_BYTES = int(os.getenv("REPO_INDEX_MAX_FILE_KB", "1024")) * 1024
+# Prompt budget for the callers / callees context of the editor's functions.
+CONTEXT_CHARS = int(os.getenv("REPO_CONTEXT_CHARS", "2000"))
+
+_SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", "node_modules", ".venv", "venv", "env",
+              ".tox", ".nox", ".mypy_cache", ".pytest_cache", "build", "dist", "site-packages"}
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS files ("
+    " path TEXT PRIMARY KEY, module TEXT NOT NULL, mtime REAL NOT NULL, size INTEGER NOT NULL,"
+    " sha TEXT NOT NULL, lines INTEGER NOT NULL, error TEXT)",
+    "CREATE TABLE IF NOT EXISTS symbols ("
+    " fq TEXT NOT NULL, name TEXT NOT NULL, kind TEXT NOT NULL, path TEXT NOT NULL,"
+    " lineno INTEGER NOT NULL, end_lineno INTEGER NOT NULL, signature TEXT NOT NULL, doc TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS imports ("
+    " path TEXT NOT NULL, module TEXT NOT NULL, alias TEXT NOT NULL, target TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS calls ("
+    " path TEXT NOT NULL, caller TEXT NOT NULL, callee TEXT, callee_name TEXT NOT NULL, lineno INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS symbols_fq ON symbols (fq)",
+    "CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name)",
+    "CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path)",
+    "CREATE INDEX IF NOT EXISTS imports_target ON imports (target)",
+    "CREATE INDEX IF NOT EXISTS imports_alias ON imports (module, alias)",
+    "CREATE INDEX IF NOT EXISTS imports_path ON imports (path)",
+    "CREATE INDEX IF NOT EXISTS calls_callee ON calls (callee)",
+    "CREATE INDEX IF NOT EXISTS calls_caller ON calls (caller)",
+    "CREATE INDEX IF NOT EXISTS calls_name ON calls (callee_name)",
+    "CREATE INDEX IF NOT EXISTS calls_path ON calls (path)",
+)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    # WAL lets the page keep querying while a refresh job writes.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _within(path: str, root: str) -> bool:
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:   # different drives
+        return False
+
+
+def allowed_root(path: str) -> str:
+    """
+    The real path of project directory `path` if it lies under one of
+    REPO_INDEX_ROOTS; raises ValueError otherwise. Relative paths are taken
+    from the first root.
+    """
+    if not ROOTS:
+        raise ValueError("Project indexing is disabled; set REPO_INDEX_ROOTS to the directories it may read.")
+    real = os.path.realpath(os.path.join(ROOTS[0], os.path.expanduser(path)))
+    if not any(_within(real, root) for root in ROOTS):
+        raise ValueError(f"{path} is outside the allowed project roots ({os.pathsep.join(ROOTS)}).")
+    if not os.path.isdir(real):
+        raise ValueError(f"Not a directory: {path}")
+    return real
+
+
+def _short(fq: str) -> str:
+    return ".".join(fq.split(".")[-2:])
+
+
+class RepoIndex:
+    """
+    On-disk symbol and call-graph index of the Python files under `root`.
+
+    `update()` walks the tree and re-parses only files whose mtime/size
+    changed and whose content hash differs; unchanged files cost one stat.
+    Calls are stored resolved through each file's own imports, so editing
+    one file never requires re-parsing the files that call into it; aliases
+    (re-exports such as `from .mod import f` in a package) are followed at
+    query time.
+    """
+
+    def __init__(self, root: str, db_path: str | None = None):
+        self.root = os.path.abspath(root)
+        # When root is itself inside a package, its modules are named from that package.
+        package, parent = [], self.root
+        while os.path.isfile(os.path.join(parent, "__init__.py")):
+            parent, name = os.path.split(parent)
+            package.insert(0, name)
+        self._prefix = "".join(f"{name}/" for name in package)
+        if db_path is None:
+            digest = hashlib.sha256(self.root.encode("utf-8")).hexdigest()[:16]
+            db_path = os.path.join(INDEX_DIR, f"{digest}.sqlite3")
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self._update_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._conn = _connect(db_path)
+        with self._lock, self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    # ── Indexing ──────────────────────────────────────────────────────────────
+    def _walk(self):
+        # os.walk does not enter symlinked directories; symlinked files are
+        # skipped when they point outside the root.
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in _SKIP_DIRS and not d.startswith(".")]
+            for filename in filenames:
+                if filename.endswith(".py"):
+                    full = os.path.join(dirpath, filename)
+                    if os.path.islink(full) and not _within(os.path.realpath(full), self.root):
+                        continue
+                    yield full, os.path.relpath(full, self.root).replace(os.sep, "/")
+
+    def update(self) -> dict:
+        """
+        Bring the index up to date with the files on disk. Returns counts of
+        scanned, parsed, unchanged, removed and failed files plus seconds taken.
+        """
+        with self._update_lock:
+            start = time.perf_counter()
+            conn = self._conn if self.db_path == ":memory:" else _connect(self.db_path)
+            known = {path: (mtime, size, sha) for path, mtime, size, sha in
+                     self._read("SELECT path, mtime, size, sha FROM files")}
+            stats = {"scanned": 0, "parsed": 0, "unchanged": 0, "removed": 0, "errors": 0}
+            seen = set()
+            lock = self._lock if conn is self._conn else threading.Lock()
+            with lock, conn:
+                for full, rel in self._walk():
+                    try:
+                        st = os.stat(full)
+                    except OSError:
+                        continue
+                    if st.st_size > MAX_FILE_BYTES:
+                        continue
+                    seen.add(rel)
+                    stats["scanned"] += 1
+                    previous = known.get(rel)
+                    if previous and previous[0] == st.st_mtime and previous[1] == st.st_size:
+                        stats["unchanged"] += 1
+                        continue
+                    try:
+                        with open(full, "rb") as f:
+                            data = f.read()
+                    except OSError:
+                        continue
+                    sha = hashlib.sha256(data).hexdigest()
+                    if previous and previous[2] == sha:
+                        # Touched but not changed: remember the new mtime only.
+                        conn.execute("UPDATE files SET mtime = ?, size = ? WHERE path = ?",
+                                     (st.st_mtime, st.st_size, rel))
+                        stats["unchanged"] += 1
+                        continue
+                    stats["errors"] += not self._store_file(conn, rel, data, st, sha)
+                    stats["parsed"] += 1
+                for rel in set(known) - seen:
+                    self._delete_file(conn, rel)
+                    stats["removed"] += 1
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('updated', ?)", (str(time.time()),))
+            if conn is not self._conn:
+                conn.close()
+            stats["seconds"] = round(time.perf_counter() - start, 3)
+            return stats
+
+    @staticmethod
+    def _delete_file(conn, rel):
+        for table in ("files", "symbols", "imports", "calls"):
+            conn.execute(f"DELETE FROM {table} WHERE path = ?", (rel,))
+
+    def _store_file(self, conn, rel, data, st, sha) -> bool:
+        self._delete_file(conn, rel)
+        text = data.decode("utf-8", errors="replace")
+        try:
+            parsed = index_python_source(text, self._prefix + rel)
+            error = None
+        except (SyntaxError, ValueError, RecursionError) as e:
+            parsed, error = None, f"{type(e).__name__}: {e}"
+        module = parsed["module"] if parsed else (self._prefix + rel)[:-3].replace("/", ".")
+        conn.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (rel, module, st.st_mtime, st.st_size, sha, text.count("\n") + 1, error))
+        if parsed is None:
+            return False
+        conn.executemany(
+            "INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(s["fq"], s["name"], s["kind"], rel, s["lineno"], s["end_lineno"], s["signature"], s["doc"])
+             for s in parsed["symbols"]],
+        )
+        conn.executemany("INSERT INTO imports VALUES (?, ?, ?, ?)",
+                         [(rel, module, alias, target) for alias, target in parsed["imports"].items()])
+        conn.executemany(
+            "INSERT INTO calls VALUES (?, ?, ?, ?, ?)",
+            [(rel, c["caller"], c["callee"], c["callee_name"], c["lineno"]) for c in parsed["calls"]],
+        )
+        return True
+
+    def is_stale(self, max_age_s: float = REFRESH_S) -> bool:
+        rows = self._read("SELECT value FROM meta WHERE key = 'updated'")
+        return not rows or time.time() - float(rows[0][0]) > max_age_s
+
+    # ── Queries ───────────────────────────────────────────────────────────────
+    def _read(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def summary(self) -> dict:
+        files, lines = self._read("SELECT COUNT(*), COALESCE(SUM(lines), 0) FROM files")[0]
+        return {
+            "files":   files,
+            "lines":   lines,
+            "symbols": self._read("SELECT COUNT(*) FROM symbols")[0][0],
+            "calls":   self._read("SELECT COUNT(*) FROM calls")[0][0],
+            "errors":  self._read("SELECT COUNT(*) FROM files WHERE error IS NOT NULL")[0][0],
+        }
+
+    def find(self, name: str, limit: int = 10) -> list:
+        """Definitions whose short name or fully qualified name is `name`."""
+        rows = self._read(
+            "SELECT fq, kind, path, lineno, end_lineno, signature, doc FROM symbols"
+            " WHERE name = ? OR fq = ? ORDER BY length(fq) LIMIT ?", (name, name, limit))
+        keys = ("fq", "kind", "path", "lineno", "end_lineno", "signature", "doc")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def canonical(self, fq: str, hops: int = 5) -> str:
+        """Follow re-exports (`from .mod import f` in a package) to the defining name."""
+        for _ in range(hops):
+            if self._read("SELECT 1 FROM symbols WHERE fq = ? LIMIT 1", (fq,)):
+                return fq
+            module, _, alias = fq.rpartition(".")
+            row = self._read("SELECT target FROM imports WHERE module = ? AND alias = ? LIMIT 1", (module, alias))
+            if not row or row[0][0] == fq:
+                return fq
+            fq = row[0][0]
+        return fq
+
+    def _aliases(self, fq: str) -> set:
+        names, frontier = {fq}, [fq]
+        while frontier and len(names) < 50:
+            target = frontier.pop()
+            for module, alias in self._read("SELECT module, alias FROM imports WHERE target = ?", (target,)):
+                name = f"{module}.{alias}"
+                if name not in names:
+                    names.add(name)
+                    frontier.append(name)
+        return names
+
+    def callers(self, fq: str, limit: int = 20) -> list:
+        """
+        Call sites of `fq` (or any alias of it). Method calls through an
+        object (`obj.name()`) cannot be resolved statically; for methods they
+        are added as name matches with resolved=False.
+        """
+        names = sorted(self._aliases(fq))
+        marks = ",".join("?" * len(names))
+        rows = [(*row, True) for row in self._read(
+            f"SELECT DISTINCT caller, path, lineno FROM calls WHERE callee IN ({marks}) ORDER BY path, lineno LIMIT ?",
+            (*names, limit))]
+        kind = self._read("SELECT kind FROM symbols WHERE fq = ? LIMIT 1", (fq,))
+        if kind and kind[0][0] == "method" and len(rows) < limit:
+            rows += [(*row, False) for row in self._read(
+                "SELECT DISTINCT caller, path, lineno FROM calls WHERE callee IS NULL AND callee_name = ?"
+                " ORDER BY path, lineno LIMIT ?", (fq.rpartition(".")[2], limit - len(rows)))]
+        return [{"caller": c, "path": p, "lineno": n, "resolved": r} for c, p, n, r in rows]
+
+    def callees(self, fq: str, limit: int = 20) -> list:
+        """Project functions called by `fq`, with their signatures (unresolved and external calls left out)."""
+        result, seen = [], set()
+        for (callee,) in self._read(
+                "SELECT DISTINCT callee FROM calls WHERE caller = ? AND callee IS NOT NULL ORDER BY lineno", (fq,)):
+            target = self.canonical(callee)
+            if target in seen:
+                continue
+            seen.add(target)
+            row = self._read("SELECT path, lineno, signature, doc FROM symbols WHERE fq = ? LIMIT 1", (target,))
+            if row:
+                path, lineno, signature, doc = row[0]
+                result.append({"callee": target, "path": path, "lineno": lineno, "signature": signature, "doc": doc})
+                if len(result) >= limit:
+                    break
+        return result
+
+    def call_edges(self, fq: str, limit: int = 20) -> list:
+        """
+        (caller, callee) pairs around `fq` for the call-graph view. `fq` itself
+        is named as in the editor's graph (bare name), its neighbours by short
+        `module.name`.
+        """
+        own = fq.rpartition(".")[2]
+        edges = [(_short(c["caller"]), own) for c in self.callers(fq, limit) if c["resolved"] and c["caller"] != fq]
+        edges += [(own, _short(c["callee"])) for c in self.callees(fq, limit) if c["callee"] != fq]
+        return list(dict.fromkeys(edges))
+
+    def context(self, names, max_chars: int = CONTEXT_CHARS) -> tuple:
+        """
+        Prompt text describing where the functions `names` live in the
+        project and who calls / is called by them, plus the matched
+        definitions. Returns ("", []) when none of them is in the index.
+        """
+        blocks, matched = [], []
+        for name in names:
+            found = self.find(name, limit=1)
+            if not found:
+                continue
+            symbol = found[0]
+            matched.append(symbol)
+            lines = [f"`{symbol['fq']}` — {symbol['signature']} ({symbol['path']}:{symbol['lineno']})"]
+            callers = self.callers(symbol["fq"], limit=8)
+            if callers:
+                lines.append("  Called by: " + "; ".join(
+                    f"{c['caller']} ({c['path']}:{c['lineno']}{'' if c['resolved'] else ', by name'})" for c in callers))
+            for callee in self.callees(symbol["fq"], limit=8):
+                doc = f" — {callee['doc']}" if callee["doc"] else ""
+                lines.append(f"  Calls: {callee['callee']}: {callee['signature']}{doc}")
+            blocks.append("\n".join(lines))
+        if not blocks:
+            return "", []
+        text = "Project context (callers and callees from the surrounding repository):\n" + "\n".join(blocks)
+        if len(text) > max_chars:
+            text = text[:max_chars].rsplit("\n", 1)[0] + "\n  …"
+        return text, matched
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_repo_index(path: str) -> RepoIndex:
+    """
+    Process-wide RepoIndex for a project directory, opened on first use.
+    Raises ValueError unless the directory is under REPO_INDEX_ROOTS (see
+    allowed_root). At most MAX_OPEN are kept; a dropped index closes its
+    connection once no session still uses it, and its file stays on disk.
+    """
+    root = allowed_root(path)
+    with _indexes_lock:
+        if root in _indexes:
+            _indexes.move_to_end(root)
+        else:
+            _indexes[root] = RepoIndex(root)
+            while len(_indexes) > MAX_OPEN:
+                _indexes.popitem(last=False)
+        return _indexes[root]
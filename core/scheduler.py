@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from core import telemetry
+
+load_dotenv()
+
+# ── Limits ────────────────────────────────────────────────────────────────────
+# LLM calls: token buckets per browser session and per client IP (rate per
+# minute, burst = bucket size). A call waits for a token at most LLM_MAX_WAIT_S.
+LLM_PER_MIN_SESSION = float(os.getenv("LLM_PER_MIN_SESSION", "20"))
+LLM_BURST_SESSION = float(os.getenv("LLM_BURST_SESSION", "8"))
+LLM_PER_MIN_IP = float(os.getenv("LLM_PER_MIN_IP", "60"))
+LLM_BURST_IP = float(os.getenv("LLM_BURST_IP", "20"))
+LLM_MAX_WAIT_S = float(os.getenv("LLM_MAX_WAIT_S", "20"))
+# Code execution: CPU-seconds per session. Runs are charged what they used;
+# a session in debt waits until the budget refills.
+CPU_BUDGET_S = float(os.getenv("CPU_BUDGET_S", "30"))
+CPU_REFILL_PER_MIN = float(os.getenv("CPU_REFILL_PER_MIN", "6"))
+# Buckets untouched this long, and full again, are forgotten (no state is lost).
+IDLE_TTL_S = float(os.getenv("SCHED_IDLE_TTL_S", "600"))
+# Fair-share weights per client IP, e.g. "10.0.0.5=2,10.0.0.9=0.5" (default 1).
+WEIGHTS = {
+    ip.strip(): float(weight)
+    for ip, _, weight in (pair.partition("=") for pair in os.getenv("SCHED_WEIGHTS", "").split(",") if "=" in pair)
+}
+
+
+class QuotaExceeded(RuntimeError):
+    """An LLM call could not get a token within LLM_MAX_WAIT_S."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"⏰ LLM rate limit reached for your session — try again in {retry_after:.0f}s.")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """`capacity` tokens refilled at `rate_per_s`; charges may push it into debt."""
+
+    def __init__(self, rate_per_s: float, capacity: float):
+        self.rate_per_s = rate_per_s
+        self.capacity = capacity
+        self.tokens = capacity
+        self._last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate_per_s)
+        self._last = now
+
+    def wait_time(self, amount: float = 0.0) -> float:
+        """Seconds until the bucket holds at least `amount` tokens."""
+        self._refill()
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate_per_s if self.rate_per_s > 0 else float("inf")
+
+    def charge(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+
+class FairScheduler:
+    """
+    Per-user quotas shared by every session of the process.
+
+    A user is a (session id, client IP) pair bound to the current thread with
+    `bind` (the script thread) or `bound` (job workers); `carry` wraps a
+    function so worker pools it is handed to act for the same user. Calls
+    from unbound threads (e.g. speculative prefetch) are not limited here.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._session_llm = {}
+        self._ip_llm = {}
+        self._cpu = {}
+        self._cpu_cost = {}      # session → recent CPU-seconds per run (EWMA)
+        self._next_evict = time.monotonic() + IDLE_TTL_S
+
+    # ── Identity ──────────────────────────────────────────────────────────────
+    def bind(self, session_id: str, ip: str | None = None):
+        self._local.user = (session_id, ip or "local")
+
+    def current(self):
+        return getattr(self._local, "user", None)
+
+    @contextmanager
+    def bound(self, session_id: str, ip: str | None = None):
+        previous = self.current()
+        self.bind(session_id, ip)
+        try:
+            yield
+        finally:
+            self._local.user = previous
+
+    def carry(self, fn):
+        """`fn` wrapped to run as the current user (and admission) from any thread."""
+        user = self.current()
+        if user is None:
+            return fn
+        admitted = self._is_admitted()
+
+        def call(*args, **kwargs):
+            previous = self._is_admitted()
+            self._local.admitted = admitted
+            try:
+                with self.bound(*user):
+                    return fn(*args, **kwargs)
+            finally:
+                self._local.admitted = previous
+        return call
+
+    def _is_admitted(self):
+        return getattr(self._local, "admitted", False)
+
+    @contextmanager
+    def admitted(self):
+        """
+        Admit one request that fans out into many LLM calls (map-reduce chunks,
+        per-definition units): a single token is taken on entry, and calls made
+        inside it — or through functions `carry` wraps inside it — are not
+        charged again. Raises QuotaExceeded like acquire_llm.
+        """
+        if self.current() is None or self._is_admitted():
+            yield
+            return
+        self.acquire_llm()
+        self._local.admitted = True
+        try:
+            yield
+        finally:
+            self._local.admitted = False
+
+    def weight(self, ip: str | None) -> float:
+        return max(0.01, WEIGHTS.get(ip or "local", 1.0))
+
+    # ── Housekeeping ──────────────────────────────────────────────────────────
+    def _evict_locked(self):
+        # At most once per IDLE_TTL_S: drop idle buckets that have refilled, so
+        # closed sessions and one-off IPs do not accumulate.
+        now = time.monotonic()
+        if now < self._next_evict:
+            return
+        self._next_evict = now + IDLE_TTL_S
+        for buckets in (self._session_llm, self._ip_llm, self._cpu):
+            for key, bucket in list(buckets.items()):
+                if now - bucket._last > IDLE_TTL_S and bucket.wait_time(bucket.capacity) == 0:
+                    del buckets[key]
+        for session_id in [s for s in self._cpu_cost if s not in self._cpu]:
+            del self._cpu_cost[session_id]
+
+    # ── LLM token buckets ─────────────────────────────────────────────────────
+    def _llm_buckets(self, session_id, ip):
+        self._evict_locked()
+        session = self._session_llm.setdefault(
+            session_id, TokenBucket(LLM_PER_MIN_SESSION / 60, LLM_BURST_SESSION))
+        shared = self._ip_llm.setdefault(
+            ip, TokenBucket(LLM_PER_MIN_IP * self.weight(ip) / 60, LLM_BURST_IP * self.weight(ip)))
+        return session, shared
+
+    def llm_wait(self, session_id: str, ip: str | None = None) -> float:
+        """Seconds until this user may make an LLM call."""
+        with self._lock:
+            return max(b.wait_time(1) for b in self._llm_buckets(session_id, ip or "local"))
+
+    def acquire_llm(self):
+        """
+        Take one LLM call token for the current user, waiting for a refill when
+        the bucket is empty. Raises QuotaExceeded when the wait would exceed
+        LLM_MAX_WAIT_S. Free inside an admitted request (see `admitted`).
+        """
+        user = self.current()
+        if user is None or self._is_admitted():
+            return
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                buckets = self._llm_buckets(*user)
+                wait = max(b.wait_time(1) for b in buckets)
+                if wait == 0:
+                    for b in buckets:
+                        b.charge(1)
+                    break
+            waited = time.monotonic() - start
+            if waited + wait > LLM_MAX_WAIT_S:
+                telemetry.incr("llm_quota_rejections")
+                raise QuotaExceeded(wait)
+            time.sleep(min(wait, 0.5))
+        telemetry.record_duration("llm_quota_wait", time.monotonic() - start)
+
+    # ── CPU budget ────────────────────────────────────────────────────────────
+    def _cpu_bucket(self, session_id):
+        self._evict_locked()
+        return self._cpu.setdefault(session_id, TokenBucket(CPU_REFILL_PER_MIN / 60, CPU_BUDGET_S))
+
+    def charge_cpu(self, seconds: float | None):
+        """Charge CPU-seconds used by a child process to the current user."""
+        user = self.current()
+        if user is None or seconds is None:
+            return
+        with self._lock:
+            self._cpu_bucket(user[0]).charge(seconds)
+            previous = self._cpu_cost.get(user[0], seconds)
+            self._cpu_cost[user[0]] = 0.7 * previous + 0.3 * seconds
+        telemetry.incr("cpu_ms_charged", int(seconds * 1000))
+
+    def cpu_wait(self, session_id: str) -> float:
+        """Seconds until this session's CPU budget is out of debt."""
+        with self._lock:
+            return self._cpu_bucket(session_id).wait_time(0)
+
+    def cpu_cost(self, session_id: str) -> float:
+        """Expected CPU-seconds of this session's next run, for fair queueing."""
+        with self._lock:
+            return max(0.05, self._cpu_cost.get(session_id, 0.5))
+
+    # ── Introspection ─────────────────────────────────────────────────────────
+    def user_stats(self, session_id: str, ip: str | None = None) -> dict:
+        with self._lock:
+            session, shared = self._llm_buckets(session_id, ip or "local")
+            cpu = self._cpu_bucket(session_id)
+            for bucket in (session, shared, cpu):
+                bucket._refill()
+            return {
+                "llm_tokens":     round(min(session.tokens, shared.tokens), 1),
+                "cpu_budget_s":   round(cpu.tokens, 1),
+                "weight":         self.weight(ip),
+            }
+
+
+scheduler = FairScheduler()
@@ -0,0 +1,135 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from core import telemetry
+from utils.utils_fingerprint import canonical_tokens, fingerprint, shingles
+
+load_dotenv()
+
+# Max snippets kept; the least recently used is evicted first.
+INDEX_MAX = int(os.getenv("SNIPPET_INDEX_MAX", "500"))
+# Estimated Jaccard similarity of canonical shingles needed to offer a stored answer.
+MATCH_THRESHOLD = float(os.getenv("SNIPPET_MATCH_THRESHOLD", "0.8"))
+# Snippets shorter than this many canonical tokens are too generic to match.
+MIN_TOKENS = int(os.getenv("SNIPPET_MIN_TOKENS", "20"))
+
+NUM_PERM = 64
+BANDS = 16                      # 16 bands × 4 rows: pairs at J ≥ 0.8 collide with p > 0.999
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def minhash(hashes: set) -> tuple:
+    """NUM_PERM-value MinHash signature of a set of 64-bit shingle hashes."""
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def _similarity(sig_a: tuple, sig_b: tuple) -> float:
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+
+class _Entry:
+    __slots__ = ("lang", "fingerprint", "signature", "results", "created")
+
+    def __init__(self, lang, fp, signature):
+        self.lang = lang
+        self.fingerprint = fp
+        self.signature = signature
+        self.results = {}          # kind → answer text
+        self.created = time.time()
+
+
+class SnippetIndex:
+    """
+    Previously analysed snippets, looked up by structure rather than text.
+    Each snippet is reduced to canonical tokens (see utils.utils_fingerprint),
+    shingled and MinHashed; LSH buckets find candidates in constant time, and
+    the best one above MATCH_THRESHOLD is returned with its stored answers.
+    Bounded to `max_entries` snippets with LRU eviction; shared by every session.
+    """
+
+    def __init__(self, max_entries: int = INDEX_MAX, threshold: float = MATCH_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._entries = OrderedDict()   # (lang, fingerprint) → _Entry
+        self._buckets = {}              # (lang, band, rows) → set of entry keys
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bands(signature):
+        return [(b, signature[b * ROWS:(b + 1) * ROWS]) for b in range(BANDS)]
+
+    def _sketch(self, code: str, lang: str):
+        tokens = canonical_tokens(code, lang)
+        if len(tokens) < MIN_TOKENS:
+            return None
+        return fingerprint(tokens), minhash(shingles(tokens))
+
+    def lookup(self, code: str, lang: str, kind: str):
+        """
+        Best stored `kind` answer for a near-duplicate of `code`, as
+        {"text", "similarity", "exact"}, or None.
+        """
+        sketch = self._sketch(code, lang)
+        match = None
+        if sketch:
+            fp, signature = sketch
+            with self._lock:
+                exact = self._entries.get((lang, fp))
+                if exact and kind in exact.results:
+                    best, score = exact, 1.0
+                else:
+                    candidates = set()
+                    for band in self._bands(signature):
+                        candidates |= self._buckets.get((lang, *band), set())
+                    best, score = None, 0.0
+                    for key in candidates:
+                        entry = self._entries[key]
+                        if kind not in entry.results:
+                            continue
+                        similarity = _similarity(signature, entry.signature)
+                        if similarity > score:
+                            best, score = entry, similarity
+                if best is not None and score >= self.threshold:
+                    self._entries.move_to_end((lang, best.fingerprint))
+                    match = {"text": best.results[kind], "similarity": score, "exact": best.fingerprint == fp}
+        telemetry.record_cache("snippet_index", match is not None)
+        return match
+
+    def add(self, code: str, lang: str, kind: str, text: str):
+        """Store an answer; snippets with the same canonical form share one entry."""
+        sketch = self._sketch(code, lang)
+        if not sketch:
+            return
+        fp, signature = sketch
+        key = (lang, fp)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(lang, fp, signature)
+                for band in self._bands(signature):
+                    self._buckets.setdefault((lang, *band), set()).add(key)
+            entry.results[kind] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._evict_locked()
+
+    def _evict_locked(self):
+        key, entry = self._entries.popitem(last=False)
+        for band in self._bands(entry.signature):
+            bucket = self._buckets.get((entry.lang, *band))
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[(entry.lang, *band)]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+snippet_index = SnippetIndex()
@@ -0,0 +1,176 @@
+import json
+import re
+from core.prompts import OUTPUT_SCHEMAS
+
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+
+
+class SchemaError(ValueError):
+    pass
+
+
+# ── Validation ────────────────────────────────────────────────────────────────
+def _validate(value, schema, path="$", partial=False):
+    """
+    Check `value` against a schema from core.prompts.OUTPUT_SCHEMAS and return
+    a cleaned copy. Scalars are coerced leniently (numbers → strings, numeric
+    strings → ints). With `partial=True`, missing keys are allowed.
+    """
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            raise SchemaError(f"{path}: expected object")
+        out = {}
+        for key, sub in schema.items():
+            if key in value:
+                out[key] = _validate(value[key], sub, f"{path}.{key}", partial)
+            elif not partial:
+                raise SchemaError(f"{path}: missing '{key}'")
+        return out
+    if isinstance(schema, list):
+        if not isinstance(value, list):
+            if partial or not isinstance(value, (str, dict)):
+                raise SchemaError(f"{path}: expected array")
+            value = [value]   # models often return a lone item instead of [item]
+        return [_validate(v, schema[0], f"{path}[{i}]", partial) for i, v in enumerate(value)]
+    if isinstance(schema, tuple):
+        for option in schema:
+            try:
+                return _validate(value, option, path, partial)
+            except SchemaError:
+                continue
+        raise SchemaError(f"{path}: no matching type")
+    if schema is type(None):
+        if value is None:
+            return None
+        raise SchemaError(f"{path}: expected null")
+    if schema is int:
+        if isinstance(value, bool):
+            raise SchemaError(f"{path}: expected integer")
+        if isinstance(value, int):
+            return value
+        if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+            return int(value)
+        raise SchemaError(f"{path}: expected integer")
+    if schema is str:
+        if isinstance(value, str):
+            return value
+        if isinstance(value, (int, float, bool)):
+            return str(value)
+        if isinstance(value, (list, dict)):
+            return json.dumps(value)
+        raise SchemaError(f"{path}: expected string")
+    return value
+
+
+def _extract_json(text: str):
+    """Decode the first JSON object in a response, tolerating fences and prose around it."""
+    text = _FENCE_RE.sub("", text.strip())
+    start = text.find("{")
+    if start < 0:
+        raise SchemaError("no JSON object in response")
+    try:
+        obj, _ = json.JSONDecoder().raw_decode(text[start:])
+    except json.JSONDecodeError as e:
+        raise SchemaError(f"invalid JSON: {e.msg}") from None
+    return obj
+
+
+def parse_structured(prompt_type: str, text: str):
+    """
+    Validate a structured-mode response. Returns (data, None) on success or
+    (None, error_message) so callers can fall back to showing the raw text.
+    """
+    try:
+        return _validate(_extract_json(text), OUTPUT_SCHEMAS[prompt_type]), None
+    except SchemaError as e:
+        return None, str(e)
+
+
+# ── Partial parsing while streaming ───────────────────────────────────────────
+def _close_partial(text: str) -> str:
+    """Append the quotes/brackets needed to make a truncated JSON prefix parseable."""
+    stack, in_string, escaped = [], False, False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += "\\" if escaped else ""
+        text += '"'
+    stripped = text.rstrip()
+    if stripped.endswith(","):
+        text = stripped[:-1]
+    elif stripped.endswith(":"):
+        text = stripped + " null"
+    return text + "".join(reversed(stack))
+
+
+def parse_partial(prompt_type: str, text: str):
+    """
+    Best-effort view of a JSON response that is still streaming in: whatever
+    fields are complete (or partially typed) so far, or None.
+    """
+    text = _FENCE_RE.sub("", text.lstrip())
+    start = text.find("{")
+    if start < 0:
+        return None
+    prefix = text[start:]
+    # A key cut off mid-name cannot be closed into valid JSON; back off to the
+    # previous comma/bracket a few times before giving up on this chunk.
+    for _ in range(4):
+        try:
+            data = json.loads(_close_partial(prefix))
+            return _validate(data, OUTPUT_SCHEMAS[prompt_type], partial=True)
+        except (json.JSONDecodeError, SchemaError):
+            cut = max(prefix.rfind(","), prefix.rfind("{", 1), prefix.rfind("["))
+            if cut <= 0:
+                return None
+            prefix = prefix[:cut]
+    return None
+
+
+# ── Rendering ─────────────────────────────────────────────────────────────────
+def _label(key: str) -> str:
+    return key.replace("_", " ").capitalize()
+
+
+def to_markdown(prompt_type: str, data: dict) -> str:
+    """Readable markdown for a (possibly partial) structured response."""
+    if not data:
+        return ""
+    lines = []
+    for key, value in data.items():
+        if key == "optimized_code":
+            lines.append(f"**Optimized code:**\n```\n{value}\n```")
+        elif isinstance(value, list) and value and isinstance(value[0], dict):
+            lines.append(f"**{_label(key)}:**")
+            for i, item in enumerate(value, 1):
+                if "question" in item:
+                    tag = f" _({item['difficulty']})_" if item.get("difficulty") else ""
+                    lines.append(f"{i}. **Q:**{tag} {item.get('question', '')}")
+                    if item.get("answer"):
+                        lines.append(f"   **A:** {item['answer']}")
+                elif "issue" in item:
+                    where = f" (line {item['line']})" if item.get("line") else ""
+                    sev = f"`{item['severity']}` " if item.get("severity") else ""
+                    lines.append(f"{i}. {sev}{item.get('issue', '')}{where}")
+                    if item.get("fix"):
+                        lines.append(f"   **Fix:** {item['fix']}")
+                else:
+                    lines.append(f"{i}. " + " · ".join(f"**{_label(k)}:** {v}" for k, v in item.items()))
+        elif isinstance(value, list):
+            lines.append(f"**{_label(key)}:**")
+            lines += [f"- {v}" for v in value]
+        else:
+            lines.append(f"**{_label(key)}:** {value}")
+    return "\n".join(lines)
@@ -0,0 +1,184 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Histogram bucket upper bounds in seconds (Prometheus client defaults + 30/60s
+# for slow LLM calls).
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Recent span durations kept per stage for the p50/p95 shown in the UI.
+SAMPLE_WINDOW = 500
+
+# Append every finished span as one JSON line when set (e.g. spans.jsonl).
+JSONL_PATH = os.getenv("TELEMETRY_JSONL", "")
+
+_lock = threading.Lock()
+_histograms = {}    # stage → {"buckets": [..], "sum": float, "count": int}
+_samples = {}       # stage → deque of durations (s)
+_errors = {}        # stage → int
+_in_flight = {}     # stage → int
+_cache = {}         # cache name → {"hits": int, "misses": int}
+_counters = {}      # metric name → int
+
+
+def percentile(values, pct):
+    """Nearest-rank `pct` percentile of `values` (0.0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def _write_jsonl(record: dict):
+    if not JSONL_PATH:
+        return
+    try:
+        with open(JSONL_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+    except OSError:
+        pass  # telemetry must never break the app
+
+
+def record_duration(stage: str, seconds: float, error: bool = False, **attrs):
+    """Add one finished span for `stage` to the histograms and the JSONL log."""
+    with _lock:
+        hist = _histograms.setdefault(stage, {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += seconds
+        hist["count"] += 1
+        _samples.setdefault(stage, deque(maxlen=SAMPLE_WINDOW)).append(seconds)
+        if error:
+            _errors[stage] = _errors.get(stage, 0) + 1
+    _write_jsonl({
+        "ts": round(time.time(), 3),
+        "stage": stage,
+        "duration_ms": round(seconds * 1000, 3),
+        "error": error,
+        **attrs,
+    })
+
+
+@contextmanager
+def span(stage: str, **attrs):
+    """
+    Time a block of work as one span of `stage`.
+
+        with span("llm", prompt_type="explanation"):
+            ...
+    """
+    with _lock:
+        _in_flight[stage] = _in_flight.get(stage, 0) + 1
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        with _lock:
+            _in_flight[stage] = _in_flight.get(stage, 1) - 1
+        record_duration(stage, time.perf_counter() - start, error=error, **attrs)
+
+
+def traced(stage: str):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_cache(name: str, hit: bool):
+    """Count a hit or miss for the cache called `name`."""
+    with _lock:
+        entry = _cache.setdefault(name, {"hits": 0, "misses": 0})
+        entry["hits" if hit else "misses"] += 1
+
+
+def incr(name: str, amount: int = 1):
+    """Increment a free-form counter."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+# ── Read side ─────────────────────────────────────────────────────────────────
+def stage_stats() -> dict:
+    """Per-stage count, p50/p95 (ms), errors and in-flight count."""
+    with _lock:
+        stages = set(_histograms) | set(_in_flight)
+        return {
+            stage: {
+                "count":     _histograms.get(stage, {}).get("count", 0),
+                "p50_ms":    round(percentile(list(_samples.get(stage, ())), 50) * 1000, 1),
+                "p95_ms":    round(percentile(list(_samples.get(stage, ())), 95) * 1000, 1),
+                "errors":    _errors.get(stage, 0),
+                "in_flight": _in_flight.get(stage, 0),
+            }
+            for stage in sorted(stages)
+        }
+
+
+def cache_stats() -> dict:
+    """Per-cache hits, misses and hit rate."""
+    with _lock:
+        return {
+            name: {
+                "hits":     c["hits"],
+                "misses":   c["misses"],
+                "hit_rate": round(c["hits"] / (c["hits"] + c["misses"]), 3) if c["hits"] + c["misses"] else 0.0,
+            }
+            for name, c in sorted(_cache.items())
+        }
+
+
+def render_prometheus(prefix: str = "explainmate") -> str:
+    """Current metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        lines.append(f"# HELP {prefix}_stage_duration_seconds Time spent per app stage.")
+        lines.append(f"# TYPE {prefix}_stage_duration_seconds histogram")
+        for stage, hist in sorted(_histograms.items()):
+            for bound, count in zip(BUCKETS, hist["buckets"]):
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {hist["count"]}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {hist["sum"]:.6f}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {hist["count"]}')
+
+        lines.append(f"# TYPE {prefix}_stage_errors_total counter")
+        for stage, count in sorted(_errors.items()):
+            lines.append(f'{prefix}_stage_errors_total{{stage="{stage}"}} {count}')
+
+        lines.append(f"# TYPE {prefix}_stage_in_flight gauge")
+        for stage, count in sorted(_in_flight.items()):
+            lines.append(f'{prefix}_stage_in_flight{{stage="{stage}"}} {count}')
+
+        lines.append(f"# TYPE {prefix}_cache_requests_total counter")
+        for name, c in sorted(_cache.items()):
+            lines.append(f'{prefix}_cache_requests_total{{cache="{name}",result="hit"}} {c["hits"]}')
+            lines.append(f'{prefix}_cache_requests_total{{cache="{name}",result="miss"}} {c["misses"]}')
+
+        for name, value in sorted(_counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Drop all recorded metrics (used by benchmarks between runs)."""
+    with _lock:
+        for store in (_histograms, _samples, _errors, _in_flight, _cache, _counters):
+            store.clear()
@@ -0,0 +1,143 @@
+import difflib
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from core import telemetry
+from core.code_runner import run_code
+from core.scheduler import scheduler
+
+load_dotenv()
+
+MAX_CONCURRENCY = int(os.getenv("TEST_MATRIX_MAX_CONCURRENCY", "8"))
+CACHE_MAX = int(os.getenv("TEST_MATRIX_CACHE_MAX", "512"))
+
+CASE_SEPARATOR = "---"
+EXPECTED_MARKER = "=>"
+
+_cache = OrderedDict()      # sha256(lang, code, stdin) → (output, ms)
+_cache_lock = threading.Lock()
+# Runner failures (timeouts, missing toolchains, JDoodle errors) start with one of these.
+_FAILURE_MARKS = ("⏰", "❌", "🚫", "⚠️")
+
+
+def parse_cases(text: str) -> list:
+    """
+    Parse test cases from JSON or from the plain-text format:
+
+        5 3          ← stdin (any number of lines)
+        =>
+        8            ← expected output
+        ---
+        10 -2
+        =>
+        8
+
+    JSON may be a list of {"stdin", "expected"[, "name"]} objects or an object
+    with a "cases" list. Returns [{"name", "stdin", "expected"}].
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+
+    if text[0] in "[{":
+        data = json.loads(text)
+        items = data.get("cases", []) if isinstance(data, dict) else data
+        return [
+            {
+                "name":     str(item.get("name") or f"case {i + 1}"),
+                "stdin":    str(item.get("stdin", item.get("input", ""))),
+                "expected": str(item.get("expected", item.get("output", ""))),
+            }
+            for i, item in enumerate(items)
+        ]
+
+    cases, block = [], []
+    for line in text.splitlines() + [CASE_SEPARATOR]:
+        if line.strip() == CASE_SEPARATOR:
+            if any(part.strip() for part in block):
+                lines = "\n".join(block)
+                if f"\n{EXPECTED_MARKER}" in f"\n{lines}":
+                    stdin, _, expected = f"\n{lines}".partition(f"\n{EXPECTED_MARKER}")
+                    stdin, expected = stdin[1:], expected.lstrip("\n")
+                else:
+                    stdin, expected = lines, ""
+                cases.append({"name": f"case {len(cases) + 1}", "stdin": stdin, "expected": expected})
+            block = []
+        else:
+            block.append(line)
+    return cases
+
+
+def _normalize(output: str) -> list:
+    """Compare line-by-line, ignoring trailing whitespace and trailing blank lines."""
+    lines = [line.rstrip() for line in (output or "").replace("\r\n", "\n").split("\n")]
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _cache_key(language: str, code: str, stdin: str) -> str:
+    return hashlib.sha256("\0".join((language, code, stdin)).encode("utf-8")).hexdigest()
+
+
+def _completed(output: str) -> bool:
+    # A timeout keeps the partial output and puts its message on the last line.
+    last_line = output.rstrip().rpartition("\n")[2]
+    return not output.startswith(_FAILURE_MARKS) and not last_line.startswith("⏰")
+
+
+def _run_case(language: str, code: str, case: dict, runner) -> dict:
+    key = _cache_key(language, code, case["stdin"])
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit:
+            _cache.move_to_end(key)
+    telemetry.record_cache("test_matrix", hit is not None)
+
+    if hit:
+        actual, ms = hit
+    else:
+        start = time.perf_counter()
+        actual = runner(language, code, stdin=case["stdin"])
+        ms = (time.perf_counter() - start) * 1000
+        if _completed(actual):
+            with _cache_lock:
+                _cache[key] = (actual, ms)
+                while len(_cache) > CACHE_MAX:
+                    _cache.popitem(last=False)
+
+    expected_lines, actual_lines = _normalize(case["expected"]), _normalize(actual)
+    passed = expected_lines == actual_lines
+    diff = "" if passed else "\n".join(difflib.unified_diff(
+        expected_lines, actual_lines, fromfile="expected", tofile="actual", lineterm=""
+    ))
+    return {
+        "name":     case["name"],
+        "passed":   passed,
+        "stdin":    case["stdin"],
+        "expected": case["expected"],
+        "actual":   actual,
+        "diff":     diff,
+        "ms":       round(ms, 1),
+        "cached":   hit is not None,
+    }
+
+
+def run_matrix(language: str, code: str, cases: list, concurrency: int = 4, runner=run_code) -> list:
+    """
+    Run every case through `runner` in parallel (at most `concurrency` at once).
+    Outputs of completed runs are cached per (language, code, stdin), so after
+    editing the case list only new or changed stdins are executed again; runs
+    that timed out or failed are retried. The pool acts for the caller's user
+    (core.scheduler), so its runs are charged CPU like any other.
+    """
+    concurrency = max(1, min(concurrency, MAX_CONCURRENCY, len(cases) or 1))
+    run_case = scheduler.carry(lambda case: _run_case(language, code, case, runner))
+    with telemetry.span("test_matrix", cases=len(cases)):
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="test-matrix") as pool:
+            return list(pool.map(run_case, cases))
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from core import prompts, telemetry
+from core.hf_llm import query_llm
+from utils.utils_units import split_units
+
+load_dotenv()
+
+CACHE_MAX = int(os.getenv("UNIT_CACHE_MAX", "2048"))
+WORKERS = int(os.getenv("UNIT_ANALYSIS_WORKERS", "4"))
+# Top-level code shorter than this (imports, constants) goes to the stitch
+# prompt verbatim instead of costing an LLM call of its own.
+MIN_ANALYZED_LINES = 3
+
+_LABEL_RE = re.compile(r'^[\s*_#>-]*(' + "|".join(prompts.UNIT_ASPECTS) + r')[\s*_]*:[\s*_]*', re.I | re.M)
+
+
+class UnitCache:
+    """
+    LRU of per-definition LLM notes, keyed by the unit's normalized-code hash
+    (see utils.utils_units.split_units) plus the requested aspects. Shared by
+    every session, so an unchanged function is never analyzed twice.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(lang: str, unit_key: str, aspects) -> str:
+        return hashlib.sha256(f"{lang}\0{unit_key}\0{','.join(aspects)}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        telemetry.record_cache("unit_analysis", value is not None)
+        return value
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+unit_cache = UnitCache()
+
+
+def parse_unit_notes(text: str, aspects) -> dict:
+    """Split a "Explanation: … / Bugs: … / Complexity: …" reply into a dict."""
+    matches = list(_LABEL_RE.finditer(text))
+    if not matches:
+        return {aspects[0]: text.strip()}
+    notes = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        notes[match.group(1).lower()] = text[match.end():end].strip()
+    return notes
+
+
+def leaf_units(units: list) -> list:
+    """Classes are analyzed through their methods and body, everything else as is."""
+    leaves = []
+    for unit in units:
+        leaves.extend(leaf_units(unit["children"]) if unit["children"] else [unit])
+    return leaves
+
+
+def _is_trivial(unit: dict) -> bool:
+    return unit["kind"] == "module" and sum(1 for l in unit["source"].splitlines() if l.strip()) < MIN_ANALYZED_LINES
+
+
+def analyze_units(units: list, lang: str, outline: str, aspects=("explanation",),
+                  query=query_llm, workers: int = WORKERS, on_unit=None) -> list:
+    """
+    Notes for each unit, from the cache when its normalized code was seen
+    before, otherwise from the LLM with at most `workers` calls in flight.
+    `on_unit(result)` is called in the caller's thread as results arrive.
+    Returns [{"unit", "notes", "cached"}] in file order.
+    """
+    aspects = tuple(aspects)
+    results = [None] * len(units)
+    pending = {}
+    for i, unit in enumerate(units):
+        key = unit_cache.key(lang, unit["key"], aspects)
+        notes = unit_cache.get(key)
+        if notes is not None:
+            results[i] = {"unit": unit, "notes": notes, "cached": True}
+            if on_unit:
+                on_unit(results[i])
+        else:
+            pending[i] = key
+
+    def work(i):
+        unit = units[i]
+        prompt = prompts.unit_analysis_prompt(unit["source"], unit["name"], unit["kind"], outline, aspects)
+        return parse_unit_notes(query(prompt, "unit_analysis"), aspects)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending))),
+                                thread_name_prefix="unit-analysis") as pool:
+            futures = {pool.submit(work, i): i for i in pending}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    notes = future.result()
+                    unit_cache.put(pending[i], notes)
+                except Exception as e:
+                    notes = {aspects[0]: f"❌ Analysis failed: {e}"}
+                results[i] = {"unit": units[i], "notes": notes, "cached": False}
+                if on_unit:
+                    on_unit(results[i])
+    return results
+
+
+def format_notes(results: list, skipped=()) -> str:
+    """Per-definition notes in file order, as bullet lines for a reduce/stitch prompt."""
+    rows = [(u["start"], f"- top-level code (lines {u['start']}-{u['end']}): {u['source'].strip()}")
+            for u in skipped]
+    for r in results:
+        unit = r["unit"]
+        body = "; ".join(f"{aspect}: {text}" for aspect, text in r["notes"].items())
+        rows.append((unit["start"], f"- {unit['kind']} {unit['name']} (lines {unit['start']}-{unit['end']}): {body}"))
+    return "\n".join(text for _, text in sorted(rows))
+
+
+def explain_incremental(code: str, lang: str, outline: str, complexity_hint: str,
+                        aspects=("explanation",), query=query_llm, on_unit=None) -> dict:
+    """
+    Explain a file definition by definition. After an edit only definitions
+    whose normalized code changed are sent to the LLM; a cheap stitch call
+    (itself cached on the full set of unit keys) writes the file summary.
+
+    Returns {"summary", "units", "reused", "queried", "summary_cached"}.
+    """
+    aspects = tuple(a for a in prompts.UNIT_ASPECTS if a in aspects) or ("explanation",)
+    with telemetry.span("incremental_explain", lang=lang):
+        units = leaf_units(split_units(code, lang))
+        skipped = [u for u in units if _is_trivial(u)]
+        analyzed = [u for u in units if not _is_trivial(u)]
+        results = analyze_units(analyzed, lang, outline, aspects, query=query, on_unit=on_unit)
+
+        stitch_key = unit_cache.key(lang, "stitch:" + ",".join(u["key"] for u in units), aspects)
+        summary = unit_cache.get(stitch_key)
+        summary_cached = summary is not None
+        if not summary_cached:
+            summary = query(prompts.stitch_summary_prompt(outline, complexity_hint, format_notes(results, skipped)),
+                            "stitch_summary")
+            if not any(r["notes"].get(aspects[0], "").startswith("❌") for r in results):
+                unit_cache.put(stitch_key, summary)
+
+    return {
+        "summary":        summary,
+        "units":          results,
+        "reused":         sum(r["cached"] for r in results),
+        "queried":        sum(not r["cached"] for r in results),
+        "summary_cached": summary_cached,
+    }
@@ -0,0 +1,107 @@
+"""
+Local mock of the JDoodle compiler API for tests and offline development.
+
+    python -m tools.jdoodle_mock --port 8765 --quota 5 --fail-every 3
+    JDOODLE_API_URL=http://127.0.0.1:8765/v1 JDOODLE_CLIENT_ID=x JDOODLE_CLIENT_SECRET=y streamlit run app.py
+
+Implements POST /v1/execute and POST /v1/credit-spent. The "program output"
+is deterministic: it echoes the language, a hash of the script and the stdin,
+so cache hits can be told apart from fresh runs by the request counter.
+Failures (HTTP 503), latency and the daily quota (HTTP 429 once spent) can
+be injected from the command line or from code via `start()`.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockState:
+    def __init__(self, quota=200, fail_every=0, latency_ms=0):
+        self.quota = quota
+        self.fail_every = fail_every
+        self.latency_ms = latency_ms
+        self.requests = 0       # every /execute request received
+        self.used = 0           # credits spent (successful executions)
+        self.lock = threading.Lock()
+
+
+def _handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status: int, body: dict):
+            raw = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._reply(400, {"error": "Invalid JSON"})
+            if not payload.get("clientId") or not payload.get("clientSecret"):
+                return self._reply(401, {"error": "Unauthorized Request"})
+
+            if self.path.rstrip("/").endswith("/credit-spent"):
+                return self._reply(200, {"used": state.used})
+            if not self.path.rstrip("/").endswith("/execute"):
+                return self._reply(404, {"error": "Not found"})
+
+            with state.lock:
+                state.requests += 1
+                n = state.requests
+                if state.fail_every and n % state.fail_every == 0:
+                    return self._reply(503, {"error": "Service unavailable (injected)"})
+                if state.used >= state.quota:
+                    return self._reply(429, {"error": "Daily limit reached", "statusCode": 429})
+                state.used += 1
+
+            if state.latency_ms:
+                time.sleep(state.latency_ms / 1000)
+            digest = hashlib.sha256(payload.get("script", "").encode()).hexdigest()[:12]
+            output = f"[mock {payload.get('language')}] script={digest} stdin={payload.get('stdin', '')}\n"
+            self._reply(200, {"output": output, "statusCode": 200, "memory": "1024", "cpuTime": "0.01"})
+
+    return Handler
+
+
+def start(port: int = 0, **options):
+    """
+    Start the mock in a daemon thread. Returns (server, state); the API base
+    URL is f"http://127.0.0.1:{server.server_address[1]}/v1".
+    """
+    state = MockState(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock JDoodle API server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--quota", type=int, default=200)
+    parser.add_argument("--fail-every", type=int, default=0, help="return 503 on every Nth request")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    state = MockState(args.quota, args.fail_every, args.latency_ms)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), _handler(state))
+    print(f"Mock JDoodle API on http://127.0.0.1:{args.port}/v1 (quota {args.quota}/day)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
 # Updated utils_ast.py
 import ast
+import os
 import re
+import reprlib
+
+# Max characters of an argument/result preview stored per traced call.
+TRACE_REPR_LIMIT = int(os.getenv("TRACE_REPR_LIMIT", "60"))
+# Cap for the full value rendered on demand for the selected call.
+TRACE_FULL_REPR_LIMIT = int(os.getenv("TRACE_FULL_REPR_LIMIT", "200000"))
 
 def analyze_code_structure_python(code: str) -> dict:
     """Analyze Python code using AST to extract functions, loops, and variables."""
@@ -77,11 +84,119 @@ def get_first_function_name(code: str) -> str | None:
         return None
 
 
+class _BoundedRepr(reprlib.Repr):
+    """reprlib with small container limits, so a preview costs O(1) in the object's size."""
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.maxlevel = 3
+        self.maxlist = self.maxtuple = self.maxset = self.maxfrozenset = self.maxdeque = self.maxarray = 8
+        self.maxdict = 6
+        self.maxstring = self.maxlong = self.maxother = limit
+
+
+_bounded_repr = _BoundedRepr(TRACE_REPR_LIMIT)
+
+
+def preview_repr(value) -> str:
+    text = _bounded_repr.repr(value)
+    if hasattr(value, "__len__") and not isinstance(value, str):
+        try:
+            text += f"  ‹len {len(value)}›"
+        except Exception:
+            pass
+    return text if len(text) <= TRACE_REPR_LIMIT + 16 else text[:TRACE_REPR_LIMIT] + "…"
+
+
+class LazyArg:
+    """
+    A traced argument or result: str() gives a bounded preview computed at
+    call time, full() renders the whole value only when asked for (e.g. for
+    the selected node). The object itself is referenced, not copied, so
+    full() shows its state at the time of the request; `changed` tells
+    whether it was mutated since the call.
+    """
+    __slots__ = ("preview", "_obj", "_full")
+
+    def __init__(self, obj, preview: str):
+        self.preview = preview
+        self._obj = obj
+        self._full = None
+
+    def __str__(self):
+        return self.preview
+
+    __repr__ = __str__
+
+    def full(self) -> str:
+        if self._full is None:
+            try:
+                text = repr(self._obj)
+            except Exception:
+                text = str(type(self._obj))
+            if len(text) > TRACE_FULL_REPR_LIMIT:
+                text = text[:TRACE_FULL_REPR_LIMIT] + f"… [{len(text) - TRACE_FULL_REPR_LIMIT:,} more characters]"
+            self._full = text
+        return self._full
+
+    @property
+    def changed(self) -> bool:
+        try:
+            return preview_repr(self._obj) != self.preview
+        except Exception:
+            return False
+
+
+class ArgTable:
+    """
+    Interns LazyArgs for one trace. A value seen again (same object, or an
+    equal immutable value) reuses the earlier LazyArg unless its preview
+    changed, so repeated arguments (e.g. the array every quicksort call
+    receives) are represented once.
+    """
+    _IMMUTABLE = (str, bytes, tuple, frozenset)
+
+    def __init__(self):
+        self._entries = {}
+
+    def wrap(self, value):
+        if isinstance(value, (bool, int, float, type(None))) and not (
+            isinstance(value, int) and value.bit_length() > 200
+        ):
+            return value
+        if isinstance(value, str) and len(value) <= TRACE_REPR_LIMIT:
+            return value
+        try:
+            preview = preview_repr(value)
+        except Exception:
+            preview = str(type(value))
+        key = (id(value), preview)
+        if isinstance(value, self._IMMUTABLE):
+            try:
+                key = (type(value), hash(value))
+            except TypeError:
+                pass
+        lazy = self._entries.get(key)
+        if lazy is None or lazy.preview != preview:
+            lazy = self._entries[key] = LazyArg(value, preview)
+        return lazy
+
+
+def full_value(value) -> str:
+    """Full text of a traced argument/result, materializing a LazyArg if needed."""
+    return value.full() if isinstance(value, LazyArg) else repr(value)
+
+
 def execute_instrumented_code(code_str, input_value):
     """
     Execute the user code, locate the first function definition, wrap it so every
     call is recorded in `calls` (args, depth, index, parent_index, result, memoized),
-    then invoke it with input_value and return the call trace.
+    then invoke it with input_value and return the call trace. `memoized` marks
+    a call whose arguments were already seen; it is still executed.
+
+    Non-scalar args and results are stored as LazyArg (bounded preview, full
+    value on demand) so tracing stays linear in the number of calls even when
+    every call receives a large list.
     """
     try:
         # Parse the code and ensure there's a function
@@ -119,7 +234,8 @@ def execute_instrumented_code(code_str, input_value):
         calls = []
         call_counter = {"count": 0}
         parent_stack = []
-        memo = {}  # cache for memoization detection
+        seen = set()  # argument states already called, for the "memoized" flag
+        arg_table = ArgTable()
 
         def make_wrapper(f):
             def wrapper(*args, **kwargs):
@@ -131,36 +247,28 @@ def execute_instrumented_code(code_str, input_value):
                 # Normalize args for dict key
                 try:
                     key = (args, tuple(sorted(kwargs.items())))
-                    memoized = key in memo
+                    memoized = key in seen
                 except TypeError:
                     key = None
                     memoized = False
 
-                # Store simple representation of args
-                simple_args = []
-                for a in args:
-                    if isinstance(a, (int, float, str, bool, type(None))):
-                        simple_args.append(a)
-                    else:
-                        try:
-                            simple_args.append(repr(a))
-                        except Exception:
-                            simple_args.append(str(type(a)))
+                # Bounded, shared representation of args (see LazyArg)
+                simple_args = [arg_table.wrap(a) for a in args]
 
                 calls.append((simple_args, depth, idx, parent_idx, None, memoized))
                 parent_stack.append(idx)
 
-                if memoized and key is not None:
-                    result = memo[key]
-                else:
-                    result = f(*args, **kwargs)
-                    if key is not None:
-                        memo[key] = result
+                # Repeated states are only flagged; the call still runs so the
+                # trace matches the program as written (see core.memo_sim for
+                # what caching would save).
+                if key is not None:
+                    seen.add(key)
+                result = f(*args, **kwargs)
 
                 parent_stack.pop()
                 # Update recorded result
                 calls[idx] = (calls[idx][0], calls[idx][1], calls[idx][2],
-                               calls[idx][3], result, memoized)
+                               calls[idx][3], arg_table.wrap(result), memoized)
                 return result
             return wrapper
 
@@ -121,29 +121,49 @@ def generate_complexity_graph(code: str):
 
     return buf, time_c, space_c
 
-def generate_function_call_graph(code: str, lang='python'):
+def function_call_edges(code: str, lang='python'):
+    """
+    Return (functions, edges) for the call graph: every defined function name
+    and each (caller, callee) pair found via AST (Python only). Raises
+    SyntaxError for code that does not parse.
+    """
+    if lang != 'python':
+        return [], []
+    tree = ast.parse(code)
+    functions, edges = [], []
+    func_defs = [n for n in ast.walk(tree) if isinstance(n, ast.FunctionDef)]
+    for func in func_defs:
+        functions.append(func.name)
+        for node in ast.walk(func):
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+                if (func.name, node.func.id) not in edges:
+                    edges.append((func.name, node.func.id))
+    return functions, edges
+
+def generate_function_call_graph(code: str, lang='python', extra_edges=()):
     """
     Generate a function call graph using AST (Python only) and return it as a memory buffer.
+    `extra_edges` are (caller, callee) pairs from outside the snippet (e.g. the
+    project index); nodes only they add are drawn in gray.
     """
     if lang != 'python':
         return None
     try:
-        tree = ast.parse(code)
+        functions, edges = function_call_edges(code, lang)
         graph = nx.DiGraph()
-        func_defs = [n for n in ast.walk(tree) if isinstance(n, ast.FunctionDef)]
-        for func in func_defs:
-            graph.add_node(func.name)
-            for node in ast.walk(func):
-                if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
-                    graph.add_edge(func.name, node.func.id)
+        graph.add_nodes_from(functions)
+        graph.add_edges_from(edges)
+        local = set(graph.nodes)
+        graph.add_edges_from(extra_edges)
 
         if not graph.nodes:
             return None
 
         # Create graph plot
-        plt.figure(figsize=(6, 4))
+        plt.figure(figsize=(8, 5) if len(graph) > len(local) else (6, 4))
         pos = nx.spring_layout(graph)
-        nx.draw_networkx_nodes(graph, pos, node_color='lightblue', node_size=1500)
+        colors = ['lightblue' if node in local else 'lightgray' for node in graph.nodes]
+        nx.draw_networkx_nodes(graph, pos, node_color=colors, node_size=1500)
         nx.draw_networkx_edges(graph, pos, arrowstyle='->', arrowsize=12)
         nx.draw_networkx_labels(graph, pos, font_size=10, font_family='sans-serif')
         plt.axis('off')
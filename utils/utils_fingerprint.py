@@ -0,0 +1,103 @@
+import ast
+import builtins
+import hashlib
+import re
+
+# Shingle length (in canonical tokens) for near-duplicate detection.
+SHINGLE_SIZE = 4
+
+_BUILTINS = set(dir(builtins))
+# Words kept verbatim in non-Python code; every other identifier is renamed.
+_GENERIC_KEYWORDS = {
+    "if", "else", "for", "while", "do", "return", "break", "continue", "switch", "case", "default",
+    "function", "var", "let", "const", "class", "struct", "new", "delete", "public", "private",
+    "protected", "static", "void", "int", "long", "short", "float", "double", "char", "bool",
+    "boolean", "string", "String", "auto", "fn", "mut", "impl", "func", "package", "import",
+    "true", "false", "null", "nullptr", "nil", "this", "self", "try", "catch", "throw", "finally",
+    "unsigned", "signed", "vector", "map", "std", "include", "using", "namespace", "final", "range",
+    "len", "make", "append", "push", "pop", "size", "length", "Math", "System", "println", "printf",
+}
+_STRING_RE = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`[^`]*`')
+_COMMENT_RE = re.compile(r'//[^\n]*|/\*.*?\*/|#[^\n]*', re.S)
+_TOKEN_RE = re.compile(r'[A-Za-z_]\w*|\d[\w.]*|\S')
+
+
+class _Canonical:
+    """Renames identifiers to v0, v1, … in order of first appearance."""
+
+    def __init__(self, keep=()):
+        self.keep = keep
+        self.names = {}
+
+    def __call__(self, name: str) -> str:
+        if name in self.keep:
+            return name
+        return self.names.setdefault(name, f"v{len(self.names)}")
+
+
+def _python_tokens(node, canon, out):
+    if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+        return   # docstrings and bare strings
+    out.append(type(node).__name__)
+    if isinstance(node, ast.Name):
+        out.append(canon(node.id))
+    elif isinstance(node, ast.arg):
+        out.append(canon(node.arg))
+    elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        out.append(canon(node.name))
+    elif isinstance(node, ast.Attribute):
+        out.append(node.attr)   # method names (append, pop, …) carry meaning
+    elif isinstance(node, ast.Constant):
+        out.append(f"C:{type(node.value).__name__}")
+    elif isinstance(node, ast.alias):
+        out.append(node.name)
+    for child in ast.iter_child_nodes(node):
+        _python_tokens(child, canon, out)
+
+
+def canonical_tokens(code: str, lang: str = "python") -> list:
+    """
+    The code as a token stream with identifiers renamed by first appearance
+    and literals replaced by their type, so renaming variables, reformatting
+    or editing comments leaves it unchanged. Python is read from the AST
+    (docstrings dropped); other languages, and Python that does not parse,
+    from a comment- and string-masked token scan.
+    """
+    if lang == "python":
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            pass
+        else:
+            out = []
+            for node in tree.body:
+                _python_tokens(node, _Canonical(_BUILTINS), out)
+            return out
+    masked = _STRING_RE.sub(" STR ", code)
+    masked = _COMMENT_RE.sub(" ", masked)
+    canon = _Canonical(_GENERIC_KEYWORDS | {"STR"})
+    tokens = []
+    for token in _TOKEN_RE.findall(masked):
+        if token[0].isdigit():
+            tokens.append("NUM")
+        elif token[0].isalpha() or token[0] == "_":
+            tokens.append(canon(token))
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shingles(tokens: list, size: int = SHINGLE_SIZE) -> set:
+    """64-bit hashes of every run of `size` consecutive tokens."""
+    if len(tokens) <= size:
+        return {_hash64(" ".join(tokens))} if tokens else set()
+    return {_hash64(" ".join(tokens[i:i + size])) for i in range(len(tokens) - size + 1)}
+
+
+def fingerprint(tokens: list) -> str:
+    """Exact structural fingerprint: equal for snippets that differ only in names, literals and layout."""
+    return hashlib.sha256("\0".join(tokens).encode("utf-8")).hexdigest()
@@ -0,0 +1,353 @@
+import ast
+import re
+from utils.utils_ast import analyze_code_structure_generic
+
+# Pattern ids, in the order they are reported when scores tie.
+PATTERNS = {
+    "binary_search":  "Binary search",
+    "two_pointers":   "Two pointers",
+    "sliding_window": "Sliding window",
+    "bfs":            "Breadth-first search",
+    "dfs":            "Depth-first search",
+    "memoized_dp":    "Dynamic programming / memoization",
+    "backtracking":   "Backtracking",
+}
+# Evidence needed before a pattern is reported.
+MIN_SCORE = 1.0
+
+_MEMO_NAMES = {"memo", "cache", "dp", "table", "memory", "lookup"}
+_VISITED_NAMES = {"visited", "seen", "explored", "vis"}
+_TARGET_NAMES = {"target", "goal"}
+# Sub-pattern traits reported next to the scores (see core.question_bank).
+TRAITS = {
+    "pair_sum": "compares a sum of two elements with a target",
+}
+
+
+class _PatternVisitor(ast.NodeVisitor):
+    """One walk over the AST that collects weighted evidence for every pattern."""
+
+    def __init__(self):
+        self.scores = {p: 0.0 for p in PATTERNS}
+        self.evidence = {p: [] for p in PATTERNS}
+        self.functions = []          # stack of enclosing function frames
+        self.loops = []              # stack of enclosing loop nodes
+        self.inc, self.dec = set(), set()
+        self.traits = set()
+        self.pair_sums = set()       # names assigned a[i] + a[j]
+        self.module = self._search_frame()
+        self._once = set()
+
+    @staticmethod
+    def _search_frame():
+        # mids: midpoint names; bounded: a midpoint computed inside `while lo <= hi`;
+        # stepped: names moved to mid ± 1.
+        return {"mids": set(), "bounded": False, "stepped": set()}
+
+    def add(self, pattern, weight, why):
+        if (pattern, why) in self._once:
+            return
+        self._once.add((pattern, why))
+        self.scores[pattern] += weight
+        self.evidence[pattern].append(why)
+
+    # ── Scopes ────────────────────────────────────────────────────────────
+    def visit_FunctionDef(self, node):
+        for deco in node.decorator_list:
+            target = deco.func if isinstance(deco, ast.Call) else deco
+            name = target.attr if isinstance(target, ast.Attribute) else getattr(target, "id", "")
+            if name in ("lru_cache", "cache"):
+                self.add("memoized_dp", 1.5, f"@{name} on {node.name}()")
+        frame = {"name": node.name, "in_loop": False, "over_neighbours": False, "undo": False, "extend": False,
+                 **self._search_frame()}
+        self.functions.append(frame)
+        outer_loops, self.loops = self.loops, []
+        self.generic_visit(node)
+        self.loops = outer_loops
+        self.functions.pop()
+        self._score_search(frame, splits=_splits_in_two(node))
+        if frame["in_loop"] and (frame["undo"] or frame["extend"]):
+            self.add("backtracking", 1.0, f"{node.name}() chooses, recurses, then undoes the choice")
+        if frame["over_neighbours"]:
+            self.add("dfs", 0.75, f"{node.name}() recurses into each neighbour")
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def _visit_loop(self, node):
+        self.loops.append(node)
+        self.generic_visit(node)
+        self.loops.pop()
+
+    def visit_For(self, node):
+        if any(isinstance(n, ast.While) for n in ast.walk(node) if n is not node):
+            self.add("sliding_window", 0.5, "while loop nested in a for loop")
+        self._visit_loop(node)
+
+    def visit_While(self, node):
+        test = node.test
+        if isinstance(test, ast.Compare) and len(test.ops) == 1 and isinstance(test.ops[0], (ast.Lt, ast.LtE)):
+            if isinstance(test.left, ast.Name) and isinstance(test.comparators[0], ast.Name):
+                self.add("two_pointers", 0.5, f"while {test.left.id} < {test.comparators[0].id}")
+        if isinstance(test, ast.Name) and test.id in ("queue", "q", "frontier"):
+            self.add("bfs", 0.5, f"while {test.id}")
+        if isinstance(test, ast.Name) and test.id in ("stack", "st"):
+            self.add("dfs", 0.5, f"while {test.id}")
+        if self.loops and isinstance(self.loops[-1], ast.For):
+            self.add("sliding_window", 0.25, "inner while shrinks the window")
+        self._visit_loop(node)
+
+    def _score_search(self, frame, splits=False):
+        """
+        A midpoint alone also fits merge sort and other divide and conquer;
+        binary search additionally keeps a lo <= hi range or moves a bound
+        to mid ± 1, and recurses into only one half.
+        """
+        mids = frame["mids"]
+        stepped = mids & frame["stepped"]
+        if not mids or splits or not (frame["bounded"] or stepped):
+            return
+        self.add("binary_search", 1.0, "midpoint computed as (lo + hi) // 2")
+        if stepped:
+            self.add("binary_search", 0.25, "bounds move to mid ± 1")
+
+    # ── Statements and expressions ────────────────────────────────────────
+    def visit_AugAssign(self, node):
+        if isinstance(node.target, ast.Name) and isinstance(node.value, ast.Constant) and node.value.value == 1:
+            if isinstance(node.op, ast.Add):
+                self.inc.add(node.target.id)
+            elif isinstance(node.op, ast.Sub):
+                self.dec.add(node.target.id)
+        if isinstance(node.value, ast.Subscript) and self.loops:
+            self.add("sliding_window", 0.5, "running window total updated from the array")
+        if self.loops and any(_is_trailing_index(n) for n in ast.walk(node.value)):
+            self.add("sliding_window", 1.0, "fixed-size window: adds a[i], drops a[i - k]")
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        value = node.value
+        if isinstance(value, ast.BinOp) and (
+            (isinstance(value.op, ast.FloorDiv) and isinstance(value.right, ast.Constant) and value.right.value == 2)
+            or (isinstance(value.op, ast.RShift) and isinstance(value.right, ast.Constant) and value.right.value == 1)
+        ):
+            target = node.targets[0]
+            loop = self.loops[-1] if self.loops else None
+            in_range_loop = isinstance(loop, ast.While) and _is_range_test(loop.test)
+            if isinstance(target, ast.Name) and ("mid" in target.id.lower() or in_range_loop):
+                frame = self.functions[-1] if self.functions else self.module
+                frame["mids"].add(target.id)
+                frame["bounded"] |= in_range_loop
+        if _is_pair_sum(value) and isinstance(node.targets[0], ast.Name):
+            self.pair_sums.add(node.targets[0].id)
+        if isinstance(value, ast.BinOp) and isinstance(value.op, ast.Sub) and _is_len_call(value.left):
+            self.add("two_pointers", 0.5, "pointer initialized to len(...) - 1")
+        if isinstance(value, ast.Tuple) and any(
+            isinstance(e, ast.BinOp) and isinstance(e.op, ast.Sub) and _is_len_call(e.left) for e in value.elts
+        ):
+            self.add("two_pointers", 0.5, "pointers initialized to 0 and len(...) - 1")
+        for target in node.targets:
+            if isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name) and target.value.id in _MEMO_NAMES:
+                self.add("memoized_dp", 0.75, f"results stored in {target.value.id}[...]")
+                if isinstance(target.slice, ast.BinOp) or self.loops:
+                    self.add("memoized_dp", 0.25, f"{target.value.id} table filled iteratively")
+            if isinstance(target, ast.Name) and target.id in _MEMO_NAMES and isinstance(value, (ast.ListComp, ast.BinOp)):
+                self.add("memoized_dp", 0.5, f"{target.id} table allocated")
+            if isinstance(target, ast.Name) and target.id in _VISITED_NAMES:
+                self.add("dfs", 0.25, f"{target.id} set")
+                self.add("bfs", 0.25, f"{target.id} set")
+        self.generic_visit(node)
+
+    def visit_BinOp(self, node):
+        # lo = mid + 1, hi = mid - 1, search(a, mid + 1, hi)
+        if (isinstance(node.op, (ast.Add, ast.Sub)) and isinstance(node.left, ast.Name)
+                and isinstance(node.right, ast.Constant) and node.right.value == 1):
+            (self.functions[-1] if self.functions else self.module)["stepped"].add(node.left.id)
+        self.generic_visit(node)
+
+    def visit_Compare(self, node):
+        operands = [node.left, *node.comparators]
+        if not isinstance(node.ops[0], (ast.In, ast.NotIn)) and any(
+                _is_pair_sum(o) or (isinstance(o, ast.Name) and (o.id in self.pair_sums or o.id in _TARGET_NAMES))
+                for o in operands):
+            self.traits.add("pair_sum")
+        if (len(node.ops) == 1 and isinstance(node.ops[0], (ast.In, ast.NotIn))
+                and isinstance(node.comparators[0], ast.Name)):
+            name = node.comparators[0].id
+            if name in _MEMO_NAMES and self.functions:
+                self.add("memoized_dp", 0.75, f"checks {name} before recomputing")
+            if name in _VISITED_NAMES:
+                self.add("dfs", 0.25, f"checks {name}")
+                self.add("bfs", 0.25, f"checks {name}")
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        func = node.func
+        name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else ""
+        if name == "deque":
+            self.add("bfs", 0.75, "uses collections.deque")
+        elif name == "popleft" or (name == "pop" and node.args and isinstance(node.args[0], ast.Constant)
+                                   and node.args[0].value == 0):
+            self.add("bfs", 0.75, "dequeues from the front")
+        elif name in ("bisect_left", "bisect_right", "bisect", "insort"):
+            self.add("binary_search", 1.0, f"uses bisect.{name}")
+        elif name == "heappop":
+            self.add("bfs", 0.25, "priority queue (best-first search)")
+        frame = self.functions[-1] if self.functions else None
+        if frame and name == frame["name"]:
+            self.add("dfs", 0.25, f"{name}() recurses")
+            loop = self.loops[-1] if self.loops else None
+            if isinstance(loop, ast.For):
+                frame["in_loop"] = True
+                # for nei in graph[node] / graph.get(node, ())
+                frame["over_neighbours"] |= isinstance(loop.iter, (ast.Subscript, ast.Call)) and not (
+                    isinstance(loop.iter, ast.Call) and getattr(loop.iter.func, "id", "") in ("range", "enumerate"))
+            if any(isinstance(a, ast.BinOp) and isinstance(a.op, ast.Add) and isinstance(a.right, ast.List)
+                   for a in node.args):
+                frame["extend"] = True
+        if frame and name == "pop" and not node.args and self.loops:
+            frame["undo"] = True
+        if name in ("max", "min") and any(_is_window_length(a) for a in node.args):
+            self.add("sliding_window", 0.75, "tracks the best window length (right - left + 1)")
+        self.generic_visit(node)
+
+    def finish(self):
+        self._score_search(self.module)
+        both = self.inc & self.dec
+        if len(self.inc) >= 1 and len(self.dec) >= 1 and not both:
+            self.add("two_pointers", 0.5, f"moves {', '.join(sorted(self.inc))} up and {', '.join(sorted(self.dec))} down")
+        if self.scores["two_pointers"] < MIN_SCORE and self.inc and self.scores["sliding_window"] > 0:
+            self.add("sliding_window", 0.25, f"advances {', '.join(sorted(self.inc))} inside the window")
+
+
+def _is_range_test(test) -> bool:
+    # lo <= hi / lo < hi
+    return (isinstance(test, ast.Compare) and len(test.ops) == 1 and isinstance(test.ops[0], (ast.Lt, ast.LtE))
+            and isinstance(test.left, ast.Name) and isinstance(test.comparators[0], ast.Name))
+
+
+def _is_pair_sum(node) -> bool:
+    # a[i] + a[j]
+    return (isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add)
+            and isinstance(node.left, ast.Subscript) and isinstance(node.right, ast.Subscript))
+
+
+def _splits_in_two(func) -> bool:
+    """
+    True when `func` calls itself at least twice on one path (merge sort),
+    rather than once per branch (recursive binary search). Statements after
+    a `return` in the same block are not on the path.
+    """
+    def self_calls(stmt):
+        return sum(1 for n in ast.walk(stmt) if isinstance(n, ast.Call)
+                   and getattr(n.func, "id", getattr(n.func, "attr", None)) == func.name)
+
+    blocks = [getattr(n, f) for n in ast.walk(func) for f in ("body", "orelse", "finalbody")
+              if isinstance(getattr(n, f, None), list)]
+    for block in blocks:
+        calls = 0
+        for stmt in block:
+            if isinstance(stmt, (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith,
+                                 ast.Try, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            calls += self_calls(stmt)
+            if isinstance(stmt, ast.Return):
+                break
+        if calls >= 2:
+            return True
+    return False
+
+
+def _is_len_call(node) -> bool:
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "len"
+
+
+def _is_trailing_index(node) -> bool:
+    # a[i - k]
+    return (isinstance(node, ast.Subscript) and isinstance(node.slice, ast.BinOp)
+            and isinstance(node.slice.op, ast.Sub) and isinstance(node.slice.right, ast.Name))
+
+
+def _is_window_length(node) -> bool:
+    # right - left + 1
+    return (isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add)
+            and isinstance(node.left, ast.BinOp) and isinstance(node.left.op, ast.Sub))
+
+
+# ── Other languages ───────────────────────────────────────────────────────────
+_GENERIC_SIGNALS = [
+    ("binary_search",  0.5,  r'\bmid\w*\s*=\s*[^;\n]*(?:/\s*2|>>\s*1)', "midpoint computed as (lo + hi) / 2"),
+    ("binary_search",  0.5,  r'\b\w+\s*=\s*mid\w*\s*[+-]\s*1\b', "bounds move to mid ± 1"),
+    ("two_pointers",   0.5,  r'\w+\s*=\s*\w+\.(?:length|size\(\)|len\(\))\s*-\s*1|\w+\s*=\s*len\(\w+\)\s*-\s*1', "pointer at the last index"),
+    ("two_pointers",   0.5,  r'while\s*\(?\s*(\w+)\s*<=?\s*(\w+)\s*\)?\s*[{:]', "while left < right"),
+    ("two_pointers",   0.5,  r'(\w+)\s*(?:\+\+|\+=\s*1)[\s\S]*\b(?!\1\b)(\w+)\s*(?:--|-=\s*1)', "pointers move towards each other"),
+    ("sliding_window", 0.75, r'(?:max|min)\w*\([^;\n]*\w+\s*-\s*\w+\s*\+\s*1', "tracks the best window length"),
+    ("sliding_window", 0.5,  r'for\s*\([^)]*\)\s*\{[^}]*while\s*\(', "inner while shrinks the window"),
+    ("bfs",            0.75, r'\b(?:deque|Queue|queue)\b|\.(?:poll|popleft|shift)\(\)|\.front\(\)', "queue of frontier nodes"),
+    ("bfs",            0.25, r'\bvisited\b|\bseen\b', "visited set"),
+    ("dfs",            0.25, r'\bvisited\b|\bseen\b', "visited set"),
+    ("dfs",            0.5,  r'\bstack\b', "explicit stack"),
+    ("memoized_dp",    0.75, r'\b(?:memo|dp|cache)\s*\[', "results stored in a memo/dp table"),
+    ("memoized_dp",    0.5,  r'\b(?:memo|cache)\.(?:has|count|containsKey|get|find)\(', "checks the memo before recomputing"),
+    ("memoized_dp",    0.5,  r'\b(?:memo|cache)\.(?:put|set|insert|emplace)\(', "stores results in the memo"),
+    ("sliding_window", 1.0,  r'\+=\s*\w+\[\s*\w+\s*\]\s*-\s*\w+\[\s*\w+\s*-\s*\w+\s*\]', "fixed-size window: adds a[i], drops a[i - k]"),
+    ("backtracking",   0.5,  r'\.(?:push_back|push|add|append)\([^;\n]*\)[\s\S]{0,200}?\.(?:pop_back|pop|removeLast|remove)\(', "undoes the last choice"),
+]
+
+
+_GENERIC_TRAITS = [
+    ("pair_sum", r'\w+\[\s*\w+\s*\]\s*\+\s*\w+\[\s*\w+\s*\]\s*(?:[<>]=?|[=!]=)|\b(?:target|goal)\b'),
+]
+
+
+def _detect_generic(code: str) -> tuple:
+    scores = {p: 0.0 for p in PATTERNS}
+    evidence = {p: [] for p in PATTERNS}
+    traits = {trait for trait, regex in _GENERIC_TRAITS if re.search(regex, code)}
+    for pattern, weight, regex, why in _GENERIC_SIGNALS:
+        if re.search(regex, code):
+            scores[pattern] += weight
+            evidence[pattern].append(why)
+    recursive = [f for f in analyze_code_structure_generic(code)["functions"]
+                 if len(re.findall(rf'\b{re.escape(f)}\s*\(', code)) > 1]
+    if recursive:
+        scores["dfs"] += 0.25
+        evidence["dfs"].append(f"{recursive[0]}() recurses")
+        if scores["backtracking"]:
+            scores["backtracking"] += 0.5
+            evidence["backtracking"].append(f"{recursive[0]}() recurses after each choice")
+        if scores["memoized_dp"]:
+            scores["memoized_dp"] += 0.25
+    else:
+        scores["backtracking"] = 0.0
+    return scores, evidence, traits
+
+
+def detect_patterns(code: str, lang: str = "python") -> list:
+    """
+    Classic algorithm patterns found in the code, strongest first, as
+    [{"pattern", "name", "score", "evidence", "traits"}], where traits are
+    the TRAITS seen anywhere in the code. Python is classified from a
+    single AST walk; other languages (and Python that does not parse) from
+    regex signals on top of analyze_code_structure_generic.
+    """
+    scores = evidence = traits = None
+    if lang == "python":
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            tree = None
+        if tree is not None:
+            visitor = _PatternVisitor()
+            visitor.visit(tree)
+            visitor.finish()
+            scores, evidence, traits = visitor.scores, visitor.evidence, visitor.traits
+    if scores is None:
+        scores, evidence, traits = _detect_generic(code)
+    # lo/hi loops are shared with two pointers; the midpoint decides.
+    if scores["binary_search"] >= MIN_SCORE:
+        scores["two_pointers"] = min(scores["two_pointers"], MIN_SCORE - 0.01)
+    found = [
+        {"pattern": p, "name": PATTERNS[p], "score": round(scores[p], 2), "evidence": evidence[p],
+         "traits": sorted(traits)}
+        for p in PATTERNS if scores[p] >= MIN_SCORE
+    ]
+    return sorted(found, key=lambda f: -f["score"])
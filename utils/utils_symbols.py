@@ -0,0 +1,140 @@
+import ast
+
+# Call targets that are never project code; skipped to keep the index small.
+_SKIP_CALLS = {"print", "len", "range", "isinstance", "super", "str", "int", "float", "list", "dict",
+               "set", "tuple", "bool", "enumerate", "zip", "min", "max", "sum", "sorted", "open",
+               "getattr", "setattr", "hasattr", "type", "repr", "abs", "any", "all", "map", "filter"}
+
+
+def module_name(rel_path: str) -> tuple:
+    """(dotted module name, is_package) for a .py path relative to the project root."""
+    parts = rel_path.replace("\\", "/")[:-3].split("/")
+    if parts[-1] == "__init__":
+        return ".".join(parts[:-1]), True
+    return ".".join(parts), False
+
+
+def _dotted(node):
+    # "a.b.c" for Name/Attribute chains, None for anything else (calls, subscripts, …).
+    names = []
+    while isinstance(node, ast.Attribute):
+        names.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    names.append(node.id)
+    return ".".join(reversed(names))
+
+
+def _signature(node) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = ", ".join(ast.unparse(b) for b in node.bases)
+        return f"class {node.name}({bases})" if bases else f"class {node.name}"
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def _doc(node) -> str:
+    doc = ast.get_docstring(node) or ""
+    return doc.strip().splitlines()[0][:200] if doc.strip() else ""
+
+
+class _SymbolVisitor(ast.NodeVisitor):
+    def __init__(self, module: str, is_package: bool):
+        self.module = module
+        self.package = module if is_package else module.rpartition(".")[0]
+        self.scope = []            # enclosing (name, kind)
+        self.symbols = []
+        self.imports = {}          # local alias → fully qualified target
+        self.raw_calls = []        # (caller, dotted callee, enclosing class, lineno)
+        self.top_level = set()
+
+    def _qualified(self, name=None):
+        parts = [self.module] + [n for n, _ in self.scope] + ([name] if name else [])
+        return ".".join(p for p in parts if p)
+
+    def _define(self, node, kind):
+        if not self.scope:
+            self.top_level.add(node.name)
+        self.symbols.append({
+            "fq": self._qualified(node.name),
+            "name": node.name,
+            "kind": kind,
+            "lineno": node.lineno,
+            "end_lineno": getattr(node, "end_lineno", node.lineno),
+            "signature": _signature(node),
+            "doc": _doc(node),
+        })
+        self.scope.append((node.name, kind))
+        self.generic_visit(node)
+        self.scope.pop()
+
+    def visit_ClassDef(self, node):
+        self._define(node, "class")
+
+    def visit_FunctionDef(self, node):
+        self._define(node, "method" if self.scope and self.scope[-1][1] == "class" else "function")
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            if alias.asname:
+                self.imports[alias.asname] = alias.name
+            else:
+                head = alias.name.split(".")[0]
+                self.imports[head] = head
+
+    def visit_ImportFrom(self, node):
+        base = node.module or ""
+        if node.level:
+            package = self.package.split(".") if self.package else []
+            package = package[:len(package) - (node.level - 1)] if node.level > 1 else package
+            base = ".".join(p for p in package + ([node.module] if node.module else []) if p)
+        for alias in node.names:
+            if alias.name != "*":
+                self.imports[alias.asname or alias.name] = f"{base}.{alias.name}" if base else alias.name
+
+    def visit_Call(self, node):
+        dotted = _dotted(node.func)
+        if dotted and dotted not in _SKIP_CALLS:
+            cls = next((n for n, kind in reversed(self.scope) if kind == "class"), None)
+            self.raw_calls.append((self._qualified() or self.module, dotted, cls, node.lineno))
+        self.generic_visit(node)
+
+    def resolve(self, dotted: str, cls):
+        """Fully qualified target of a call, as far as this file alone can tell, or None."""
+        head, _, rest = dotted.partition(".")
+        if head in ("self", "cls") and cls and rest and "." not in rest:
+            return f"{self.module}.{cls}.{rest}"
+        if head in self.imports:
+            target = self.imports[head]
+            return f"{target}.{rest}" if rest else target
+        if head in self.top_level:
+            return f"{self.module}.{dotted}"
+        return None
+
+
+def index_python_source(code: str, rel_path: str) -> dict:
+    """
+    Definitions, imports and call sites of one Python file, for the project
+    index (core.repo_index). Calls are resolved to fully qualified names
+    through the file's own imports and definitions; `callee` is None when
+    that is not possible (e.g. obj.method()), `callee_name` is always set.
+    Raises SyntaxError for code that does not parse.
+    """
+    module, is_package = module_name(rel_path)
+    visitor = _SymbolVisitor(module, is_package)
+    visitor.visit(ast.parse(code))
+    calls = [
+        {"caller": caller, "callee": visitor.resolve(dotted, cls),
+         "callee_name": dotted.rpartition(".")[2], "lineno": lineno}
+        for caller, dotted, cls, lineno in visitor.raw_calls
+    ]
+    return {
+        "module": module,
+        "symbols": visitor.symbols,
+        "imports": visitor.imports,
+        "calls": calls,
+    }
@@ -0,0 +1,339 @@
+"""
+Compact, versioned binary files for recursion traces (see
+utils_ast.execute_instrumented_code), so a trace can be saved, shared and
+stepped through again without re-running the code.
+
+Layout (little-endian, every section 8-byte aligned):
+
+    header   magic "EMTRACE\\0", version u16, flags u16, calls u64,
+             strings u64, strings per block u32, meta length u32
+    meta     UTF-8 JSON: function, input, code, max_depth, created
+    sections (offset u64, length u64) × len(_SECTIONS), then the data:
+      depth       u32 per call
+      parent      u32 per call (0xFFFFFFFF = root)
+      memoized    u8 per call
+      result      u32 string id per call
+      arg_start   u32 per call + 1, index into arg_ids
+      arg_ids     u32 string id per argument
+      block_index (offset u64, compressed length u64) per string block
+      blocks      zlib-compressed UTF-8 previews, STRING_BLOCK strings each
+
+Calls are stored in trace order, so a call's index is its position. The
+previews are the strings the UI shows (str() of each traced value); full
+values are not kept. Numeric columns are read straight from the mmap, and
+string blocks are decompressed on demand. Files may come from anywhere, so
+opening one first checks, in a single linear pass, that every index in it
+stays inside its column and that every string block decompresses to exactly
+the size its offsets describe.
+"""
+import io
+import json
+import mmap
+import struct
+import sys
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+
+MAGIC = b"EMTRACE\0"
+FORMAT_VERSION = 1
+FILE_SUFFIX = ".emtrace"
+STRING_BLOCK = 4096
+_NO_PARENT = 0xFFFFFFFF
+_HEADER = struct.Struct("<8sHHQQII")
+_SECTION = struct.Struct("<QQ")
+_SECTIONS = ("depth", "parent", "memoized", "result", "arg_start", "arg_ids", "block_index", "blocks")
+_TYPECODES = {"depth": "I", "parent": "I", "memoized": "B", "result": "I",
+              "arg_start": "I", "arg_ids": "I", "block_index": "Q"}
+_CACHED_BLOCKS = 8
+# Largest decompressed string block accepted (previews are short).
+_MAX_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+class TraceFormatError(ValueError):
+    """The file is not a trace file, or was written by a newer version."""
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _column(typecode: str, values=()) -> array:
+    column = array(typecode, values)
+    assert column.itemsize == {"B": 1, "I": 4, "Q": 8}[typecode]
+    return column
+
+
+def _to_le(column: array) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def write_trace(f, calls, func_name: str, input_repr: str, code: str = "") -> int:
+    """
+    Write `calls` (the list returned by execute_instrumented_code) to the
+    binary file object `f`. Returns the number of bytes written.
+    """
+    strings, ids = [], {}
+
+    def intern(value) -> int:
+        text = str(value)
+        sid = ids.get(text)
+        if sid is None:
+            sid = ids[text] = len(strings)
+            strings.append(text)
+        return sid
+
+    columns = {name: _column(typecode) for name, typecode in _TYPECODES.items()}
+    columns["arg_start"].append(0)
+    max_depth = 0
+    for position, (args, depth, idx, parent_idx, result, memoized) in enumerate(calls):
+        if idx != position:
+            raise ValueError(f"call {position} has index {idx}; traces must be in call order")
+        columns["depth"].append(depth)
+        columns["parent"].append(_NO_PARENT if parent_idx is None else parent_idx)
+        columns["memoized"].append(1 if memoized else 0)
+        columns["result"].append(intern(result))
+        columns["arg_ids"].extend(intern(a) for a in args)
+        columns["arg_start"].append(len(columns["arg_ids"]))
+        max_depth = max(max_depth, depth)
+
+    blocks = []
+    for start in range(0, len(strings), STRING_BLOCK):
+        encoded = [s.encode("utf-8") for s in strings[start:start + STRING_BLOCK]]
+        offsets = _column("I", [0])
+        for item in encoded:
+            offsets.append(offsets[-1] + len(item))
+        blocks.append(zlib.compress(_to_le(offsets) + b"".join(encoded), 6))
+
+    meta = json.dumps({
+        "function":  func_name,
+        "input":     input_repr,
+        "code":      code,
+        "max_depth": max_depth,
+        "created":   time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }).encode("utf-8")
+
+    payloads = {name: _to_le(columns[name]) for name in _SECTIONS[:-2]}
+    payloads["blocks"] = b"".join(blocks)
+    table_at = _align(_HEADER.size + len(meta))
+    offset = _align(table_at + _SECTION.size * len(_SECTIONS))
+    block_offset = None
+    sections = {}
+    for name in _SECTIONS:
+        if name == "block_index":
+            # Filled in below, once the blocks' own offset is known.
+            payloads[name] = bytes(_SECTION.size * len(blocks))
+        if name == "blocks":
+            block_offset = offset
+        sections[name] = (offset, len(payloads[name]))
+        offset = _align(offset + len(payloads[name]))
+    index, position = _column("Q"), block_offset
+    for block in blocks:
+        index.extend((position, len(block)))
+        position += len(block)
+    payloads["block_index"] = _to_le(index)
+
+    out = bytearray(offset)
+    _HEADER.pack_into(out, 0, MAGIC, FORMAT_VERSION, 0, len(calls), len(strings), STRING_BLOCK, len(meta))
+    out[_HEADER.size:_HEADER.size + len(meta)] = meta
+    for i, name in enumerate(_SECTIONS):
+        at, length = sections[name]
+        _SECTION.pack_into(out, table_at + i * _SECTION.size, at, length)
+        out[at:at + length] = payloads[name]
+    f.write(out)
+    return len(out)
+
+
+def trace_bytes(calls, func_name: str, input_repr: str, code: str = "") -> bytes:
+    """The encoded trace as bytes (e.g. for a download button)."""
+    buffer = io.BytesIO()
+    write_trace(buffer, calls, func_name, input_repr, code)
+    return buffer.getvalue()
+
+
+class TraceFile(Sequence):
+    """
+    A trace file opened with mmap. Behaves like the list returned by
+    execute_instrumented_code: item i is (args, depth, i, parent_idx, result,
+    memoized) with args/result as preview strings, and slices return lists.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise TraceFormatError("Empty file.")
+        try:
+            self._open()
+        except (struct.error, TypeError, ValueError) as e:
+            self.close()
+            raise e if isinstance(e, TraceFormatError) else TraceFormatError(f"Corrupt trace file: {e}")
+
+    def _open(self):
+        if len(self._mm) < _HEADER.size:
+            raise TraceFormatError("Not a trace file.")
+        magic, version, _flags, calls, strings, per_block, meta_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise TraceFormatError("Not a trace file.")
+        if version > FORMAT_VERSION:
+            raise TraceFormatError(f"Trace format v{version} is newer than this app supports (v{FORMAT_VERSION}).")
+        self._count, self._strings, self._per_block = calls, strings, per_block
+        self.meta = json.loads(bytes(self._mm[_HEADER.size:_HEADER.size + meta_len]).decode("utf-8"))
+        table_at = _align(_HEADER.size + meta_len)
+        self._views = [memoryview(self._mm)]
+        self._columns = {}
+        for i, name in enumerate(_SECTIONS):
+            offset, length = _SECTION.unpack_from(self._mm, table_at + i * _SECTION.size)
+            if offset + length > len(self._mm):
+                raise TraceFormatError(f"Truncated trace file (section {name}).")
+            if name != "blocks":
+                self._columns[name] = self._load_column(name, offset, length)
+            else:
+                self._blocks_span = (offset, offset + length)
+        self._blocks = OrderedDict()
+        self._validate()
+
+    def _validate(self):
+        """Reject files whose columns point outside other columns or blocks."""
+        c, calls, strings = self._columns, self._count, self._strings
+        if any(len(c[name]) != calls for name in ("depth", "parent", "memoized", "result")) \
+                or len(c["arg_start"]) != calls + 1:
+            raise TraceFormatError("Column lengths do not match the header.")
+        if strings and not self._per_block:
+            raise TraceFormatError("Invalid string block size.")
+        blocks = -(-strings // self._per_block) if strings else 0
+        if len(c["block_index"]) != 2 * blocks:
+            raise TraceFormatError("String block index does not match the header.")
+        for name in ("result", "arg_ids"):
+            if len(c[name]) and max(c[name]) >= strings:
+                raise TraceFormatError(f"String id out of range in {name}.")
+        if any(p >= i and p != _NO_PARENT for i, p in enumerate(c["parent"])):
+            raise TraceFormatError("A call's parent does not precede it.")
+        starts = c["arg_start"]
+        if starts[0] != 0 or starts[calls] != len(c["arg_ids"]) \
+                or any(a > b for a, b in zip(starts, starts[1:])):
+            raise TraceFormatError("Argument ranges are not increasing.")
+        for b in range(blocks):
+            self._decompress(b)
+
+    def _load_column(self, name, offset, length):
+        typecode = _TYPECODES[name]
+        if sys.byteorder == "little":
+            window = self._views[0][offset:offset + length]
+            view = window.cast(typecode)
+            self._views += [window, view]
+            return view
+        column = _column(typecode)
+        column.frombytes(self._mm[offset:offset + length])
+        column.byteswap()
+        return column
+
+    # ── Metadata ──────────────────────────────────────────────────────────
+    @property
+    def func_name(self) -> str:
+        return self.meta["function"]
+
+    @property
+    def input_repr(self) -> str:
+        return self.meta["input"]
+
+    @property
+    def code(self) -> str:
+        return self.meta.get("code", "")
+
+    @property
+    def max_depth(self) -> int:
+        return self.meta["max_depth"]
+
+    # ── Sequence ──────────────────────────────────────────────────────────
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._call(j) for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("trace index out of range")
+        return self._call(i)
+
+    def _call(self, i: int) -> tuple:
+        c = self._columns
+        args = [self.string(sid) for sid in c["arg_ids"][c["arg_start"][i]:c["arg_start"][i + 1]]]
+        parent = c["parent"][i]
+        return (args, c["depth"][i], i, None if parent == _NO_PARENT else parent,
+                self.string(c["result"][i]), bool(c["memoized"][i]))
+
+    def string(self, sid: int) -> str:
+        offsets, data = self._block(sid // self._per_block)
+        k = sid % self._per_block
+        return data[offsets[k]:offsets[k + 1]].decode("utf-8")
+
+    def _block(self, b: int):
+        cached = self._blocks.get(b)
+        if cached is not None:
+            self._blocks.move_to_end(b)
+            return cached
+        cached = self._blocks[b] = self._decompress(b)
+        while len(self._blocks) > _CACHED_BLOCKS:
+            self._blocks.popitem(last=False)
+        return cached
+
+    def _decompress(self, b: int):
+        """
+        Decompress string block `b` as (offsets, data). Output is bounded by
+        the block's own offsets header, so a crafted block cannot expand
+        past the size it declares.
+        """
+        index = self._columns["block_index"]
+        offset, length = index[2 * b], index[2 * b + 1]
+        start, end = self._blocks_span
+        if offset < start or offset + length > end:
+            raise TraceFormatError(f"String block {b} lies outside the blocks section.")
+        count = min(self._per_block, self._strings - b * self._per_block)
+        head = 4 * (count + 1)
+        try:
+            inflate = zlib.decompressobj()
+            raw = inflate.decompress(self._mm[offset:offset + length], head)
+            if len(raw) != head:
+                raise TraceFormatError(f"String block {b} is truncated.")
+            offsets = _column("I")
+            offsets.frombytes(raw)
+            if sys.byteorder == "big":
+                offsets.byteswap()
+            size = offsets[count]
+            if offsets[0] != 0 or size > _MAX_BLOCK_BYTES \
+                    or any(x > y for x, y in zip(offsets, offsets[1:])):
+                raise TraceFormatError(f"String block {b} has invalid offsets.")
+            # max_length=0 would mean "unbounded".
+            data = inflate.decompress(inflate.unconsumed_tail, size) if size else b""
+        except zlib.error as e:
+            raise TraceFormatError(f"String block {b} is corrupt: {e}") from None
+        if len(data) != size:
+            raise TraceFormatError(f"String block {b} is truncated.")
+        return offsets, data
+
+    def close(self):
+        # Views into the mmap must be released before it can be closed.
+        for view in reversed(getattr(self, "_views", ())):
+            view.release()
+        self._views = []
+        self._columns = {}
+        if not self._mm.closed:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
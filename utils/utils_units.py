@@ -0,0 +1,164 @@
+import ast
+import hashlib
+import re
+
+# Definitions found by the brace splitter for C-like languages.
+_GENERIC_DEF_RE = re.compile(
+    r'\b(?:class|struct|interface|enum|impl|trait)\s+(\w+)'
+    r'|\bfunction\s+(\w+)'
+    r'|\bfn\s+(\w+)'
+    r'|\bfunc\s+(?:\([^)]*\)\s*)?(\w+)'
+    r'|(\w+)\s*\([^;{}]*\)\s*(?:const\s*)?(?:throws\s+[\w.,\s]+)?\{'
+)
+_GENERIC_CLASS_RE = re.compile(r'\b(?:class|struct|interface|enum|impl|trait)\s+\w+')
+# Header-less top-level lines: preprocessor directives, imports, package clauses.
+_GENERIC_STATEMENT_RE = re.compile(r'^\s*(?:#|import\b|package\b|use\b|using\b|from\b)')
+_GENERIC_KEYWORDS = {"if", "for", "while", "switch", "catch", "return", "else", "do", "sizeof"}
+# String literals are kept, comments dropped, when normalizing non-Python code.
+_COMMENT_RE = re.compile(r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')|//[^\n]*|/\*.*?\*/', re.S)
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _unit(name, kind, lines, start, end, key_text, children=None) -> dict:
+    return {
+        "name": name,
+        "kind": kind,
+        "start": start,
+        "end": end,
+        "source": "\n".join(lines[start - 1:end]),
+        "key": _hash(f"{kind}\0{name}\0{key_text}"),
+        "children": children or [],
+    }
+
+
+def normalize_generic(code: str) -> str:
+    """Drop comments and collapse whitespace so formatting-only edits hash the same."""
+    code = _COMMENT_RE.sub(lambda m: m.group(1) or " ", code)
+    return re.sub(r'\s+', ' ', code).strip()
+
+
+# ── Python ────────────────────────────────────────────────────────────────────
+def _python_units(code: str, nodes, lines, prefix="") -> list:
+    units, pending = [], []
+
+    def flush():
+        if pending:
+            start = pending[0].lineno
+            end = pending[-1].end_lineno
+            key_text = "\n".join(ast.dump(n, annotate_fields=False) for n in pending)
+            units.append(_unit(f"{prefix}<module>" if not prefix else f"{prefix}<body>",
+                               "module", lines, start, end, key_text))
+            pending.clear()
+
+    for node in nodes:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            flush()
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            name = f"{prefix}{node.name}"
+            # ast.dump leaves out comments, whitespace and line numbers.
+            key_text = ast.dump(node, annotate_fields=False)
+            if isinstance(node, ast.ClassDef):
+                children = _python_units(code, node.body, lines, prefix=f"{name}.")
+                units.append(_unit(name, "class", lines, start, node.end_lineno, key_text, children))
+            else:
+                units.append(_unit(name, "method" if prefix else "function",
+                                   lines, start, node.end_lineno, key_text))
+        else:
+            pending.append(node)
+    flush()
+    return units
+
+
+# ── Brace languages ───────────────────────────────────────────────────────────
+def _block_name(header: str):
+    for match in _GENERIC_DEF_RE.finditer(header):
+        name = next(g for g in match.groups() if g)
+        if name not in _GENERIC_KEYWORDS:
+            return name
+    return None
+
+
+def _brace_units(code: str, lines, first=1, last=None, prefix="") -> list:
+    """
+    Split on top-level `{ … }` blocks. A block plus the header lines since the
+    previous statement is one unit; everything between blocks is grouped into
+    "<module>" units. Class-like blocks are split one more level for methods.
+    """
+    last = last or len(lines)
+    stripped = _COMMENT_RE.sub(lambda m: m.group(1) or re.sub(r'[^\n]', ' ', m.group(0)),
+                               "\n".join(lines[first - 1:last]))
+    masked = re.sub(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', lambda m: " " * len(m.group(0)), stripped)
+    masked_lines = masked.split("\n")
+
+    units, depth, block_start, loose_start = [], 0, None, None
+
+    def add_loose(end):
+        nonlocal loose_start
+        if loose_start is not None and end >= loose_start:
+            text = "\n".join(lines[loose_start - 1:end])
+            if text.strip():
+                units.append(_unit(f"{prefix}<module>" if not prefix else f"{prefix}<body>",
+                                   "module", lines, loose_start, end, normalize_generic(text)))
+        loose_start = None
+
+    header_start = None
+    for offset, line in enumerate(masked_lines):
+        n = first + offset
+        if depth == 0:
+            if header_start is None and line.strip():
+                header_start = n
+            ends_statement = line.strip().endswith((";", "}")) or _GENERIC_STATEMENT_RE.match(line)
+            if ends_statement and "{" not in line:
+                if loose_start is None:
+                    loose_start = header_start
+                header_start = None
+        for ch in line:
+            if ch == "{":
+                if depth == 0:
+                    block_start = header_start or n
+                    add_loose(block_start - 1)
+                depth += 1
+            elif ch == "}" and depth:
+                depth -= 1
+                if depth == 0:
+                    header = " ".join(masked_lines[block_start - first:n - first + 1])[:400]
+                    name = _block_name(header) or f"block@{block_start}"
+                    text = "\n".join(lines[block_start - 1:n])
+                    is_class = bool(_GENERIC_CLASS_RE.search(header.split("{", 1)[0]))
+                    children = []
+                    if is_class and n - block_start > 2:
+                        children = _brace_units(code, lines, block_start + 1, n - 1, f"{prefix}{name}.")
+                    units.append(_unit(f"{prefix}{name}", "class" if is_class else ("method" if prefix else "function"),
+                                       lines, block_start, n, normalize_generic(text), children))
+                    header_start = None
+                    block_start = None
+    add_loose(last if depth == 0 else (block_start or last) - 1)
+    if depth and block_start:
+        # Unbalanced braces: keep the tail as one unit rather than losing it.
+        text = "\n".join(lines[block_start - 1:last])
+        units.append(_unit(f"{prefix}block@{block_start}", "function", lines, block_start, last,
+                           normalize_generic(text)))
+    return units
+
+
+def split_units(code: str, lang: str = "python") -> list:
+    """
+    Split source into top-level definitions, in file order. Each unit is
+    {"name", "kind", "start", "end", "source", "key", "children"} where `key`
+    hashes the normalized code (AST for Python; comment- and whitespace-free
+    text otherwise), so formatting and comment edits keep the same key.
+    Classes list their methods (and "<body>" units for the statements between
+    them) as `children`. Python that does not parse
+    falls back to a single "<module>" unit.
+    """
+    lines = code.split("\n")
+    if lang == "python":
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return [_unit("<module>", "module", lines, 1, len(lines), code)] if code.strip() else []
+        return _python_units(code, tree.body, lines)
+    return _brace_units(code, lines)